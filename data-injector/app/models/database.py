@@ -1,14 +1,52 @@
-from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, Date, inspect
+from contextlib import contextmanager
+from typing import Iterator
+from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, Date, DateTime, inspect
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+from app.models.pool import InstrumentedQueuePool, PoolMonitor, attach_monitor, pool_status
 from config import settings
 
-# Cria o engine do SQLAlchemy
-engine = create_engine(settings.DATABASE_URL)
+# Cria o engine do SQLAlchemy com pool dimensionado para os workers de banco
+engine = create_engine(
+    settings.DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+    connect_args={'options': f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+)
+
+# Telemetria do pool (espera no checkout e conexões retidas por tempo demais)
+pool_monitor = PoolMonitor(settings.DB_LEAK_THRESHOLD, settings.DB_LEAK_TRACEBACK)
+attach_monitor(engine, pool_monitor)
 
 # Cria a sessão
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    """
+    Abre uma sessão que é confirmada ao final do bloco, desfeita em caso de
+    erro e sempre fechada (devolvendo a conexão ao pool).
+    """
+    session = SessionLocal()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def get_pool_status() -> dict:
+    """
+    Retorna o estado do pool de conexões e a telemetria acumulada.
+    """
+    return pool_status(engine, pool_monitor)
+
 # Base para modelos
 Base = declarative_base(metadata=MetaData(schema=settings.DATABASE_SCHEMA))
 
@@ -22,6 +60,20 @@ class ProcedimentoOrigem(Base):
     co_procedimento_origem = Column(String(255))
     dt_competencia = Column(Date)
 
+# Registro do último arquivo aplicado com sucesso em cada tabela
+class IngestionLedger(Base):
+    __tablename__ = "ingestion_ledger"
+    __table_args__ = {'schema': settings.DATABASE_SCHEMA}
+
+    table_name = Column(String(255), primary_key=True)
+    data_sha256 = Column(String(64), nullable=False)
+    layout_sha256 = Column(String(64), nullable=False)
+    row_count = Column(Integer, nullable=False, default=0)
+    inserted = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    unchanged = Column(Integer, nullable=False, default=0)
+    applied_at = Column(DateTime, nullable=False)
+
 def get_db():
     """
     Função para obter uma sessão do banco de dados.
@@ -0,0 +1,145 @@
+import time
+import logging
+import threading
+import traceback
+from typing import Dict, Any, List, Optional
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+from config import settings
+
+logger = logging.getLogger("DatabasePool")
+
+
+class PoolMonitor:
+    """
+    Telemetria do pool de conexões: tempo de espera no checkout e conexões
+    mantidas fora do pool além do limite configurado (possíveis vazamentos).
+    """
+
+    def __init__(self, leak_threshold: float, capture_stack: bool = False):
+        """
+        Inicializa o monitor.
+
+        Args:
+            leak_threshold: Segundos com a conexão fora do pool até ser considerada vazamento
+            capture_stack: Guarda a pilha de chamadas de cada checkout (custo extra por checkout)
+        """
+        self.leak_threshold = leak_threshold
+        self.capture_stack = capture_stack
+        self.lock = threading.Lock()
+        self.checkouts: Dict[int, Dict[str, Any]] = {}
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self.leaks_reported = 0
+        self.last_leak_check = time.monotonic()
+
+    def record_wait(self, elapsed: float, timed_out: bool = False) -> None:
+        with self.lock:
+            self.wait_count += 1
+            self.wait_total += elapsed
+            self.wait_max = max(self.wait_max, elapsed)
+            if timed_out:
+                self.timeouts += 1
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        with self.lock:
+            self.checkouts[id(connection_record)] = {
+                'since': time.monotonic(),
+                'thread': threading.current_thread().name,
+                'stack': ''.join(traceback.format_stack(limit=12)[:-2]) if self.capture_stack else None,
+                'reported': False
+            }
+        self._maybe_check_leaks()
+
+    def on_checkin(self, dbapi_connection, connection_record) -> None:
+        with self.lock:
+            self.checkouts.pop(id(connection_record), None)
+
+    def _maybe_check_leaks(self) -> None:
+        now = time.monotonic()
+        if now - self.last_leak_check >= min(self.leak_threshold, 60):
+            self.last_leak_check = now
+            self.find_leaks()
+
+    def find_leaks(self) -> List[Dict[str, Any]]:
+        """
+        Lista as conexões fora do pool há mais tempo que o limite, registrando
+        um aviso na primeira vez que cada uma é encontrada.
+
+        Returns:
+            Lista com thread, segundos fora do pool e pilha do checkout (quando capturada)
+        """
+        now = time.monotonic()
+        leaks = []
+        with self.lock:
+            for info in self.checkouts.values():
+                held = now - info['since']
+                if held < self.leak_threshold:
+                    continue
+                leaks.append({'thread': info['thread'], 'held_seconds': round(held, 1), 'stack': info['stack']})
+                if not info['reported']:
+                    info['reported'] = True
+                    self.leaks_reported += 1
+                    logger.warning(
+                        f"Conexão mantida fora do pool há {held:.0f}s pela thread {info['thread']}"
+                        + (f"\n{info['stack']}" if info['stack'] else "")
+                    )
+        return leaks
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'wait_count': self.wait_count,
+                'wait_avg_ms': round(self.wait_total / self.wait_count * 1000, 2) if self.wait_count else 0.0,
+                'wait_max_ms': round(self.wait_max * 1000, 2),
+                'timeouts': self.timeouts,
+                'leaks_reported': self.leaks_reported
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool que mede o tempo de espera por uma conexão no checkout.
+    """
+
+    monitor: Optional[PoolMonitor] = None
+
+    def _do_get(self):
+        start = time.monotonic()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            if self.monitor:
+                self.monitor.record_wait(time.monotonic() - start, timed_out=True)
+            raise
+        if self.monitor:
+            self.monitor.record_wait(time.monotonic() - start)
+        return connection
+
+
+def attach_monitor(engine, monitor: PoolMonitor) -> None:
+    """
+    Associa o monitor ao pool do engine (espera no checkout e eventos de checkout/checkin).
+    """
+    InstrumentedQueuePool.monitor = monitor
+    event.listen(engine, 'checkout', monitor.on_checkout)
+    event.listen(engine, 'checkin', monitor.on_checkin)
+
+
+def pool_status(engine, monitor: PoolMonitor) -> Dict[str, Any]:
+    """
+    Retorna o estado atual do pool e a telemetria acumulada.
+    """
+    pool = engine.pool
+    status = {
+        'size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'checked_in': pool.checkedin(),
+        'overflow': max(pool.overflow(), 0),
+        'max_overflow': getattr(pool, '_max_overflow', settings.DB_MAX_OVERFLOW),
+        'leaks': len(monitor.find_leaks())
+    }
+    status.update(monitor.stats())
+    return status
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify, render_template
 from app.services.file_processor import process_file_upload
 from app.services.error_handler import ErrorHandler
+from app.models.database import get_pool_status
+from app.utils.cache import cache
 import tempfile
 import os
 import asyncio
@@ -43,13 +45,14 @@ def upload_file():
         }), 400
         
     file = request.files['file']
-    logger.info(f"Arquivo recebido: {file.filename}")
+    force = request.form.get('force', '').lower() in ('1', 'true', 'on', 'sim')
+    logger.info(f"Arquivo recebido: {file.filename} (forçar reprocessamento: {force})")
     
     try:
         # Executa o processamento de forma síncrona
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
-        result = loop.run_until_complete(process_file_upload(file))
+        result = loop.run_until_complete(process_file_upload(file, force=force))
         loop.close()
         
         logger.info(f"Resultado do processamento: {result}")
@@ -63,4 +66,33 @@ def upload_file():
         return jsonify({
             'status': 'error',
             'message': f'Erro ao processar arquivo: {str(e)}'
-        }), 500
\ No newline at end of file
+        }), 500
+
+@api_bp.route('/health/db', methods=['GET'])
+def database_health():
+    """
+    Endpoint com o estado do pool de conexões (conexões em uso, overflow,
+    tempo de espera no checkout e possíveis vazamentos).
+    """
+    try:
+        return jsonify({
+            'status': 'success',
+            'pool': get_pool_status()
+        })
+    except Exception as e:
+        logger.error(f"Erro ao consultar o pool de conexões: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@api_bp.route('/health/cache', methods=['GET'])
+def cache_health():
+    """
+    Endpoint com as estatísticas do cache em memória (entradas, bytes,
+    acertos, falhas, descartes e expirações).
+    """
+    return jsonify({
+        'status': 'success',
+        'cache': cache.stats()
+    })
@@ -1,21 +1,62 @@
 import os
 import logging
 import re
+from array import array
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from sqlalchemy import text, inspect
 from sqlalchemy.orm import Session
-from app.models.database import SessionLocal, Base
+from app.models.database import SessionLocal, Base, engine
 from app.services.data_validator import (
     DataValidator,
     validate_database_schema,
     parse_layout_file,
     validate_fixed_width_data,
     parse_fixed_width_data,
-    get_column_mapping_for_table
+    get_column_mapping_for_table,
+    resolve_key_columns,
+    iter_fixed_width_file
 )
 from app.services.error_handler import ErrorHandler
-from app.services.database_service import insert_records_safely_sync, insert_records_safely
+from app.services.database_service import (
+    insert_records_safely_sync,
+    insert_records_safely,
+    insert_records_batched,
+    update_records_batched
+)
+from app.services.snapshot_service import (
+    FileSnapshot,
+    build_snapshot,
+    load_snapshot,
+    save_snapshot,
+    discard_snapshot,
+    diff_snapshots,
+    read_lines_at
+)
+from app.services.sort_merge_diff import (
+    ExternalSorter,
+    iter_db_rows_ordered,
+    merge_join,
+    INSERT,
+    UPDATE,
+    UNCHANGED
+)
+from app.services.key_index import (
+    KeyIndex,
+    hash_keys,
+    load_key_index,
+    save_key_index,
+    discard_key_index,
+    build_key_index_from_db,
+    read_write_counters,
+    wait_for_write_counters,
+    collect_key_hashes,
+    fetch_existing_by_keys
+)
+from app.services.partition_service import PartitionSwapService
+from app.services.index_advisor import IndexAdvisor
+from app.services.diff_scope import ScopeCollector, resolve_scope_column, scope_clause
+from app.utils.normalization import build_record_key, normalize_compare_value
 from config import settings
 
 logger = logging.getLogger(__name__)
@@ -23,16 +64,24 @@ logger = logging.getLogger(__name__)
 class DataSyncService:
     def __init__(self):
         self.logger = logging.getLogger("DataSyncService")
+        self.rejected = 0
+        self.reject_file = None
+        # Hashes das chaves percorridas na comparação completa, para gerar o índice de chaves
+        self.visited_key_hashes = None
+        # Contadores de escrita da tabela no início da carga, para validar e gravar o índice de chaves
+        self.write_counters = None
         self.error_handler = ErrorHandler()
         self.processed_layouts = set()
         self.validator = DataValidator()
+        self.partition_service = PartitionSwapService()
+        self.index_advisor = IndexAdvisor()
 
     def _get_table_columns(self, session: Session, table_name: str) -> Dict[str, str]:
         inspector = inspect(session.bind)
         columns = inspector.get_columns(table_name, schema=settings.DATABASE_SCHEMA)
         return {col['name']: str(col['type']) for col in columns}
 
-    def _get_existing_records(self, session: Session, table_name: str) -> List[Dict]:
+    def _get_existing_records(self, session: Session, table_name: str, scope: Optional[Dict[str, Any]] = None) -> List[Dict]:
         try:
             # Get table structure
             inspector = inspect(session.bind)
@@ -43,10 +92,11 @@ class DataSyncService:
             # Create columns string for query
             columns_str = ", ".join(column_names)
 
-            # Execute query to get all records
-            query = text(f"SELECT {columns_str} FROM {settings.DATABASE_SCHEMA}.{table_name}")
-            self.logger.info(f"Buscando registros existentes em {table_name}")
-            result = session.execute(query)
+            # Execute query to get all records (restricted to the file's scope values when given)
+            params = {}
+            query = text(f"SELECT {columns_str} FROM {settings.DATABASE_SCHEMA}.{table_name}{scope_clause(scope, params)}")
+            self.logger.info(f"Buscando registros existentes em {table_name}" + (f" ({scope['column']} em {scope['values']})" if scope else ""))
+            result = session.execute(query, params)
 
             # Convert result to dictionary
             records = [dict(zip(column_names, row)) for row in result]
@@ -131,114 +181,549 @@ class DataSyncService:
             self.logger.error(f"Erro ao carregar dados do arquivo: {str(e)}")
             raise
 
-    def _insert_data_to_table(self, session: Session, table_name: str, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _insert_data_to_table(self, table_name: str, records: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
-        Insere dados na tabela usando SQLAlchemy
+        Insere dados na tabela em lotes; registros rejeitados pelo banco vão
+        para o arquivo de rejeitos sem impedir a inserção dos demais
         """
         try:
             if not records:
-                return {'success': True, 'records_inserted': 0}
+                return {'success': True, 'records_inserted': 0, 'rejected_records': [], 'reject_file': None}
             
-            # Usa a função existing insert_records_safely_sync
-            success = insert_records_safely_sync(table_name, records)
+            result = insert_records_batched(table_name, records)
             
-            if success:
-                return {'success': True, 'records_inserted': len(records)}
+            if result['success']:
+                return {
+                    'success': True,
+                    'records_inserted': result['processed'],
+                    'rejected_records': result['rejected_records'],
+                    'reject_file': result['reject_file']
+                }
             else:
-                return {'success': False, 'error': 'Falha na inserção de registros'}
+                return {'success': False, 'error': result['error']}
                 
         except Exception as e:
             self.logger.error(f"Erro ao inserir dados na tabela {table_name}: {str(e)}")
             return {'success': False, 'error': str(e)}
 
-    def sync_table_data(self, table_name: str, data_file: str, layout_file: str) -> Dict[str, Any]:
+    def _update_data_in_table(self, table_name: str, records: List[Dict[str, Any]], key_columns: List[str]) -> Dict[str, Any]:
+        """
+        Atualiza registros existentes usando as colunas chave, em lotes
+        """
+        try:
+            if not records:
+                return {'success': True, 'records_updated': 0, 'rejected_records': [], 'reject_file': None}
+            
+            result = update_records_batched(table_name, records, key_columns)
+            
+            if result['success']:
+                return {
+                    'success': True,
+                    'records_updated': result['processed'],
+                    'rejected_records': result['rejected_records'],
+                    'reject_file': result['reject_file']
+                }
+            else:
+                return {'success': False, 'error': result['error']}
+                
+        except Exception as e:
+            self.logger.error(f"Erro ao atualizar dados na tabela {table_name}: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def _apply_changes(self, table_name: str, to_insert: List[Dict[str, Any]], to_update: List[Dict[str, Any]], key_columns: List[str]) -> Dict[str, Any]:
+        """
+        Executa as inserções e atualizações no banco, levantando erro em caso de falha.
+        Registros rejeitados individualmente são contabilizados em self.rejected.
+        
+        Returns:
+            Dict com inserted, updated e inserted_records (registros efetivamente inseridos)
+        """
+        inserted = 0
+        updated = 0
+        inserted_records = []
+        
+        if to_insert:
+            result = self._insert_data_to_table(table_name, to_insert)
+            if not result['success']:
+                raise ValueError(f"Erro ao inserir registros em {table_name}: {result['error']}")
+            inserted = result['records_inserted']
+            rejected_ids = {id(record) for record in result['rejected_records']}
+            inserted_records = [record for record in to_insert if id(record) not in rejected_ids]
+            self._track_rejects(result)
+            
+        if to_update:
+            result = self._update_data_in_table(table_name, to_update, key_columns)
+            if not result['success']:
+                raise ValueError(f"Erro ao atualizar registros em {table_name}: {result['error']}")
+            updated = result['records_updated']
+            self._track_rejects(result)
+        
+        return {'inserted': inserted, 'updated': updated, 'inserted_records': inserted_records}
+
+    def _track_rejects(self, result: Dict[str, Any]) -> None:
+        if result['rejected_records']:
+            self.rejected += len(result['rejected_records'])
+            self.reject_file = result['reject_file']
+
+    def sync_table_data(self, table_name: str, data_file: str, layout_file: str, force: bool = False) -> Dict[str, Any]:
         """
         Sincroniza os dados de um arquivo com a tabela do banco de dados.
         
+        Quando existe o snapshot do último arquivo aplicado, apenas as linhas
+        adicionadas ou alteradas em relação a ele são validadas e carregadas,
+        sem leitura do banco. Caso contrário, o arquivo é comparado com todos
+        os registros da tabela: em memória (dict) para tabelas pequenas ou por
+        ordenação e intercalação (sort_merge) para tabelas grandes, conforme
+        DIFF_MODE.
+        
+        O índice de chaves da tabela (filtro de Bloom) evita consultas ao banco
+        para chaves certamente novas, que são inseridas diretamente.
+        
+        Tabelas particionadas por competência são recarregadas por troca de
+        partição, sem comparação linha a linha.
+        
         Args:
             table_name: Nome da tabela
             data_file: Caminho do arquivo de dados
             layout_file: Caminho do arquivo de layout
+            force: Ignora o snapshot e compara com o banco
             
         Returns:
             Dict com o resultado da sincronização
         """
+        self.rejected = 0
+        self.reject_file = None
+        self.visited_key_hashes = None
         try:
             # Valida a estrutura da tabela e obtém o mapeamento de colunas
             if not validate_database_schema(table_name, layout_file):
                 raise ValueError(f"Schema da tabela {table_name} não corresponde ao layout")
                 
             column_mapping = get_column_mapping_for_table(table_name, layout_file)
+            layout_columns = parse_layout_file(layout_file)
+            key_columns = resolve_key_columns(table_name, layout_columns)
             
-            # Carrega os dados do arquivo
-            with open(data_file, 'r', encoding='utf-8') as f:
-                data_content = f.read()
-                
-            # Processa os dados usando o layout
-            records = parse_fixed_width_data(data_content, layout_file)
-            
-            # Busca registros existentes
-            logger.info(f"Buscando registros existentes em {table_name}")
-            existing_records = self._get_existing_records(SessionLocal(), table_name)
-            logger.info(f"Encontrados {len(existing_records)} registros existentes em {table_name}")
-            
-            # Cria um dicionário para busca rápida dos registros existentes
-            existing_dict = {
-                (r['co_procedimento'], r['co_procedimento_origem'], r['dt_competencia']): r 
-                for r in existing_records
-            }
-            
-            # Listas para armazenar registros a serem inseridos/atualizados
-            to_insert = []
-            to_update = []
-            unchanged = 0
-            
-            # Processa cada registro
-            for record in records:
-                # Cria a chave para busca
-                key = (
-                    record['CO_PROCEDIMENTO'],
-                    record['CO_PROCEDIMENTO_ORIGEM'],
-                    record['DT_COMPETENCIA']
-                )
-                
-                if key in existing_dict:
-                    # Registro existe, verifica se precisa atualizar
-                    existing = existing_dict[key]
-                    if self._records_are_different(record, existing):
-                        to_update.append(record)
-                    else:
-                        unchanged += 1
-                else:
-                    # Registro não existe, será inserido
-                    to_insert.append(record)
+            if self.partition_service.supports_swap(table_name):
+                result = self._sync_partition_swap(table_name, data_file, layout_file, layout_columns)
+                # Snapshot e índice de chaves não se aplicam à troca de partições
+                discard_snapshot(table_name)
+                discard_key_index(table_name)
+                return result
             
-            # Executa as operações no banco
-            inserted = 0
-            updated = 0
+            # Gera o snapshot do arquivo atual e busca o do último arquivo aplicado
+            snapshot = build_snapshot(data_file, layout_columns, key_columns)
+            previous = None if force else load_snapshot(table_name, snapshot.key_slices)
+            key_index = self._load_key_index(table_name, key_columns, force)
+            index_report = self._check_indexes(table_name, key_columns)
             
-            if to_insert:
-                inserted = self._insert_data_to_table(SessionLocal(), table_name, to_insert)['records_inserted']
-                
-            if to_update:
-                updated = self._insert_data_to_table(SessionLocal(), table_name, to_update)['records_inserted']
+            if previous is not None:
+                result = self._sync_delta(table_name, data_file, layout_file, key_columns, previous, snapshot, key_index)
+            elif key_index is not None:
+                result = self._sync_indexed(table_name, data_file, layout_file, key_columns, key_index)
+            elif self._choose_diff_mode(table_name, len(snapshot)) == 'sort_merge':
+                result = self._sync_sort_merge(table_name, data_file, layout_file, key_columns)
+            else:
+                result = self._sync_full(table_name, data_file, layout_file, key_columns)
             
-            return {
-                'status': 'success',
-                'message': f'Sincronização concluída: {inserted} inseridos, {updated} atualizados, {unchanged} não alterados',
-                'details': {
-                    'inserted': inserted,
-                    'updated': updated,
-                    'unchanged': unchanged
-                }
-            }
+            if self.rejected:
+                # Linhas rejeitadas não estão no banco: a próxima carga deve compará-las novamente
+                result['message'] += f', {self.rejected} rejeitados'
+                result['details']['rejected'] = self.rejected
+                result['details']['reject_file'] = self.reject_file
+                discard_snapshot(table_name)
+            else:
+                save_snapshot(table_name, snapshot)
+            self._refresh_key_index(table_name, key_columns, key_index, result['details'].get('inserted', 0))
+            if index_report:
+                result['details']['indexes'] = index_report['lookups']
+            return result
             
         except Exception as e:
             logger.error(f"Erro ao sincronizar dados da tabela {table_name}: {str(e)}")
+            # O snapshot anterior pode não refletir mais o banco após uma carga parcial
+            discard_snapshot(table_name)
+            discard_key_index(table_name)
             return {
                 'status': 'error',
                 'message': str(e)
             }
+
+    def _check_indexes(self, table_name: str, key_columns: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Verifica (e cria, com AUTO_CREATE_INDEXES) os índices usados pela comparação.
+        Falhas não interrompem a carga, que apenas fica sem o índice.
+        """
+        if not settings.INDEX_ADVISOR:
+            return None
+        try:
+            return self.index_advisor.ensure_indexes(table_name, key_columns)
+        except Exception as e:
+            self.logger.warning(f"Não foi possível verificar os índices de {table_name}: {str(e)}")
+            return None
+
+    def _sync_partition_swap(self, table_name: str, data_file: str, layout_file: str,
+                             layout_columns: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Substitui, para cada competência do arquivo, a partição correspondente
+        por uma tabela carregada via COPY.
+        """
+        columns = [col['Coluna'] for col in layout_columns]
+        key_column = next(
+            (col for col in columns if col.lower() == settings.PARTITION_KEY_COLUMN.lower()), None
+        )
+        if key_column is None:
+            raise ValueError(f"Layout de {table_name} não possui a coluna {settings.PARTITION_KEY_COLUMN}")
+        
+        loaded = self.partition_service.swap_partitions(
+            table_name, columns, key_column, iter_fixed_width_file(data_file, layout_file)
+        )
+        inserted = sum(loaded.values())
+        
+        return {
+            'status': 'success',
+            'message': f'Sincronização concluída: {inserted} inseridos em {len(loaded)} competências substituídas',
+            'details': {
+                'inserted': inserted,
+                'updated': 0,
+                'unchanged': 0,
+                'competencias': loaded,
+                'mode': 'partition_swap'
+            }
+        }
+
+    def _choose_diff_mode(self, table_name: str, file_rows: int) -> str:
+        """
+        Escolhe a estratégia de comparação com o banco (dict ou sort_merge).
+        
+        No modo auto, usa sort_merge quando o arquivo ou a estimativa de linhas
+        da tabela atinge SORT_MERGE_MIN_ROWS.
+        """
+        mode = settings.DIFF_MODE.lower()
+        if mode in ('dict', 'sort_merge'):
+            return mode
+        
+        estimated_rows = self._estimate_row_count(table_name)
+        mode = 'sort_merge' if max(file_rows, estimated_rows) >= settings.SORT_MERGE_MIN_ROWS else 'dict'
+        self.logger.info(f"Modo de comparação para {table_name}: {mode} (arquivo: {file_rows}, tabela: ~{estimated_rows})")
+        return mode
+
+    def _estimate_row_count(self, table_name: str) -> int:
+        """
+        Estima a quantidade de linhas da tabela pelas estatísticas do PostgreSQL
+        """
+        query = text("""
+            SELECT c.reltuples::bigint
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = :schema AND c.relname = :table
+        """)
+        try:
+            with engine.connect() as conn:
+                estimated = conn.execute(query, {'schema': settings.DATABASE_SCHEMA, 'table': table_name}).scalar()
+            return max(int(estimated or 0), 0)
+        except Exception as e:
+            self.logger.warning(f"Não foi possível estimar o tamanho de {table_name}: {str(e)}")
+            return 0
+
+    def _sync_delta(self, table_name: str, data_file: str, layout_file: str, key_columns: List[str],
+                    previous: FileSnapshot, snapshot: FileSnapshot,
+                    key_index: Optional[KeyIndex] = None) -> Dict[str, Any]:
+        """
+        Sincroniza apenas as linhas que mudaram em relação ao último arquivo aplicado.
+        
+        Linhas novas no arquivo podem já existir na tabela (por exemplo, removidas
+        de um arquivo anterior e reincluídas); com o índice de chaves, apenas as
+        prováveis existentes são conferidas no banco.
+        """
+        delta = diff_snapshots(previous, snapshot)
+        self.logger.info(
+            f"Delta de {table_name}: {len(delta['added'])} adicionadas, {len(delta['changed'])} alteradas, "
+            f"{delta['removed']} removidas, {delta['unchanged']} inalteradas"
+        )
+        
+        added = self._parse_lines(read_lines_at(data_file, delta['added']), layout_file)
+        to_update = self._parse_lines(read_lines_at(data_file, delta['changed']), layout_file)
+        unchanged = delta['unchanged']
+        
+        if key_index is not None:
+            to_insert, verified_update, verified_unchanged = self._classify_with_index(
+                table_name, added, key_columns, key_index
+            )
+            to_update.extend(verified_update)
+            unchanged += verified_unchanged
+        else:
+            to_insert = added
+        
+        counts = self._apply_changes(table_name, to_insert, to_update, key_columns)
+        inserted, updated = counts['inserted'], counts['updated']
+        if key_index is not None:
+            key_index.add(hash_keys([build_record_key(record, key_columns) for record in counts['inserted_records']]))
+        
+        return {
+            'status': 'success',
+            'message': f'Sincronização concluída: {inserted} inseridos, {updated} atualizados, {unchanged} não alterados',
+            'details': {
+                'inserted': inserted,
+                'updated': updated,
+                'unchanged': unchanged,
+                'removed_from_file': delta['removed'],
+                'mode': 'delta'
+            }
+        }
+
+    def _classify_with_index(self, table_name: str, records: List[Dict[str, Any]], key_columns: List[str],
+                             key_index: KeyIndex) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]:
+        """
+        Separa os registros em inserções, atualizações e inalterados usando o
+        índice de chaves. Chaves certamente ausentes vão direto para inserção;
+        apenas as prováveis existentes são buscadas no banco.
+        
+        Returns:
+            Tupla (registros a inserir, registros a atualizar, quantidade de inalterados)
+        """
+        keys = [build_record_key(record, key_columns) for record in records]
+        hits = key_index.probable_hits(hash_keys(keys))
+        hit_keys = [key for key, hit in zip(keys, hits) if hit]
+        existing = fetch_existing_by_keys(table_name, key_columns, hit_keys) if hit_keys else {}
+        self.logger.debug(
+            f"Índice de chaves de {table_name}: {len(keys) - len(hit_keys)} ausentes, "
+            f"{len(hit_keys)} verificadas no banco, {len(existing)} encontradas"
+        )
+        
+        to_insert = []
+        to_update = []
+        unchanged = 0
+        for record, key, hit in zip(records, keys, hits):
+            current = existing.get(key) if hit else None
+            if current is None:
+                to_insert.append(record)
+            elif self._records_are_different(record, current):
+                to_update.append(record)
+            else:
+                unchanged += 1
+        
+        return to_insert, to_update, unchanged
+
+    def _sync_indexed(self, table_name: str, data_file: str, layout_file: str, key_columns: List[str],
+                      key_index: KeyIndex) -> Dict[str, Any]:
+        """
+        Sincroniza o arquivo completo em lotes, consultando o banco apenas para
+        as chaves que o índice aponta como prováveis existentes.
+        """
+        inserted = updated = unchanged = 0
+        batch = []
+        
+        def flush():
+            nonlocal inserted, updated, unchanged
+            to_insert, to_update, batch_unchanged = self._classify_with_index(table_name, batch, key_columns, key_index)
+            counts = self._apply_changes(table_name, to_insert, to_update, key_columns)
+            key_index.add(hash_keys([build_record_key(record, key_columns) for record in counts['inserted_records']]))
+            inserted += counts['inserted']
+            updated += counts['updated']
+            unchanged += batch_unchanged
+            batch.clear()
+        
+        for record in iter_fixed_width_file(data_file, layout_file):
+            batch.append(record)
+            if len(batch) >= settings.BATCH_SIZE:
+                flush()
+        flush()
+        
+        return {
+            'status': 'success',
+            'message': f'Sincronização concluída: {inserted} inseridos, {updated} atualizados, {unchanged} não alterados',
+            'details': {
+                'inserted': inserted,
+                'updated': updated,
+                'unchanged': unchanged,
+                'mode': 'indexed'
+            }
+        }
+
+    def _load_key_index(self, table_name: str, key_columns: List[str], force: bool = False) -> Optional[KeyIndex]:
+        """
+        Lê os contadores de escrita da tabela e carrega o índice de chaves. Se a
+        tabela recebeu inclusões ou exclusões desde a gravação do índice (outro
+        processo escrevendo nela), uma chave ausente no índice pode existir na
+        tabela; o índice é então descartado e a carga compara com o banco.
+        """
+        try:
+            self.write_counters = read_write_counters(table_name)
+        except Exception as e:
+            self.logger.warning(f"Não foi possível ler as estatísticas de escrita de {table_name}: {str(e)}")
+            self.write_counters = None
+
+        key_index = None if force else load_key_index(table_name, key_columns)
+        if key_index is not None and (self.write_counters is None or key_index.write_counters != self.write_counters):
+            self.logger.warning(
+                f"Índice de chaves de {table_name} desatualizado (gravado com {key_index.write_counters}, "
+                f"tabela com {self.write_counters} inclusões/exclusões), descartando"
+            )
+            discard_key_index(table_name)
+            return None
+        return key_index
+
+    def _refresh_key_index(self, table_name: str, key_columns: List[str], key_index: Optional[KeyIndex],
+                           inserted: int = 0) -> None:
+        """
+        Persiste o índice de chaves após uma sincronização bem-sucedida. Sem
+        índice prévio (ou após uma comparação completa), ele é gerado a partir
+        das chaves percorridas pelo merge-join ou, se a comparação não passou
+        por toda a tabela, das chaves lidas do banco.
+
+        O índice é gravado com os contadores de escrita da tabela após as
+        `inserted` inclusões desta carga; sem estatísticas da tabela ele não é
+        gravado, pois não haveria como detectar escritas de outros processos.
+        """
+        try:
+            if self.write_counters is None:
+                discard_key_index(table_name)
+                return
+            if key_index is None and self.visited_key_hashes is not None:
+                key_index = KeyIndex.from_hashes(key_columns, self.visited_key_hashes)
+                self.logger.info(f"Índice de chaves de {table_name} gerado a partir do merge-join com {len(key_index)} chaves")
+            elif key_index is None:
+                key_index = build_key_index_from_db(table_name, key_columns)
+            key_index.write_counters = wait_for_write_counters(table_name, self.write_counters[0] + inserted)
+            save_key_index(table_name, key_index)
+        except Exception as e:
+            # O índice é apenas uma otimização: sem ele, a próxima carga consulta o banco
+            self.logger.warning(f"Erro ao atualizar índice de chaves de {table_name}: {str(e)}")
+            discard_key_index(table_name)
+        finally:
+            self.visited_key_hashes = None
+
+    def _parse_lines(self, lines: List[bytes], layout_file: str) -> List[Dict[str, Any]]:
+        """
+        Converte linhas brutas do arquivo em registros usando o layout
+        """
+        if not lines:
+            return []
+        return parse_fixed_width_data(b'\n'.join(lines), layout_file)
+
+    def _sync_full(self, table_name: str, data_file: str, layout_file: str, key_columns: List[str]) -> Dict[str, Any]:
+        """
+        Sincroniza o arquivo completo comparando-o com os registros da tabela.
+        """
+        # Lê o arquivo coletando, na mesma passada, os valores de escopo (ex.:
+        # competências) usados para restringir a busca no banco
+        collector = ScopeCollector(resolve_scope_column(key_columns))
+        records = list(collector.collect(iter_fixed_width_file(data_file, layout_file)))
+        scope = collector.scope()
+        logger.info(f"Total de registros processados: {len(records)}")
+        
+        # Busca registros existentes
+        logger.info(f"Buscando registros existentes em {table_name}")
+        with SessionLocal() as session:
+            existing_records = self._get_existing_records(session, table_name, scope)
+        logger.info(f"Encontrados {len(existing_records)} registros existentes em {table_name}")
+        
+        # Cria um dicionário para busca rápida dos registros existentes, com a
+        # chave normalizada como nas demais comparações (valores do banco e do
+        # arquivo na mesma representação textual)
+        db_key_columns = [col.lower() for col in key_columns]
+        existing_dict = {
+            build_record_key(r, db_key_columns): r
+            for r in existing_records
+        }
+        
+        # Listas para armazenar registros a serem inseridos/atualizados
+        to_insert = []
+        to_update = []
+        unchanged = 0
+        
+        # Processa cada registro
+        for record in records:
+            # Cria a chave para busca
+            key = build_record_key(record, key_columns)
+            
+            if key in existing_dict:
+                # Registro existe, verifica se precisa atualizar
+                existing = existing_dict[key]
+                if self._records_are_different(record, existing):
+                    to_update.append(record)
+                else:
+                    unchanged += 1
+            else:
+                # Registro não existe, será inserido
+                to_insert.append(record)
+        
+        # Executa as operações no banco
+        counts = self._apply_changes(table_name, to_insert, to_update, key_columns)
+        inserted, updated = counts['inserted'], counts['updated']
+        
+        return {
+            'status': 'success',
+            'message': f'Sincronização concluída: {inserted} inseridos, {updated} atualizados, {unchanged} não alterados',
+            'details': {
+                'inserted': inserted,
+                'updated': updated,
+                'unchanged': unchanged,
+                'scope': scope['values'] if scope else None,
+                'mode': 'full'
+            }
+        }
+            
+    def _sync_sort_merge(self, table_name: str, data_file: str, layout_file: str, key_columns: List[str]) -> Dict[str, Any]:
+        """
+        Sincroniza o arquivo completo por ordenação externa e intercalação com
+        um cursor do banco ordenado pela chave, com memória limitada.
+        """
+        to_insert = []
+        to_update = []
+        inserted = updated = unchanged = missing = 0
+        
+        def flush():
+            nonlocal inserted, updated
+            counts = self._apply_changes(table_name, to_insert, to_update, key_columns)
+            inserted += counts['inserted']
+            updated += counts['updated']
+            to_insert.clear()
+            to_update.clear()
+        
+        collector = ScopeCollector(resolve_scope_column(key_columns))
+        with ExternalSorter() as sorter:
+            # A ordenação consome o arquivo inteiro, então o escopo já é conhecido ao abrir o cursor
+            file_rows = sorter.sort(
+                collector.collect(iter_fixed_width_file(data_file, layout_file)),
+                lambda record: build_record_key(record, key_columns)
+            )
+            scope = collector.scope()
+            db_rows = iter_db_rows_ordered(table_name, key_columns, scope)
+            if scope is None:
+                # Sem escopo, o merge-join percorre todas as chaves da tabela e do
+                # arquivo: os hashes dessas chaves formam o índice de chaves
+                self.visited_key_hashes = array('Q')
+                file_rows = collect_key_hashes(file_rows, self.visited_key_hashes)
+                db_rows = collect_key_hashes(db_rows, self.visited_key_hashes)
+            
+            for action, record, _ in merge_join(file_rows, db_rows, self._records_are_different):
+                if action == INSERT:
+                    to_insert.append(record)
+                elif action == UPDATE:
+                    to_update.append(record)
+                elif action == UNCHANGED:
+                    unchanged += 1
+                else:
+                    missing += 1
+                
+                if len(to_insert) + len(to_update) >= settings.BATCH_SIZE:
+                    flush()
+            
+            flush()
+        
+        return {
+            'status': 'success',
+            'message': f'Sincronização concluída: {inserted} inseridos, {updated} atualizados, {unchanged} não alterados',
+            'details': {
+                'inserted': inserted,
+                'updated': updated,
+                'unchanged': unchanged,
+                'missing': missing,
+                'scope': scope['values'] if scope else None,
+                'mode': 'sort_merge'
+            }
+        }
             
     def _records_are_different(self, new_record: Dict[str, Any], existing_record: Dict[str, Any]) -> bool:
         """
@@ -251,11 +736,14 @@ class DataSyncService:
         Returns:
             True se houver diferenças, False caso contrário
         """
+        # Colunas do banco estão em minúsculas, colunas do layout em maiúsculas
+        existing_lower = {k.lower(): v for k, v in existing_record.items()}
+        
         # Compara cada campo do registro
         for key, value in new_record.items():
-            # Converte o valor para string para comparação
-            new_value = str(value).strip()
-            existing_value = str(existing_record.get(key, '')).strip()
+            # Números pelo valor (float do arquivo x Decimal do banco), demais como texto
+            new_value = normalize_compare_value(value)
+            existing_value = normalize_compare_value(existing_lower.get(key.lower(), ''))
             
             if new_value != existing_value:
                 return True
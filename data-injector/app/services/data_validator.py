@@ -4,9 +4,13 @@ import json
 import logging
 import tempfile
 import os
-from typing import List, Dict, Any, Optional
+import hashlib
+from typing import List, Dict, Any, Optional, Iterator, Union
 from sqlalchemy import text, inspect
 from app.models.database import engine, SessionLocal
+from app.utils.fixed_width import LayoutPlan, get_layout_encoding, parse_lines, iter_file_records
+from app.services.prevalidation import prevalidate_fixed_width_file
+from app.utils.cache import cache
 from config import settings
 
 logger = logging.getLogger("DataValidator")
@@ -36,6 +40,11 @@ class DataValidator:
         """
         Obtém as colunas da tabela usando consulta simplificada
         """
+        cache_key = f"catalog:columns:{schema}.{table_name}"
+        columns = cache.get(cache_key)
+        if columns is not None:
+            return list(columns)
+        
         query = text("""
             SELECT column_name 
             FROM information_schema.columns 
@@ -43,7 +52,10 @@ class DataValidator:
             AND table_schema = :schema
         """)
         result = session.execute(query, {'table': table_name, 'schema': schema})
-        return [row.column_name for row in result]
+        columns = [row.column_name for row in result]
+        if columns:
+            cache.set(cache_key, tuple(columns), settings.CATALOG_CACHE_TTL)
+        return columns
 
     def parse_layout_file(self, layout_file_path: str) -> Dict[str, Any]:
         """
@@ -182,6 +194,46 @@ def parse_layout_file(layout_file_path: str) -> List[Dict[str, Any]]:
         logger.error(f"Erro ao analisar arquivo de layout: {str(e)}")
         raise
 
+def resolve_key_columns(table_name: str, layout_columns: List[Dict[str, Any]]) -> List[str]:
+    """
+    Determina as colunas do layout que identificam unicamente um registro.
+    
+    Tabelas de relacionamento (rl_*) usam todas as colunas CO_; tabelas de
+    cadastro (tb_*) usam a coluna CO_ correspondente ao nome da tabela. Em
+    ambos os casos a competência (DT_COMPETENCIA) faz parte da chave.
+    
+    Args:
+        table_name: Nome da tabela
+        layout_columns: Lista de dicionários com as configurações das colunas
+        
+    Returns:
+        Lista com os nomes das colunas chave (nomes do layout)
+    """
+    names = [col['Coluna'] for col in layout_columns]
+    if not names:
+        raise ValueError(f"Layout sem colunas para a tabela {table_name}")
+    
+    co_columns = [name for name in names if name.upper().startswith('CO_')]
+    competencia = [name for name in names if name.upper() == 'DT_COMPETENCIA']
+    
+    if table_name.lower().startswith('rl_') and co_columns:
+        return co_columns + competencia
+    
+    table_suffix = re.sub(r'^tb_', '', table_name.lower()).upper()
+    matching_columns = [name for name in co_columns if name.upper() == f"CO_{table_suffix}"]
+    if not matching_columns:
+        matching_columns = [name for name in co_columns if table_suffix in name.upper()]
+    
+    if matching_columns:
+        key = [matching_columns[0]]
+    elif co_columns:
+        key = [co_columns[0]]
+    else:
+        key = [names[0]]
+        logger.warning(f"Nenhuma coluna CO_ encontrada em {table_name}, usando primeira coluna como chave: {key[0]}")
+    
+    return key + [name for name in competencia if name not in key]
+
 def check_table_exists(table_name: str) -> bool:
     """
     Valida se a tabela existe no banco de dados.
@@ -192,6 +244,10 @@ def check_table_exists(table_name: str) -> bool:
     Returns:
         Booleano indicando se a tabela existe
     """
+    cache_key = f"catalog:table_exists:{settings.DATABASE_SCHEMA}.{table_name}"
+    if cache.get(cache_key):
+        return True
+    
     try:
         with SessionLocal() as session:
             # Verifica se a tabela existe
@@ -210,7 +266,9 @@ def check_table_exists(table_name: str) -> bool:
             if not result:
                 logger.error(f"Tabela {table_name} não encontrada no banco de dados")
                 return False
-                
+            
+            # Apenas a existência é guardada: uma tabela ausente pode ser criada a qualquer momento
+            cache.set(cache_key, True, settings.CATALOG_CACHE_TTL)
             return True
             
     except Exception as e:
@@ -230,98 +288,93 @@ def validate_fixed_width_data(data_file_path: str, layout_columns: List[Dict[str
         Booleano indicando se os dados são válidos
     """
     try:
-        # Lê o arquivo de dados
-        with open(data_file_path, 'r', encoding=encoding or 'utf-8') as f:
-            data = f.read()
+        plan = LayoutPlan(layout_columns, encoding or settings.DATA_ENCODING)
+        result = prevalidate_fixed_width_file(data_file_path, plan)
         
-        # Processa os dados usando o layout
-        from app.utils.fixed_width import parse_fixed_width_data
-        records = parse_fixed_width_data(data, layout_columns)
-        
-        if not records:
+        if result['lines_checked'] == 0:
             logger.error("Nenhum registro encontrado no arquivo")
             return False
         
-        logger.info(f"Validados {len(records)} registros do arquivo")
+        if not result['valid']:
+            for error in result['errors']:
+                logger.error(error['message'])
+            logger.error(f"Arquivo inválido: {result['error_count']} erros encontrados")
+            return False
+        
+        logger.info(f"Validados {result['lines_checked']} registros do arquivo")
         return True
         
     except Exception as e:
         logger.error(f"Erro na validação dos dados: {str(e)}")
         return False
 
-def parse_fixed_width_data(data: str, layout_file: str) -> List[Dict[str, Any]]:
+def _load_parsing_layout(layout_file: str) -> List[Dict[str, Any]]:
     """
-    Converte dados de largura fixa para lista de dicionários.
+    Carrega o layout e verifica se está no formato esperado pelo parser.
     
     Args:
-        data: String contendo os dados
         layout_file: Caminho do arquivo de layout
         
     Returns:
-        Lista de dicionários com os registros
+        Lista de dicionários com as configurações das colunas
     """
-    try:
-        # Carrega o layout
-        layout_columns = parse_layout_file(layout_file)
-        logger.info(f"Layout carregado com {len(layout_columns)} colunas")
+    layout_columns = parse_layout_file(layout_file)
+    logger.info(f"Layout carregado com {len(layout_columns)} colunas")
+    
+    # Verifica se o layout está no formato correto
+    if not isinstance(layout_columns, list):
+        raise ValueError("Layout deve ser uma lista de dicionários")
         
-        # Verifica se o layout está no formato correto
-        if not isinstance(layout_columns, list):
-            raise ValueError("Layout deve ser uma lista de dicionários")
-            
-        for col in layout_columns:
-            if not isinstance(col, dict):
-                raise ValueError("Cada coluna do layout deve ser um dicionário")
-            required_keys = ['Coluna', 'Tamanho', 'Tipo']
-            for key in required_keys:
-                if key not in col:
-                    raise ValueError(f"Coluna do layout deve ter a chave '{key}'")
+    for col in layout_columns:
+        if not isinstance(col, dict):
+            raise ValueError("Cada coluna do layout deve ser um dicionário")
+        required_keys = ['Coluna', 'Tamanho', 'Tipo']
+        for key in required_keys:
+            if key not in col:
+                raise ValueError(f"Coluna do layout deve ter a chave '{key}'")
+    
+    return layout_columns
+
+def get_layout_plan(layout_file: str) -> LayoutPlan:
+    """
+    Monta o plano de leitura em bytes do layout, com a codificação configurada para ele.
+    
+    Args:
+        layout_file: Caminho do arquivo de layout
         
-        records = []
-        lines = data.strip().split('\n')
+    Returns:
+        LayoutPlan do layout
+    """
+    # O layout chega em um diretório temporário a cada upload: a chave é o conteúdo, não o caminho
+    encoding = get_layout_encoding(layout_file)
+    with open(layout_file, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    cache_key = f"layout_plan:{digest}:{encoding}"
+    
+    plan = cache.get(cache_key)
+    if plan is None:
+        plan = LayoutPlan(_load_parsing_layout(layout_file), encoding)
+        cache.set(cache_key, plan)
+    # Cada leitura recebe sua cópia, pois os dicionários de valores são preenchidos por arquivo
+    return plan.copy()
+
+def parse_fixed_width_data(data: Union[bytes, str], layout_file: str) -> List[Dict[str, Any]]:
+    """
+    Converte dados de largura fixa para lista de dicionários.
+    
+    Args:
+        data: Conteúdo bruto do arquivo (bytes) ou texto já decodificado
+        layout_file: Caminho do arquivo de layout
         
-        logger.info(f"Processando {len(lines)} linhas de dados")
+    Returns:
+        Lista de dicionários com os registros
+    """
+    try:
+        plan = get_layout_plan(layout_file)
+        if isinstance(data, str):
+            data = data.encode(plan.encoding, errors='replace')
         
-        for line_num, line in enumerate(lines, 1):
-            if not line.strip():
-                continue
-                
-            record = {}
-            current_pos = 0
-            
-            for col in layout_columns:
-                field_name = col['Coluna']
-                field_size = int(col['Tamanho'])
-                
-                if current_pos + field_size > len(line):
-                    raise ValueError(f"Linha {line_num} muito curta para o campo {field_name}")
-                
-                value = line[current_pos:current_pos + field_size].strip()
-                
-                # Conversão de tipos consistente
-                if col['Tipo'] == 'NUMBER':
-                    # Trata valores vazios como None
-                    if not value:
-                        value = None
-                    else:
-                        try:
-                            # Remove caracteres não numéricos
-                            clean_value = re.sub(r'[^0-9.-]', '', value)
-                            value = float(clean_value) if clean_value else None
-                        except ValueError:
-                            logger.warning(f"Linha {line_num}, Coluna {field_name}: Valor não numérico '{value}', convertendo para None")
-                            value = None
-                elif col['Tipo'] == 'CHAR':
-                    # Remove espaços extras para campos CHAR
-                    value = value.strip()
-                
-                record[field_name] = value
-                current_pos += field_size
-            
-            if current_pos != len(line):
-                raise ValueError(f"Linha {line_num} mais longa que o esperado: {len(line)} vs {current_pos}")
-            
-            records.append(record)
+        records = parse_lines(data, plan)
         
         logger.info(f"Total de registros processados: {len(records)}")
         return records
@@ -330,6 +383,25 @@ def parse_fixed_width_data(data: str, layout_file: str) -> List[Dict[str, Any]]:
         logger.error(f"Erro ao processar dados: {str(e)}")
         raise ValueError(f"Erro ao processar dados: {str(e)}")
 
+def iter_fixed_width_file(data_file_path: str, layout_file: str) -> Iterator[Dict[str, Any]]:
+    """
+    Lê um arquivo de largura fixa linha a linha, sem carregá-lo inteiro em memória.
+    
+    Args:
+        data_file_path: Caminho do arquivo de dados
+        layout_file: Caminho do arquivo de layout
+        
+    Yields:
+        Dicionário com cada registro
+    """
+    plan = get_layout_plan(layout_file)
+    
+    try:
+        yield from iter_file_records(data_file_path, plan)
+    except ValueError as e:
+        logger.error(f"Erro ao processar dados: {str(e)}")
+        raise ValueError(f"Erro ao processar dados: {str(e)}")
+
 # Funções de compatibilidade para usar a nova validação com mapeamento
 def validate_database_schema_new(table_name: str, layout_file_path: str) -> bool:
     """
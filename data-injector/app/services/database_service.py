@@ -1,44 +1,194 @@
+import os
+import json
 import logging
-from typing import List, Dict, Any
+from datetime import datetime
+from typing import List, Dict, Any, Tuple
 from sqlalchemy import text
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError, DataError
+from sqlalchemy.orm import Session
 from app.models.database import SessionLocal
-from app.utils.async_utils import batch_process
-import asyncio
+from config import settings
+from app.utils.async_utils import batch_process, run_in_db_executor
 
 logger = logging.getLogger("DatabaseService")
 
-def insert_records_safely_sync(table_name: str, records: List[Dict[str, Any]]) -> bool:
-    try:
-        db = SessionLocal()
-        logger.info(f"Iniciando inserção em {table_name} ({len(records)} registros)")
+def _write_rejects(table_name: str, operation: str, rejects: List[Tuple[Dict[str, Any], str]]) -> str:
+    """
+    Grava os registros rejeitados pelo banco em um arquivo JSONL por tabela.
+    
+    Args:
+        table_name: Nome da tabela.
+        operation: Operação que falhou (insert ou update).
+        rejects: Lista de tuplas (registro, erro do banco).
         
-        if not records:
-            logger.warning("Nenhum registro para inserir")
-            return True
+    Returns:
+        Caminho do arquivo de rejeitos.
+    """
+    os.makedirs(settings.REJECT_FOLDER, exist_ok=True)
+    path = os.path.join(settings.REJECT_FOLDER, f"{table_name}.rejects.jsonl")
+    rejected_at = datetime.now().isoformat()
+    with open(path, 'a', encoding='utf-8') as f:
+        for record, error in rejects:
+            f.write(json.dumps({
+                'table': table_name,
+                'operation': operation,
+                'rejected_at': rejected_at,
+                'error': error,
+                'record': dict(record.items())
+            }, ensure_ascii=False, default=str) + "\n")
+    logger.warning(f"{len(rejects)} registros rejeitados em {table_name} gravados em {path}")
+    return path
+
+def _execute_with_bisection(db: Session, query, records: List[Dict[str, Any]],
+                            rejects: List[Tuple[Dict[str, Any], str]]) -> int:
+    """
+    Executa o lote dentro de um savepoint. Em caso de erro, divide o lote ao meio
+    e repete até isolar os registros problemáticos.
+    
+    Args:
+        db: Sessão do banco.
+        query: Comando parametrizado.
+        records: Registros do lote.
+        rejects: Lista que recebe as tuplas (registro, erro) rejeitadas.
+        
+    Returns:
+        Quantidade de registros aplicados.
+    """
+    try:
+        with db.begin_nested():
+            db.execute(query, records)
+        return len(records)
+    except (IntegrityError, DataError) as e:
+        # Apenas erros causados pelos dados são isolados; falhas de conexão sobem
+        if len(records) == 1:
+            rejects.append((records[0], str(e.orig).strip()))
+            return 0
+        middle = len(records) // 2
+        return (_execute_with_bisection(db, query, records[:middle], rejects)
+                + _execute_with_bisection(db, query, records[middle:], rejects))
 
-        # Log das colunas
-        logger.info(f"Colunas detectadas: {list(records[0].keys())}")
+def execute_in_batches(table_name: str, query, records: List[Dict[str, Any]], operation: str) -> Dict[str, Any]:
+    """
+    Executa o comando em lotes de BATCH_SIZE registros, com um commit por lote.
+    Registros rejeitados pelo banco são isolados por bisseção e gravados no
+    arquivo de rejeitos; os demais registros do lote são confirmados.
+    
+    Args:
+        table_name: Nome da tabela.
+        query: Comando parametrizado.
+        records: Lista de dicionários com os registros.
+        operation: Nome da operação, usado nos logs e no arquivo de rejeitos.
         
-        for record in records:
-            columns = ", ".join(record.keys())
-            values = ", ".join([f":{key}" for key in record.keys()])
-            query = text(f"INSERT INTO {table_name} ({columns}) VALUES ({values})")
-            db.execute(query, record)
+    Returns:
+        Dicionário com success, processed, rejected, rejected_records e reject_file.
+    """
+    processed = 0
+    rejects = []
+    db = SessionLocal()
+    try:
+        for start in range(0, len(records), settings.BATCH_SIZE):
+            batch = records[start:start + settings.BATCH_SIZE]
+            processed += _execute_with_bisection(db, query, batch, rejects)
+            db.commit()
         
-        db.commit()
-        logger.info(f"Inserção concluída em {table_name}")
-        return True
+        logger.info(f"{operation} concluído em {table_name}: {processed} aplicados, {len(rejects)} rejeitados")
+        return {
+            'success': True,
+            'processed': processed,
+            'rejected': len(rejects),
+            'rejected_records': [record for record, _ in rejects],
+            'reject_file': _write_rejects(table_name, operation, rejects) if rejects else None
+        }
     except SQLAlchemyError as e:
+        # Erro fora de um registro específico (ex.: conexão); lotes anteriores já foram confirmados
         logger.error(f"Erro em {table_name}: {str(e)}")
         db.rollback()
-        return False
+        return {
+            'success': False,
+            'error': str(e),
+            'processed': processed,
+            'rejected': len(rejects),
+            'rejected_records': [record for record, _ in rejects],
+            'reject_file': _write_rejects(table_name, operation, rejects) if rejects else None
+        }
     finally:
         db.close()
 
+def insert_records_batched(table_name: str, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Insere registros em lotes, isolando os registros rejeitados pelo banco.
+    
+    Args:
+        table_name: Nome da tabela.
+        records: Lista de dicionários com os registros.
+        
+    Returns:
+        Resultado de execute_in_batches.
+    """
+    if not records:
+        logger.warning("Nenhum registro para inserir")
+        return {'success': True, 'processed': 0, 'rejected': 0, 'rejected_records': [], 'reject_file': None}
+    
+    logger.info(f"Iniciando inserção em {table_name} ({len(records)} registros)")
+    
+    # Log das colunas
+    logger.info(f"Colunas detectadas: {list(records[0].keys())}")
+    
+    columns = ", ".join(records[0].keys())
+    values = ", ".join([f":{key}" for key in records[0].keys()])
+    query = text(f"INSERT INTO {table_name} ({columns}) VALUES ({values})")
+    return execute_in_batches(table_name, query, records, 'insert')
+
+def update_records_batched(table_name: str, records: List[Dict[str, Any]], key_columns: List[str]) -> Dict[str, Any]:
+    """
+    Atualiza registros existentes identificados pelas colunas chave, em lotes,
+    isolando os registros rejeitados pelo banco.
+    
+    Args:
+        table_name: Nome da tabela.
+        records: Lista de dicionários com os registros.
+        key_columns: Colunas que identificam o registro (nomes do layout).
+        
+    Returns:
+        Resultado de execute_in_batches.
+    """
+    if not records:
+        logger.warning("Nenhum registro para atualizar")
+        return {'success': True, 'processed': 0, 'rejected': 0, 'rejected_records': [], 'reject_file': None}
+    
+    logger.info(f"Iniciando atualização em {table_name} ({len(records)} registros)")
+    
+    set_columns = [key for key in records[0].keys() if key not in key_columns]
+    if not set_columns:
+        logger.warning(f"Nenhuma coluna além da chave para atualizar em {table_name}")
+        return {'success': True, 'processed': 0, 'rejected': 0, 'rejected_records': [], 'reject_file': None}
+    
+    set_clause = ", ".join([f"{key} = :{key}" for key in set_columns])
+    where_clause = " AND ".join([f"{key} = :{key}" for key in key_columns])
+    query = text(f"UPDATE {table_name} SET {set_clause} WHERE {where_clause}")
+    return execute_in_batches(table_name, query, records, 'update')
+
+def insert_records_safely_sync(table_name: str, records: List[Dict[str, Any]]) -> bool:
+    """
+    Insere registros em lotes. Mantido por compatibilidade.
+    
+    Returns:
+        True se a operação for concluída (registros rejeitados vão para o arquivo de rejeitos).
+    """
+    return insert_records_batched(table_name, records)['success']
+
+def update_records_safely_sync(table_name: str, records: List[Dict[str, Any]], key_columns: List[str]) -> bool:
+    """
+    Atualiza registros em lotes. Mantido por compatibilidade.
+    
+    Returns:
+        True se a operação for concluída (registros rejeitados vão para o arquivo de rejeitos).
+    """
+    return update_records_batched(table_name, records, key_columns)['success']
+
 async def insert_records_safely(table_name: str, records: List[Dict[str, Any]]) -> bool:
     """
-    Wrapper assíncrono para inserção síncrona de registros.
+    Wrapper assíncrono para inserção síncrona de registros, executada no executor de banco.
     
     Args:
         table_name: Nome da tabela.
@@ -47,4 +197,4 @@ async def insert_records_safely(table_name: str, records: List[Dict[str, Any]])
     Returns:
         True se a operação for bem-sucedida, False caso contrário.
     """
-    return await asyncio.to_thread(insert_records_safely_sync, table_name, records)
\ No newline at end of file
+    return await run_in_db_executor(insert_records_safely_sync, table_name, records)
\ No newline at end of file
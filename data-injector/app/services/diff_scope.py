@@ -0,0 +1,88 @@
+import logging
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Mapping
+from app.utils.normalization import normalize_key_value
+from config import settings
+
+logger = logging.getLogger("DiffScope")
+
+
+def resolve_scope_column(key_columns: List[str]) -> Optional[str]:
+    """
+    Escolhe a coluna que delimita a comparação (ex.: DT_COMPETENCIA).
+
+    A coluna precisa fazer parte da chave: assim um registro do arquivo só pode
+    corresponder a registros do banco com o mesmo valor e a restrição não muda
+    o resultado da comparação.
+
+    Args:
+        key_columns: Colunas chave (nomes do layout)
+
+    Returns:
+        Nome da coluna ou None se nenhuma coluna configurada fizer parte da chave
+    """
+    for column in settings.DIFF_SCOPE_COLUMNS.split(','):
+        column = column.strip()
+        if column and column in key_columns:
+            return column
+    return None
+
+
+class ScopeCollector:
+    """
+    Coleta, durante a leitura do arquivo, os valores distintos da coluna de escopo.
+    """
+
+    def __init__(self, column: Optional[str]):
+        self.column = column
+        self.values = set()
+
+    def collect(self, records: Iterable[Mapping[str, Any]]) -> Iterator[Mapping[str, Any]]:
+        """
+        Repassa os registros, registrando o valor da coluna de escopo de cada um.
+        """
+        if self.column is None:
+            yield from records
+            return
+        values = self.values
+        column = self.column
+        for record in records:
+            values.add(record[column])
+            yield record
+
+    def scope(self) -> Optional[Dict[str, Any]]:
+        """
+        Retorna o escopo encontrado no arquivo.
+
+        Returns:
+            Dicionário com 'column' e 'values', ou None quando não é possível
+            restringir (sem coluna de escopo, valores nulos ou valores demais)
+        """
+        if self.column is None or not self.values or None in self.values:
+            return None
+        if len(self.values) > settings.DIFF_SCOPE_MAX_VALUES:
+            logger.info(f"{len(self.values)} valores de {self.column} no arquivo, comparação sem restrição")
+            return None
+        return {
+            'column': self.column,
+            'values': sorted({normalize_key_value(value) for value in self.values})
+        }
+
+
+def scope_clause(scope: Optional[Dict[str, Any]], params: Dict[str, Any]) -> str:
+    """
+    Monta a condição SQL do escopo, preenchendo os parâmetros.
+
+    Args:
+        scope: Escopo retornado por ScopeCollector.scope()
+        params: Dicionário de parâmetros da consulta (alterado)
+
+    Returns:
+        Cláusula "WHERE coluna IN (...)" ou string vazia sem escopo
+    """
+    if not scope:
+        return ""
+    placeholders = []
+    for i, value in enumerate(scope['values']):
+        params[f"scope_{i}"] = value
+        placeholders.append(f":scope_{i}")
+    return f" WHERE {scope['column'].lower()} IN ({', '.join(placeholders)})"
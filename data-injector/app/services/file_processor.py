@@ -3,10 +3,11 @@ import zipfile
 import tempfile
 import logging
 import asyncio
-from typing import Tuple, Optional, List, Dict, Any
+from typing import Tuple, Optional, List, Dict, Any, Callable
 from sqlalchemy import text
 from app.models.database import SessionLocal
 from app.utils.file_utils import create_temp_dir, remove_temp_dir, is_valid_zip, get_file_name
+from app.utils.async_utils import run_in_db_executor
 from app.services.data_validator import (
     DataValidator,
     validate_database_schema_new,
@@ -15,15 +16,19 @@ from app.services.data_validator import (
     validate_database_schema, 
     validate_fixed_width_data,
     parse_fixed_width_data,
-    check_table_exists
+    check_table_exists,
+    get_layout_plan
 )
+from app.services.prevalidation import prevalidate_fixed_width_file
 from app.services.database_service import insert_records_safely
 from app.services.data_sync_service import sync_data_for_matched_tables
 from werkzeug.utils import secure_filename
 from app.utils.logger import app_logger
+from app.utils.cache import cache
 from config import settings
 import pandas as pd
 from app.services.data_sync_service import DataSyncService
+from app.services.ingestion_ledger import IngestionLedgerService, compute_file_sha256
 
 logger = logging.getLogger("FileProcessor")
 
@@ -34,6 +39,11 @@ def get_database_tables() -> List[str]:
     Returns:
         Lista de nomes de tabelas no esquema configurado.
     """
+    cache_key = f"catalog:tables:{settings.DATABASE_SCHEMA}"
+    tables = cache.get(cache_key)
+    if tables is not None:
+        return list(tables)
+    
     try:
         with SessionLocal() as session:
             query = text("""
@@ -45,6 +55,9 @@ def get_database_tables() -> List[str]:
             result = session.execute(query, {'schema': settings.DATABASE_SCHEMA})
             tables = [row.table_name for row in result]
         
+        if tables:
+            cache.set(cache_key, tuple(tables), settings.CATALOG_CACHE_TTL)
+        
         logger.info(f"Tabelas encontradas no banco de dados: {tables}")
         return tables
     
@@ -127,12 +140,14 @@ def extract_zip_file(zip_path: str) -> Dict[str, Any]:
             remove_temp_dir(temp_dir)
         return {'error': str(e)}
 
-async def process_file_upload(file):
+async def process_file_upload(file, force: bool = False):
     """
     Processa o upload de um arquivo ZIP.
     
     Args:
         file: Arquivo ZIP enviado pelo usuário
+        force: Reprocessa as tabelas mesmo que os arquivos sejam idênticos
+            aos últimos aplicados (ignora o ledger de ingestão)
         
     Returns:
         dict: Resultado do processamento
@@ -157,8 +172,35 @@ async def process_file_upload(file):
         filepath = os.path.join(settings.UPLOAD_FOLDER, filename)
         file.save(filepath)
         
+        return await process_zip_file(filepath, force=force)
+        
+    except Exception as e:
+        logger.error(f"Erro ao processar arquivo: {str(e)}")
+        return {
+            'status': 'error',
+            'message': f'Erro ao processar arquivo: {str(e)}'
+        }
+
+async def process_zip_file(filepath: str, force: bool = False,
+                           progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+    """
+    Processa um arquivo ZIP já gravado em disco, removendo-o ao final.
+    
+    O trabalho bloqueante (extração, hashes, consultas e carga) roda fora do
+    event loop, que fica livre para atender outras requisições.
+    
+    Args:
+        filepath: Caminho do arquivo ZIP
+        force: Reprocessa as tabelas mesmo que os arquivos sejam idênticos
+            aos últimos aplicados (ignora o ledger de ingestão)
+        progress: Função chamada com o resultado de cada tabela processada
+        
+    Returns:
+        dict: Resultado do processamento
+    """
+    try:
         # Extrai e processa o arquivo ZIP
-        extraction_result = extract_zip_file(filepath)
+        extraction_result = await asyncio.to_thread(extract_zip_file, filepath)
         
         if 'error' in extraction_result:
             return {
@@ -171,27 +213,51 @@ async def process_file_upload(file):
         matched_tables = extraction_result['matched_tables']
         unmatched_files = extraction_result['unmatched_files']
         
+        ledger = IngestionLedgerService()
         results = []
         for table, files in matched_tables.items():
             try:
                 data_file = os.path.join(temp_dir, files['data_file'])
                 layout_file = os.path.join(temp_dir, files['layout_file'])
                 
-                # Processa o arquivo
-                result = await process_file(data_file, layout_file, table)
-                results.append(result)
+                # Verifica se os arquivos já foram aplicados (ledger de ingestão)
+                data_hash = await asyncio.to_thread(compute_file_sha256, data_file)
+                layout_hash = await asyncio.to_thread(compute_file_sha256, layout_file)
+                entry = None if force else await run_in_db_executor(ledger.is_unchanged, table, data_hash, layout_hash)
+                if entry:
+                    logger.info(f"Arquivos de {table} idênticos aos aplicados em {entry['applied_at']}, ignorando")
+                    result = {
+                        'table': table,
+                        'status': 'success',
+                        'skipped': True,
+                        'message': f'Arquivo idêntico ao último aplicado: {entry["row_count"]} registros não alterados',
+                        'details': {
+                            'inserted': 0,
+                            'updated': 0,
+                            'unchanged': entry['row_count']
+                        }
+                    }
+                else:
+                    # Processa o arquivo
+                    result = await process_file(data_file, layout_file, table, force=force)
+                    # Com registros rejeitados, o mesmo arquivo deve poder ser reaplicado
+                    if result['status'] == 'success' and not result.get('details', {}).get('rejected'):
+                        await run_in_db_executor(ledger.record_success, table, data_hash, layout_hash, result.get('details', {}))
                 
             except Exception as e:
                 logger.error(f"Erro ao processar arquivo para tabela {table}: {str(e)}")
-                results.append({
+                result = {
                     'table': table,
                     'status': 'error',
                     'message': str(e)
-                })
+                }
+            
+            results.append(result)
+            if progress:
+                progress(result)
         
         # Limpa arquivos temporários
-        remove_temp_dir(temp_dir)
-        os.remove(filepath)
+        await asyncio.to_thread(remove_temp_dir, temp_dir)
         
         return {
             'status': 'success',
@@ -206,8 +272,43 @@ async def process_file_upload(file):
             'status': 'error',
             'message': f'Erro ao processar arquivo: {str(e)}'
         }
+    finally:
+        if os.path.exists(filepath):
+            os.remove(filepath)
 
-async def process_file(data_file: str, layout_file: str, table_name: str):
+def _prepare_file(data_file: str, layout_file: str, table_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Valida tabela, schema e arquivo antes da carga.
+    
+    Returns:
+        None se o arquivo puder ser carregado, ou o resultado de erro da pré-validação
+    """
+    # Valida se a tabela existe
+    if not check_table_exists(table_name):
+        raise ValueError(f"Tabela {table_name} não encontrada no banco de dados")
+        
+    # Valida o schema da tabela usando a nova validação com mapeamento
+    if not validate_database_schema_new(table_name, layout_file):
+        raise ValueError(f"Schema da tabela {table_name} não corresponde ao layout")
+    
+    # Obtém o mapeamento de colunas para uso posterior se necessário
+    column_mapping = get_column_mapping_for_table(table_name, layout_file)
+    logger.info(f"Mapeamento de colunas obtido: {column_mapping}")
+    
+    # Pré-valida o arquivo antes de qualquer leitura do banco
+    validation = prevalidate_fixed_width_file(data_file, get_layout_plan(layout_file))
+    if not validation['valid']:
+        logger.error(f"Arquivo de {table_name} reprovado na pré-validação: {validation['error_count']} erros")
+        return {
+            'table': table_name,
+            'status': 'error',
+            'message': f'Arquivo inválido: {validation["error_count"]} erros encontrados'
+                       + (f' (primeiro: {validation["errors"][0]["message"]})' if validation['errors'] else ''),
+            'validation': validation
+        }
+    return None
+
+async def process_file(data_file: str, layout_file: str, table_name: str, force: bool = False):
     """
     Processa um arquivo de dados de acordo com seu layout.
     
@@ -215,29 +316,20 @@ async def process_file(data_file: str, layout_file: str, table_name: str):
         data_file: Caminho do arquivo de dados
         layout_file: Caminho do arquivo de layout
         table_name: Nome da tabela no banco de dados
+        force: Compara com o banco mesmo havendo snapshot do último arquivo aplicado
         
     Returns:
         dict: Resultado do processamento
     """
     try:
-        # Lê o layout
-        layout = parse_layout_file(layout_file)
-        
-        # Valida se a tabela existe
-        if not check_table_exists(table_name):
-            raise ValueError(f"Tabela {table_name} não encontrada no banco de dados")
-            
-        # Valida o schema da tabela usando a nova validação com mapeamento
-        if not validate_database_schema_new(table_name, layout_file):
-            raise ValueError(f"Schema da tabela {table_name} não corresponde ao layout")
-        
-        # Obtém o mapeamento de colunas para uso posterior se necessário
-        column_mapping = get_column_mapping_for_table(table_name, layout_file)
-        logger.info(f"Mapeamento de colunas obtido: {column_mapping}")
+        # Validações bloqueantes (banco e leitura do arquivo) rodam no executor de banco
+        rejected = await run_in_db_executor(_prepare_file, data_file, layout_file, table_name)
+        if rejected:
+            return rejected
         
         # Usa o DataSyncService para sincronizar os dados
         sync_service = DataSyncService()
-        result = sync_service.sync_table_data(table_name, data_file, layout_file)
+        result = await run_in_db_executor(sync_service.sync_table_data, table_name, data_file, layout_file, force=force)
         
         if result['status'] == 'error':
             raise ValueError(result['message'])
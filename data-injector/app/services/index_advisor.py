@@ -0,0 +1,206 @@
+import re
+import logging
+from typing import List, Dict, Any, Optional
+from sqlalchemy import text
+from app.models.database import engine
+from app.services.diff_scope import resolve_scope_column
+from config import settings
+
+logger = logging.getLogger("IndexAdvisor")
+
+# Tamanho máximo de identificadores no PostgreSQL
+MAX_IDENTIFIER_LENGTH = 63
+
+
+# Cópia intencional de parse_index_columns/covers em geradorbpa/app/utils/index_advisor.py:
+# os serviços são implantados separadamente e não compartilham pacotes
+def parse_index_columns(indexdef: str) -> List[str]:
+    """
+    Extrai as colunas de uma definição de índice (pg_indexes.indexdef), na ordem.
+
+    Expressões (ex.: lower(col)) são mantidas como texto e não cobrem buscas
+    por coluna; índices parciais (WHERE) são ignorados.
+
+    Returns:
+        Lista de colunas ou lista vazia para índices parciais
+    """
+    if ' WHERE ' in indexdef:
+        return []
+    match = re.search(r'USING \w+ \(((?:[^()]|\([^()]*\))*)\)', indexdef)
+    if not match:
+        return []
+    columns = []
+    for part in re.split(r',\s*(?![^()]*\))', match.group(1)):
+        part = re.sub(r'\s+(ASC|DESC|NULLS FIRST|NULLS LAST)\b', '', part.strip())
+        columns.append(part.strip('"'))
+    return columns
+
+
+def covers(index_columns: List[str], lookup_columns: List[str]) -> bool:
+    """
+    Verifica se um índice B-tree atende a uma busca por igualdade nas colunas
+    informadas: as primeiras colunas do índice devem ser exatamente essas.
+    """
+    size = len(lookup_columns)
+    return size > 0 and set(index_columns[:size]) == {col.lower() for col in lookup_columns}
+
+
+def index_name_for(table_name: str, columns: List[str]) -> str:
+    return f"ix_{table_name}_{'_'.join(col.lower() for col in columns)}"[:MAX_IDENTIFIER_LENGTH]
+
+
+class IndexAdvisor:
+    """
+    Verifica se as buscas feitas na comparação com o banco (chave do registro
+    e coluna de escopo) são atendidas por índices, criando os que faltam
+    quando configurado.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger("IndexAdvisor")
+
+    def get_indexes(self, table_name: str) -> List[Dict[str, Any]]:
+        """
+        Lista os índices da tabela a partir de pg_indexes.
+
+        Returns:
+            Lista de dicionários com name, columns e valid (índices inválidos
+            sobram de um CREATE INDEX CONCURRENTLY interrompido)
+        """
+        query = text("""
+            SELECT i.indexname, i.indexdef, x.indisvalid
+            FROM pg_indexes i
+            JOIN pg_namespace n ON n.nspname = i.schemaname
+            JOIN pg_class c ON c.relname = i.indexname AND c.relnamespace = n.oid
+            JOIN pg_index x ON x.indexrelid = c.oid
+            WHERE i.schemaname = :schema AND i.tablename = :table
+        """)
+        with engine.connect() as conn:
+            rows = conn.execute(query, {'schema': settings.DATABASE_SCHEMA, 'table': table_name}).all()
+        return [
+            {'name': row.indexname, 'columns': parse_index_columns(row.indexdef), 'valid': row.indisvalid}
+            for row in rows
+        ]
+
+    def diff_lookups(self, key_columns: List[str]) -> List[Dict[str, Any]]:
+        """
+        Buscas feitas pela comparação: por chave (índice de chaves e delta) e
+        pela coluna de escopo (competências do arquivo). A coluna de escopo vai
+        à frente na chave recomendada, para que um único índice atenda às duas.
+        """
+        scope_column = resolve_scope_column(key_columns)
+        if scope_column is None:
+            return [{'lookup': 'chave', 'columns': list(key_columns)}]
+        key = [scope_column] + [col for col in key_columns if col != scope_column]
+        return [
+            {'lookup': 'chave', 'columns': key},
+            {'lookup': 'escopo', 'columns': [scope_column]}
+        ]
+
+    def advise(self, table_name: str, key_columns: List[str]) -> Dict[str, Any]:
+        """
+        Relaciona cada busca da comparação ao índice que a atende.
+
+        Args:
+            table_name: Nome da tabela
+            key_columns: Colunas chave (nomes do layout)
+
+        Returns:
+            Dicionário com as buscas (índice usado e se será index scan), os
+            índices inválidos e as colunas dos índices recomendados
+        """
+        indexes = self.get_indexes(table_name)
+        valid = [index for index in indexes if index['valid']]
+        lookups = []
+        missing = []
+        for lookup in self.diff_lookups(key_columns):
+            index = next((index for index in valid if covers(index['columns'], lookup['columns'])), None)
+            if index is None:
+                # Um índice já recomendado (chave com escopo à frente) pode atender a esta busca
+                index_columns = next((cols for cols in missing if covers([c.lower() for c in cols], lookup['columns'])), None)
+                if index_columns is None:
+                    missing.append(lookup['columns'])
+            lookups.append({
+                'lookup': lookup['lookup'],
+                'columns': [col.lower() for col in lookup['columns']],
+                'index': index['name'] if index else None,
+                'index_scan': index is not None
+            })
+        return {
+            'table': table_name,
+            'lookups': lookups,
+            'invalid': [index['name'] for index in indexes if not index['valid']],
+            'missing': [[col.lower() for col in cols] for cols in missing]
+        }
+
+    def create_index(self, table_name: str, columns: List[str]) -> str:
+        """
+        Cria um índice com CREATE INDEX CONCURRENTLY, sem bloquear escritas na tabela.
+
+        O comando não pode rodar dentro de uma transação, por isso usa uma conexão
+        em autocommit, sem o statement_timeout do pool durante a criação. Um índice
+        inválido com o mesmo nome (de uma criação interrompida) é removido antes,
+        pois o IF NOT EXISTS o daria como criado; em caso de falha, o índice
+        inválido é removido.
+
+        Returns:
+            Nome do índice criado
+        """
+        schema = settings.DATABASE_SCHEMA
+        index_name = index_name_for(table_name, columns)
+        column_list = ", ".join(col.lower() for col in columns)
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            # A criação concorrente de índices grandes excede o statement_timeout do pool
+            conn.execute(text("SET statement_timeout = 0"))
+            try:
+                invalid = conn.execute(text("""
+                    SELECT NOT x.indisvalid
+                    FROM pg_index x
+                    JOIN pg_class c ON c.oid = x.indexrelid
+                    JOIN pg_namespace n ON n.oid = c.relnamespace
+                    WHERE n.nspname = :schema AND c.relname = :index
+                """), {'schema': schema, 'index': index_name}).scalar()
+                if invalid:
+                    self.logger.warning(f"Removendo o índice inválido {index_name} antes de recriá-lo")
+                    conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {schema}.{index_name}"))
+                try:
+                    conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} ON {schema}.{table_name} ({column_list})"))
+                except Exception:
+                    conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {schema}.{index_name}"))
+                    raise
+            finally:
+                # A conexão volta ao pool: restaura o limite configurado
+                conn.execute(text(f"SET statement_timeout = {settings.DB_STATEMENT_TIMEOUT_MS}"))
+        self.logger.info(f"Índice {index_name} criado em {table_name} ({column_list})")
+        return index_name
+
+    def ensure_indexes(self, table_name: str, key_columns: List[str], create: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Verifica os índices das buscas da comparação e, se solicitado, cria os que faltam.
+
+        Args:
+            table_name: Nome da tabela
+            key_columns: Colunas chave (nomes do layout)
+            create: Cria os índices ausentes (padrão: AUTO_CREATE_INDEXES)
+
+        Returns:
+            Relatório de advise(), refeito após a criação dos índices
+        """
+        create = settings.AUTO_CREATE_INDEXES if create is None else create
+        report = self.advise(table_name, key_columns)
+        if not report['missing']:
+            return report
+
+        if not create:
+            self.logger.warning(
+                f"Buscas sem índice em {table_name} (varredura sequencial): "
+                + "; ".join(f"({', '.join(cols)})" for cols in report['missing'])
+            )
+            return report
+
+        created = []
+        for columns in report['missing']:
+            created.append(self.create_index(table_name, columns))
+        report = self.advise(table_name, key_columns)
+        report['created'] = created
+        return report
@@ -0,0 +1,117 @@
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional
+from app.models.database import SessionLocal, IngestionLedger
+
+logger = logging.getLogger("IngestionLedger")
+
+HASH_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+def compute_file_sha256(file_path: str) -> str:
+    """
+    Calcula o SHA-256 de um arquivo lendo-o em blocos.
+
+    Args:
+        file_path: Caminho do arquivo
+
+    Returns:
+        Hash SHA-256 em hexadecimal
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class IngestionLedgerService:
+    """
+    Mantém o registro (ledger) dos arquivos aplicados com sucesso em cada tabela,
+    permitindo ignorar reenvios idênticos sem reprocessar os dados.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger("IngestionLedger")
+
+    def get_entry(self, table_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Busca o último registro aplicado para a tabela.
+
+        Args:
+            table_name: Nome da tabela
+
+        Returns:
+            Dicionário com o registro ou None se a tabela nunca foi carregada
+        """
+        try:
+            with SessionLocal() as session:
+                entry = session.get(IngestionLedger, table_name)
+                if entry is None:
+                    return None
+                return {
+                    'table_name': entry.table_name,
+                    'data_sha256': entry.data_sha256,
+                    'layout_sha256': entry.layout_sha256,
+                    'row_count': entry.row_count,
+                    'inserted': entry.inserted,
+                    'updated': entry.updated,
+                    'unchanged': entry.unchanged,
+                    'applied_at': entry.applied_at
+                }
+        except Exception as e:
+            self.logger.error(f"Erro ao consultar ledger para {table_name}: {str(e)}")
+            return None
+
+    def is_unchanged(self, table_name: str, data_hash: str, layout_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Verifica se os arquivos são idênticos aos últimos aplicados na tabela.
+
+        Args:
+            table_name: Nome da tabela
+            data_hash: SHA-256 do arquivo de dados
+            layout_hash: SHA-256 do arquivo de layout
+
+        Returns:
+            O registro do ledger quando os hashes coincidem, None caso contrário
+        """
+        entry = self.get_entry(table_name)
+        if entry and entry['data_sha256'] == data_hash and entry['layout_sha256'] == layout_hash:
+            return entry
+        return None
+
+    def record_success(self, table_name: str, data_hash: str, layout_hash: str, details: Dict[str, Any]) -> bool:
+        """
+        Registra a aplicação bem-sucedida dos arquivos na tabela.
+
+        Args:
+            table_name: Nome da tabela
+            data_hash: SHA-256 do arquivo de dados
+            layout_hash: SHA-256 do arquivo de layout
+            details: Contadores da sincronização (inserted, updated, unchanged)
+
+        Returns:
+            True se o registro foi gravado com sucesso
+        """
+        inserted = int(details.get('inserted', 0))
+        updated = int(details.get('updated', 0))
+        unchanged = int(details.get('unchanged', 0))
+        try:
+            with SessionLocal() as session:
+                session.merge(IngestionLedger(
+                    table_name=table_name,
+                    data_sha256=data_hash,
+                    layout_sha256=layout_hash,
+                    row_count=inserted + updated + unchanged,
+                    inserted=inserted,
+                    updated=updated,
+                    unchanged=unchanged,
+                    applied_at=datetime.now()
+                ))
+                session.commit()
+            self.logger.info(f"Ledger atualizado para {table_name} (dados: {data_hash[:12]}, layout: {layout_hash[:12]})")
+            return True
+        except Exception as e:
+            self.logger.error(f"Erro ao atualizar ledger para {table_name}: {str(e)}")
+            return False
@@ -0,0 +1,113 @@
+import time
+import uuid
+import asyncio
+import logging
+from typing import Dict, Any, Optional, Callable, Awaitable, List
+from config import settings
+
+logger = logging.getLogger("JobManager")
+
+# Estados de um job
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCESS = 'success'
+ERROR = 'error'
+
+
+class JobManager:
+    """
+    Executa processamentos em segundo plano no event loop, limitando quantos
+    rodam ao mesmo tempo, e guarda o estado de cada um para consulta.
+    Jobs finalizados são descartados após JOB_RETENTION segundos.
+    """
+
+    def __init__(self, max_concurrent: Optional[int] = None, retention: Optional[int] = None):
+        self.max_concurrent = max_concurrent or settings.MAX_CONCURRENT_TASKS
+        self.retention = retention or settings.JOB_RETENTION
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Criado no primeiro uso, dentro do event loop do servidor
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._semaphore
+
+    def submit(self, func: Callable[..., Awaitable[Dict[str, Any]]], *args, description: str = '', **kwargs) -> Dict[str, Any]:
+        """
+        Agenda a execução de uma corotina.
+
+        A função recebe, além dos argumentos informados, o parâmetro `progress`,
+        chamado com o resultado parcial de cada etapa concluída.
+
+        Args:
+            func: Função assíncrona a executar
+            description: Descrição do job (ex.: nome do arquivo)
+
+        Returns:
+            Estado inicial do job
+        """
+        self._prune()
+        job_id = uuid.uuid4().hex
+        job = {
+            'id': job_id,
+            'description': description,
+            'status': QUEUED,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'progress': [],
+            'result': None
+        }
+        self.jobs[job_id] = job
+        self.tasks[job_id] = asyncio.create_task(self._run(job, func, args, kwargs))
+        logger.info(f"Job {job_id} agendado: {description}")
+        return self.snapshot(job)
+
+    async def _run(self, job: Dict[str, Any], func, args, kwargs) -> None:
+        try:
+            async with self.semaphore:
+                job['status'] = RUNNING
+                job['started_at'] = time.time()
+                result = await func(*args, progress=job['progress'].append, **kwargs)
+                job['result'] = result
+                job['status'] = ERROR if result.get('status') == 'error' else SUCCESS
+        except Exception as e:
+            logger.error(f"Erro no job {job['id']}: {str(e)}")
+            job['status'] = ERROR
+            job['result'] = {'status': 'error', 'message': str(e)}
+        finally:
+            job['finished_at'] = time.time()
+            self.tasks.pop(job['id'], None)
+            logger.info(f"Job {job['id']} finalizado com status {job['status']}")
+
+    @staticmethod
+    def snapshot(job: Dict[str, Any]) -> Dict[str, Any]:
+        return {**job, 'progress': list(job['progress'])}
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retorna o estado do job ou None se não existir (ou já tiver sido descartado).
+        """
+        job = self.jobs.get(job_id)
+        return self.snapshot(job) if job else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        """
+        Lista os jobs, sem os resultados detalhados.
+        """
+        self._prune()
+        return [
+            {key: job[key] for key in ('id', 'description', 'status', 'created_at', 'started_at', 'finished_at')}
+            for job in self.jobs.values()
+        ]
+
+    def _prune(self) -> None:
+        limit = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self.jobs.items() if job['finished_at'] and job['finished_at'] < limit]:
+            del self.jobs[job_id]
+
+
+job_manager = JobManager()
@@ -0,0 +1,377 @@
+import os
+import math
+import time
+import logging
+from array import array
+from typing import List, Dict, Any, Tuple, Optional, Iterable, Iterator
+import numpy as np
+from sqlalchemy import text
+from app.models.database import engine
+from app.services.snapshot_service import _digest, KEY_SEPARATOR
+from app.services.sort_merge_diff import KEY_ALIAS, SortedRow
+from config import settings
+
+logger = logging.getLogger("KeyIndex")
+
+# Capacidade mínima do filtro, para que tabelas pequenas possam crescer sem redimensionar
+MIN_BLOOM_CAPACITY = 1024
+
+
+def hash_key(key: Tuple[str, ...]) -> int:
+    """
+    Calcula o hash de 64 bits de uma chave normalizada.
+
+    Args:
+        key: Tupla com os valores normalizados das colunas chave
+
+    Returns:
+        Hash da chave
+    """
+    return _digest(KEY_SEPARATOR.join(value.encode('utf-8') for value in key))
+
+
+def hash_keys(keys: List[Tuple[str, ...]]) -> np.ndarray:
+    """
+    Calcula os hashes de uma lista de chaves normalizadas.
+    """
+    return np.fromiter((hash_key(key) for key in keys), dtype=np.uint64, count=len(keys))
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom sobre hashes de 64 bits, com posições calculadas por
+    hashing duplo a partir das duas metades do hash.
+    """
+
+    def __init__(self, num_bits: int, num_hashes: int, bits: Optional[np.ndarray] = None):
+        """
+        Inicializa o filtro.
+
+        Args:
+            num_bits: Quantidade de bits do filtro
+            num_hashes: Quantidade de funções de hash
+            bits: Vetor de bits já preenchido (ao carregar do disco)
+        """
+        self.num_bits = int(num_bits)
+        self.num_hashes = int(num_hashes)
+        self.bits = bits if bits is not None else np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, false_positive_rate: float) -> 'BloomFilter':
+        """
+        Cria um filtro dimensionado para a capacidade e a taxa de falsos positivos.
+        """
+        capacity = max(capacity, MIN_BLOOM_CAPACITY)
+        num_bits = int(math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        num_hashes = max(1, int(round(num_bits / capacity * math.log(2))))
+        return cls(num_bits, num_hashes)
+
+    @property
+    def capacity(self) -> int:
+        """
+        Quantidade de chaves suportada mantendo a taxa de falsos positivos configurada.
+        """
+        return int(self.num_bits * (math.log(2) ** 2) / -math.log(settings.KEY_INDEX_FALSE_POSITIVE_RATE))
+
+    def _positions(self, hashes: np.ndarray) -> np.ndarray:
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.num_hashes, dtype=np.uint64)
+        return (h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(self.num_bits)
+
+    def add(self, hashes: np.ndarray) -> None:
+        """
+        Adiciona os hashes ao filtro.
+        """
+        if len(hashes) == 0:
+            return
+        positions = self._positions(hashes).ravel()
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3), (1 << (positions & np.uint64(7))).astype(np.uint8))
+
+    def might_contain(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        Verifica a presença provável de cada hash.
+
+        Returns:
+            Máscara booleana; False significa que o hash certamente não está no filtro
+        """
+        if len(hashes) == 0:
+            return np.zeros(0, dtype=bool)
+        positions = self._positions(hashes)
+        bits = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return bits.all(axis=1)
+
+
+class KeyIndex:
+    """
+    Índice persistente das chaves de uma tabela: filtro de Bloom para descartar
+    rapidamente chaves ausentes e vetor ordenado dos hashes das chaves.
+
+    Os contadores de escrita da tabela (write_counters) registrados com o índice
+    permitem detectar inclusões e exclusões feitas por outros processos, que o
+    deixariam desatualizado.
+    """
+
+    def __init__(self, key_columns: List[str], key_hashes: np.ndarray, bloom: Optional[BloomFilter] = None,
+                 write_counters: Optional[Tuple[int, int]] = None):
+        """
+        Inicializa o índice.
+
+        Args:
+            key_columns: Colunas chave usadas no índice
+            key_hashes: Hashes das chaves, ordenados e sem repetição
+            bloom: Filtro de Bloom já preenchido (ao carregar do disco)
+            write_counters: Contadores (n_tup_ins, n_tup_del) da tabela quando o índice foi gravado
+        """
+        self.key_columns = list(key_columns)
+        self.key_hashes = key_hashes
+        self.bloom = bloom or self._build_bloom(key_hashes)
+        self.write_counters = write_counters
+
+    def __len__(self) -> int:
+        return len(self.key_hashes)
+
+    @classmethod
+    def from_hashes(cls, key_columns: List[str], hashes: array) -> 'KeyIndex':
+        """
+        Cria o índice a partir de hashes de chaves, com repetições e em qualquer ordem.
+
+        Args:
+            key_columns: Colunas chave usadas no índice
+            hashes: Vetor de hashes (array('Q'))
+        """
+        return cls(key_columns, np.unique(np.frombuffer(hashes, dtype=np.uint64)))
+
+    @staticmethod
+    def _build_bloom(key_hashes: np.ndarray) -> BloomFilter:
+        # Reserva espaço para o dobro das chaves atuais antes de precisar reconstruir
+        bloom = BloomFilter.for_capacity(2 * len(key_hashes), settings.KEY_INDEX_FALSE_POSITIVE_RATE)
+        bloom.add(key_hashes)
+        return bloom
+
+    def probable_hits(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        Classifica os hashes em ausências certas e presenças prováveis.
+
+        Args:
+            hashes: Hashes das chaves a verificar
+
+        Returns:
+            Máscara booleana; False significa que a chave certamente não existe na tabela
+        """
+        mask = self.bloom.might_contain(hashes)
+        candidates = np.flatnonzero(mask)
+        if len(candidates) and len(self.key_hashes):
+            positions = np.searchsorted(self.key_hashes, hashes[candidates])
+            positions = np.minimum(positions, len(self.key_hashes) - 1)
+            mask[candidates] = self.key_hashes[positions] == hashes[candidates]
+        elif len(candidates):
+            mask[:] = False
+        return mask
+
+    def add(self, hashes: Iterable[int]) -> None:
+        """
+        Adiciona novas chaves ao índice, reconstruindo o filtro quando ele
+        ultrapassa a capacidade dimensionada.
+        """
+        new_hashes = np.fromiter(hashes, dtype=np.uint64)
+        if len(new_hashes) == 0:
+            return
+        self.key_hashes = np.union1d(self.key_hashes, new_hashes)
+        if len(self.key_hashes) > self.bloom.capacity:
+            self.bloom = self._build_bloom(self.key_hashes)
+        else:
+            self.bloom.add(new_hashes)
+
+
+def _index_path(table_name: str) -> str:
+    return os.path.join(settings.INGESTION_STATE_DIR, f"{table_name}.keys.npz")
+
+
+def save_key_index(table_name: str, index: KeyIndex) -> None:
+    """
+    Persiste o índice de chaves da tabela.
+
+    Args:
+        table_name: Nome da tabela
+        index: Índice a ser gravado
+    """
+    os.makedirs(settings.INGESTION_STATE_DIR, exist_ok=True)
+    path = _index_path(table_name)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(
+            f,
+            key_columns=np.array(index.key_columns),
+            key_hash=index.key_hashes,
+            bloom_bits=index.bloom.bits,
+            bloom_params=np.array([index.bloom.num_bits, index.bloom.num_hashes], dtype=np.int64),
+            write_counters=np.array(index.write_counters or [], dtype=np.int64)
+        )
+    os.replace(tmp_path, path)
+    logger.info(f"Índice de chaves de {table_name} gravado com {len(index)} chaves")
+
+
+def load_key_index(table_name: str, key_columns: List[str]) -> Optional[KeyIndex]:
+    """
+    Carrega o índice de chaves da tabela.
+
+    Args:
+        table_name: Nome da tabela
+        key_columns: Colunas chave atuais
+
+    Returns:
+        KeyIndex ou None se não existir ou tiver sido gerado com outras colunas chave.
+        Índices gravados sem contadores de escrita voltam com write_counters None.
+    """
+    path = _index_path(table_name)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with np.load(path) as data:
+            if data['key_columns'].tolist() != list(key_columns):
+                logger.info(f"Índice de chaves de {table_name} gerado com outras colunas, ignorando")
+                return None
+            num_bits, num_hashes = data['bloom_params'].tolist()
+            bloom = BloomFilter(num_bits, num_hashes, data['bloom_bits'])
+            counters = data['write_counters'].tolist() if 'write_counters' in data.files else []
+            return KeyIndex(key_columns, data['key_hash'], bloom, tuple(counters) if counters else None)
+    except Exception as e:
+        logger.error(f"Erro ao carregar índice de chaves de {table_name}: {str(e)}")
+        return None
+
+
+def discard_key_index(table_name: str) -> None:
+    """
+    Remove o índice de chaves da tabela, forçando sua reconstrução na próxima carga.
+    """
+    path = _index_path(table_name)
+    if os.path.exists(path):
+        os.remove(path)
+        logger.info(f"Índice de chaves de {table_name} descartado")
+
+
+def read_write_counters(table_name: str) -> Optional[Tuple[int, int]]:
+    """
+    Lê os contadores cumulativos de inclusões e exclusões da tabela em
+    pg_stat_user_tables, sem percorrer a tabela.
+
+    Returns:
+        Tupla (n_tup_ins, n_tup_del) ou None se a tabela não tiver estatísticas
+    """
+    query = text(
+        "SELECT n_tup_ins, n_tup_del FROM pg_stat_user_tables "
+        "WHERE schemaname = :schema AND relname = :table"
+    )
+    with engine.connect() as conn:
+        row = conn.execute(query, {'schema': settings.DATABASE_SCHEMA, 'table': table_name.lower()}).first()
+    return (int(row[0]), int(row[1])) if row else None
+
+
+def wait_for_write_counters(table_name: str, min_inserted: int,
+                            timeout: Optional[float] = None) -> Optional[Tuple[int, int]]:
+    """
+    Lê os contadores de escrita da tabela aguardando que reflitam as inclusões
+    da carga atual: as estatísticas de cada conexão chegam a pg_stat_user_tables
+    com atraso de até alguns segundos após o commit.
+
+    Args:
+        table_name: Nome da tabela
+        min_inserted: Valor mínimo esperado de n_tup_ins
+        timeout: Tempo máximo de espera em segundos (padrão: KEY_INDEX_STATS_WAIT)
+
+    Returns:
+        Últimos contadores lidos. Se o prazo acabar antes, o índice será
+        considerado desatualizado na próxima carga, o que é seguro.
+    """
+    deadline = time.monotonic() + (settings.KEY_INDEX_STATS_WAIT if timeout is None else timeout)
+    while True:
+        counters = read_write_counters(table_name)
+        if counters is None or counters[0] >= min_inserted or time.monotonic() >= deadline:
+            return counters
+        time.sleep(0.1)
+
+
+def _key_select(key_columns: List[str]) -> Tuple[List[str], str]:
+    key_aliases = [KEY_ALIAS.format(i) for i in range(len(key_columns))]
+    key_exprs = ", ".join(
+        f"COALESCE({col.lower()}::text, '') AS {alias}"
+        for col, alias in zip(key_columns, key_aliases)
+    )
+    return key_aliases, key_exprs
+
+
+def build_key_index_from_db(table_name: str, key_columns: List[str]) -> KeyIndex:
+    """
+    Gera o índice de chaves lendo apenas as colunas chave da tabela.
+
+    Args:
+        table_name: Nome da tabela
+        key_columns: Colunas chave (nomes do layout)
+
+    Returns:
+        KeyIndex com todas as chaves da tabela
+    """
+    key_aliases, key_exprs = _key_select(key_columns)
+    query = text(f"SELECT {key_exprs} FROM {settings.DATABASE_SCHEMA}.{table_name}")
+
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=settings.BATCH_SIZE).execute(query)
+        # Os hashes vão direto para um vetor de 8 bytes por chave, sem lista intermediária
+        hashes = np.fromiter((hash_key(tuple(row)) for row in result), dtype=np.uint64)
+
+    key_hashes = np.unique(hashes)
+    logger.info(f"Índice de chaves de {table_name} gerado a partir do banco com {len(key_hashes)} chaves")
+    return KeyIndex(key_columns, key_hashes)
+
+
+def collect_key_hashes(rows: Iterable[SortedRow], hashes: array) -> Iterator[SortedRow]:
+    """
+    Repassa as tuplas (chave, registro), acrescentando o hash de cada chave a `hashes`.
+
+    Usado no merge-join para gerar o índice de chaves sem ler a tabela novamente.
+    """
+    for row in rows:
+        hashes.append(hash_key(row[0]))
+        yield row
+
+
+def fetch_existing_by_keys(table_name: str, key_columns: List[str],
+                           keys: List[Tuple[str, ...]]) -> Dict[Tuple[str, ...], Dict[str, Any]]:
+    """
+    Busca no banco os registros das chaves informadas, em lotes.
+
+    Args:
+        table_name: Nome da tabela
+        key_columns: Colunas chave (nomes do layout)
+        keys: Chaves normalizadas a buscar
+
+    Returns:
+        Dicionário chave -> registro para as chaves encontradas
+    """
+    key_aliases, key_exprs = _key_select(key_columns)
+    db_key_columns = ", ".join(col.lower() for col in key_columns)
+    existing = {}
+
+    unique_keys = list(dict.fromkeys(keys))
+    with engine.connect() as conn:
+        for start in range(0, len(unique_keys), settings.BATCH_SIZE):
+            batch = unique_keys[start:start + settings.BATCH_SIZE]
+            params = {}
+            tuples = []
+            for i, key in enumerate(batch):
+                placeholders = []
+                for j, value in enumerate(key):
+                    params[f"k{i}_{j}"] = value
+                    placeholders.append(f":k{i}_{j}")
+                tuples.append(f"({', '.join(placeholders)})")
+            query = text(
+                f"SELECT t.*, {key_exprs} FROM {settings.DATABASE_SCHEMA}.{table_name} t "
+                f"WHERE ({db_key_columns}) IN ({', '.join(tuples)})"
+            )
+            for row in conn.execute(query, params).mappings():
+                key = tuple(row[alias] for alias in key_aliases)
+                existing[key] = {name: value for name, value in row.items() if name not in key_aliases}
+
+    return existing
@@ -0,0 +1,231 @@
+import re
+import csv
+import io
+import logging
+import tempfile
+from typing import List, Dict, Any, Optional, Iterable, Mapping
+from sqlalchemy import text
+from app.models.database import engine
+from app.utils.normalization import normalize_key_value
+from config import settings
+
+logger = logging.getLogger("PartitionService")
+
+# Valor usado para NULL no COPY, para diferenciar de strings vazias
+COPY_NULL = '\\N'
+
+# Arquivos de carga ficam em memória até este tamanho antes de ir para o disco
+SPOOL_MAX_SIZE = 64 * 1024 * 1024
+
+
+def _format_copy_value(value: Any) -> Any:
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class PartitionSwapService:
+    """
+    Recarga de tabelas particionadas por competência: os dados de cada mês são
+    carregados via COPY em uma tabela avulsa, que substitui a partição antiga
+    com DETACH/ATTACH em uma única transação.
+
+    A partição substituída é mantida como <partição>_old (apenas a da última
+    troca de cada competência), para conferência ou retorno manual, a menos
+    que PARTITION_DROP_OLD esteja ativo.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger("PartitionService")
+
+    def get_partition_key(self, table_name: str) -> Optional[str]:
+        """
+        Retorna a coluna de particionamento da tabela, quando ela é particionada
+        por lista (LIST) em uma única coluna.
+
+        Args:
+            table_name: Nome da tabela
+
+        Returns:
+            Nome da coluna ou None se a tabela não for particionada dessa forma
+        """
+        query = text("""
+            SELECT pt.partstrat, pt.partnatts, a.attname
+            FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum = pt.partattrs[0]
+            WHERE n.nspname = :schema AND c.relname = :table
+        """)
+        with engine.connect() as conn:
+            row = conn.execute(query, {'schema': settings.DATABASE_SCHEMA, 'table': table_name}).first()
+
+        if row is None or row.partstrat != 'l' or row.partnatts != 1:
+            return None
+        return row.attname
+
+    def supports_swap(self, table_name: str) -> bool:
+        """
+        Verifica se a tabela pode ser recarregada por troca de partição
+        (particionada por lista em PARTITION_KEY_COLUMN).
+        """
+        if not settings.PARTITION_SWAP:
+            return False
+        try:
+            return self.get_partition_key(table_name) == settings.PARTITION_KEY_COLUMN.lower()
+        except Exception as e:
+            self.logger.warning(f"Não foi possível verificar o particionamento de {table_name}: {str(e)}")
+            return False
+
+    def find_partition(self, table_name: str, value: str) -> Optional[str]:
+        """
+        Busca a partição que contém o valor informado.
+
+        Args:
+            table_name: Nome da tabela particionada
+            value: Valor da coluna de particionamento (competência)
+
+        Returns:
+            Nome da partição ou None se não existir
+        """
+        query = text("""
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) AS bound
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            JOIN pg_namespace n ON n.oid = p.relnamespace
+            WHERE n.nspname = :schema AND p.relname = :table
+        """)
+        with engine.connect() as conn:
+            rows = conn.execute(query, {'schema': settings.DATABASE_SCHEMA, 'table': table_name}).all()
+
+        for row in rows:
+            values = [v.replace("''", "'") for v in re.findall(r"'((?:[^']|'')*)'", row.bound or '')]
+            if value in values:
+                if len(values) > 1:
+                    raise ValueError(f"Partição {row.relname} cobre mais de uma competência: {values}")
+                return row.relname
+        return None
+
+    def swap_partitions(self, table_name: str, columns: List[str], key_column: str,
+                        records: Iterable[Mapping[str, Any]]) -> Dict[str, Any]:
+        """
+        Recarrega as competências presentes nos registros, substituindo a partição
+        de cada uma por uma tabela carregada via COPY.
+
+        Args:
+            table_name: Nome da tabela particionada
+            columns: Colunas do layout, na ordem dos registros
+            key_column: Coluna de competência no layout
+            records: Registros do arquivo
+
+        Returns:
+            Dicionário com a quantidade de linhas carregadas por competência
+        """
+        buffers = self._spool_by_partition(records, columns, key_column)
+        loaded = {}
+        try:
+            for value, (buffer, row_count) in buffers.items():
+                self._swap_partition(table_name, columns, value, buffer)
+                loaded[value] = row_count
+        finally:
+            for buffer, _ in buffers.values():
+                buffer.close()
+        return loaded
+
+    def _spool_by_partition(self, records: Iterable[Mapping[str, Any]], columns: List[str], key_column: str) -> Dict[str, Any]:
+        """
+        Separa os registros por competência em arquivos CSV temporários.
+
+        A competência é normalizada como no PostgreSQL (`coluna::text`): um
+        NUMBER lido como 202401.0 vira '202401', o valor que aparece no limite
+        da partição e no nome das novas partições.
+        """
+        buffers = {}
+        for record in records:
+            value = normalize_key_value(record[key_column])
+            if value == '':
+                raise ValueError(f"Registro sem {key_column}: não é possível escolher a partição")
+            entry = buffers.get(value)
+            if entry is None:
+                buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode='w+', encoding='utf-8', newline='')
+                entry = buffers[value] = [buffer, 0, csv.writer(buffer, lineterminator='\n')]
+            entry[2].writerow([_format_copy_value(record[col]) for col in columns])
+            entry[1] += 1
+
+        for entry in buffers.values():
+            entry[0].seek(0)
+        return {value: (entry[0], entry[1]) for value, entry in buffers.items()}
+
+    def _swap_partition(self, table_name: str, columns: List[str], value: str, buffer: io.TextIOBase) -> None:
+        schema = settings.DATABASE_SCHEMA
+        key_column = settings.PARTITION_KEY_COLUMN.lower()
+        suffix = re.sub(r'\W', '_', str(value))
+        old_partition = self.find_partition(table_name, value)
+        partition_name = old_partition or f"{table_name}_p{suffix}"
+        staging = f"{table_name}_p{suffix}_new"
+        backup = f"{partition_name}_old"
+        column_list = ", ".join(col.lower() for col in columns)
+
+        raw_conn = engine.raw_connection()
+        try:
+            cursor = raw_conn.cursor()
+
+            # 1. Tabela avulsa com a estrutura da tabela particionada, carregada via COPY.
+            # Os índices são criados já na tabela avulsa, fora da troca: no ATTACH
+            # eles são apenas vinculados aos índices da tabela particionada, sem
+            # reconstrução enquanto a tabela particionada está bloqueada
+            cursor.execute(f"DROP TABLE IF EXISTS {schema}.{staging}")
+            cursor.execute(
+                f"CREATE TABLE {schema}.{staging} "
+                f"(LIKE {schema}.{table_name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING INDEXES)"
+            )
+            cursor.copy_expert(
+                f"COPY {schema}.{staging} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')",
+                buffer
+            )
+            # A restrição equivalente ao limite da partição evita a varredura de validação no ATTACH
+            cursor.execute(
+                f"ALTER TABLE {schema}.{staging} ADD CONSTRAINT {staging}_bound "
+                f"CHECK ({key_column} IS NOT NULL AND {key_column} = %s)",
+                (value,)
+            )
+            cursor.execute(f"ANALYZE {schema}.{staging}")
+            if old_partition and not settings.PARTITION_DROP_OLD:
+                # Descarta a cópia da troca anterior, fora da transação da troca
+                cursor.execute(f"DROP TABLE IF EXISTS {schema}.{backup}")
+            raw_conn.commit()
+            self.logger.info(f"Tabela {staging} carregada para a competência {value}")
+
+            # 2. Troca de partições em uma única transação, com espera limitada por locks
+            cursor.execute(f"SET LOCAL lock_timeout = {settings.PARTITION_LOCK_TIMEOUT_MS}")
+            if old_partition:
+                cursor.execute(f"ALTER TABLE {schema}.{table_name} DETACH PARTITION {schema}.{old_partition}")
+                if settings.PARTITION_DROP_OLD:
+                    cursor.execute(f"DROP TABLE {schema}.{old_partition}")
+                else:
+                    cursor.execute(f"ALTER TABLE {schema}.{old_partition} RENAME TO {backup}")
+            cursor.execute(f"ALTER TABLE {schema}.{staging} RENAME TO {partition_name}")
+            cursor.execute(
+                f"ALTER TABLE {schema}.{table_name} ATTACH PARTITION {schema}.{partition_name} FOR VALUES IN (%s)",
+                (value,)
+            )
+            cursor.execute(f"ALTER TABLE {schema}.{partition_name} DROP CONSTRAINT {staging}_bound")
+            raw_conn.commit()
+            self.logger.info(f"Partição {partition_name} de {table_name} substituída (competência {value})")
+            if old_partition and not settings.PARTITION_DROP_OLD:
+                self.logger.info(f"Partição anterior mantida como {backup}")
+
+        except Exception:
+            raw_conn.rollback()
+            # Remove a tabela avulsa para não deixar lixo em caso de falha
+            try:
+                raw_conn.cursor().execute(f"DROP TABLE IF EXISTS {schema}.{staging}")
+                raw_conn.commit()
+            except Exception as cleanup_error:
+                self.logger.error(f"Erro ao remover {staging}: {str(cleanup_error)}")
+            raise
+        finally:
+            raw_conn.close()
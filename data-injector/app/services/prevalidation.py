@@ -0,0 +1,174 @@
+import os
+import logging
+from typing import List, Dict, Any, Optional
+import numpy as np
+from app.utils.fixed_width import LayoutPlan
+from config import settings
+
+logger = logging.getLogger("PreValidation")
+
+# Bytes aceitos em campos numéricos (além de espaços de preenchimento)
+NUMERIC_BYTES = b'0123456789.- '
+
+
+class ValidationReport:
+    """
+    Acumula os erros encontrados na pré-validação, guardando apenas uma
+    amostra e indicando quando o limite de erros foi atingido.
+    """
+
+    def __init__(self, max_errors: int, sample_size: int):
+        self.max_errors = max_errors
+        self.sample_size = sample_size
+        self.error_count = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.lines_checked = 0
+        self.method = None
+
+    @property
+    def exhausted(self) -> bool:
+        return self.error_count >= self.max_errors
+
+    def add(self, line: int, error: str, message: str, column: Optional[str] = None, value: Any = None) -> None:
+        self.error_count += 1
+        if len(self.errors) < self.sample_size:
+            self.errors.append({
+                'line': line,
+                'column': column,
+                'error': error,
+                'message': message,
+                'value': value
+            })
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'valid': self.error_count == 0 and self.lines_checked > 0,
+            'method': self.method,
+            'lines_checked': self.lines_checked,
+            'error_count': self.error_count,
+            'stopped_early': self.exhausted,
+            'errors': self.errors
+        }
+
+
+def _detect_terminator(data_file_path: str, record_length: int) -> bytes:
+    with open(data_file_path, 'rb') as f:
+        f.seek(record_length)
+        return b'\r\n' if f.read(2) == b'\r\n' else b'\n'
+
+
+def _check_line(line_num: int, line: bytes, plan: LayoutPlan, report: ValidationReport) -> None:
+    """
+    Valida o tamanho e os campos numéricos de uma linha (sem o terminador).
+    """
+    if not plan.single_byte:
+        line = line.decode(plan.encoding, errors='replace')
+    if len(line) != plan.record_length:
+        report.add(line_num, 'length', f"Linha {line_num} com {len(line)} posições, esperado {plan.record_length}")
+        return
+
+    for name, start, end, is_number in plan.fields:
+        if not is_number:
+            continue
+        value = line[start:end]
+        if isinstance(value, str):
+            value = value.encode(plan.encoding, errors='replace')
+        if value.translate(None, NUMERIC_BYTES):
+            text_value = value.decode('latin-1').strip()
+            report.add(line_num, 'numeric', f"Linha {line_num}, Coluna {name}: valor não numérico '{text_value}'", name, text_value)
+
+
+def _validate_matrix(data_file_path: str, plan: LayoutPlan, terminator: bytes, report: ValidationReport) -> bool:
+    """
+    Valida o arquivo como uma matriz de bytes (linhas x colunas), sem laço por linha.
+
+    Returns:
+        False se algum terminador estiver fora de posição; nesse caso o arquivo
+        precisa ser validado linha a linha
+    """
+    stride = plan.record_length + len(terminator)
+    data = np.memmap(data_file_path, dtype=np.uint8, mode='r')
+    full = (len(data) // stride) * stride
+    matrix = data[:full].reshape(-1, stride)
+
+    # Terminadores fora da posição indicam linhas de tamanho diferente (ou linhas vazias)
+    expected = np.frombuffer(terminator, dtype=np.uint8)
+    if (matrix[:, plan.record_length:] != expected).any():
+        return False
+
+    allowed = np.zeros(256, dtype=bool)
+    allowed[np.frombuffer(NUMERIC_BYTES, dtype=np.uint8)] = True
+    invalid_lines = set()
+    for name, start, end, is_number in plan.fields:
+        if is_number:
+            invalid_lines.update(np.flatnonzero(~allowed[matrix[:, start:end]].all(axis=1)).tolist())
+
+    # Apenas as linhas com erro são revisitadas, para montar a amostra
+    for line in sorted(invalid_lines):
+        _check_line(line + 1, bytes(matrix[line, :plan.record_length]), plan, report)
+        if report.exhausted:
+            break
+
+    report.lines_checked = len(matrix)
+    if full < len(data):
+        # Última linha sem terminador
+        report.lines_checked += 1
+        _check_line(len(matrix) + 1, bytes(data[full:]), plan, report)
+    return True
+
+
+def _validate_lines(data_file_path: str, plan: LayoutPlan, report: ValidationReport) -> None:
+    """
+    Valida o arquivo linha a linha, parando ao atingir o limite de erros.
+    """
+    with open(data_file_path, 'rb') as f:
+        for line_num, line in enumerate(f, 1):
+            line = line.rstrip(b'\r\n')
+            if not line.strip():
+                continue
+            report.lines_checked += 1
+            _check_line(line_num, line, plan, report)
+
+            if report.exhausted:
+                logger.warning(f"Pré-validação interrompida na linha {line_num}: limite de {report.max_errors} erros atingido")
+                return
+
+
+def _fits_fixed_stride(file_size: int, record_length: int, stride: int) -> bool:
+    # Tamanho múltiplo do registro + terminador, com ou sem terminador na última linha
+    return file_size > 0 and file_size % stride in (0, record_length)
+
+
+def prevalidate_fixed_width_file(data_file_path: str, plan: LayoutPlan,
+                                 max_errors: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Pré-valida um arquivo de largura fixa antes da carga, sem convertê-lo em registros.
+
+    Primeiro verifica em O(1) se o tamanho do arquivo é múltiplo do tamanho do
+    registro; nesse caso valida terminadores e campos numéricos de uma vez sobre
+    a matriz de bytes. Caso contrário (ou se algum terminador estiver fora de
+    posição), valida linha a linha e para ao atingir o limite de erros.
+
+    Args:
+        data_file_path: Caminho do arquivo de dados
+        plan: Plano de leitura do layout
+        max_errors: Limite de erros antes de interromper (padrão: PREVALIDATION_MAX_ERRORS)
+
+    Returns:
+        Dicionário com valid, method, lines_checked, error_count, stopped_early e
+        uma amostra dos erros (linha, coluna, tipo, mensagem e valor)
+    """
+    report = ValidationReport(max_errors or settings.PREVALIDATION_MAX_ERRORS, settings.PREVALIDATION_ERROR_SAMPLE)
+    file_size = os.path.getsize(data_file_path)
+
+    if plan.single_byte and plan.record_length:
+        terminator = _detect_terminator(data_file_path, plan.record_length)
+        if _fits_fixed_stride(file_size, plan.record_length, plan.record_length + len(terminator)):
+            report.method = 'matrix'
+            if _validate_matrix(data_file_path, plan, terminator, report):
+                return report.to_dict()
+            report = ValidationReport(report.max_errors, report.sample_size)
+
+    report.method = 'lines'
+    _validate_lines(data_file_path, plan, report)
+    return report.to_dict()
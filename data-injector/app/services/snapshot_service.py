@@ -0,0 +1,272 @@
+import os
+import hashlib
+import logging
+from array import array
+from typing import List, Dict, Any, Tuple, Optional, Iterator
+import numpy as np
+from config import settings
+
+logger = logging.getLogger("SnapshotService")
+
+# Separador entre os campos chave ao calcular o hash da chave
+KEY_SEPARATOR = b'\x1f'
+MERGE_CHUNK_SIZE = 65536
+
+
+def _digest(data: bytes) -> int:
+    """
+    Calcula um hash de 64 bits para uma sequência de bytes.
+    """
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+def get_key_slices(layout_columns: List[Dict[str, Any]], key_columns: List[str]) -> List[Tuple[int, int]]:
+    """
+    Calcula as posições (início, fim) das colunas chave dentro de uma linha.
+
+    Args:
+        layout_columns: Lista de dicionários com as configurações das colunas
+        key_columns: Nomes das colunas chave
+
+    Returns:
+        Lista de tuplas (início, fim) na ordem de key_columns
+    """
+    positions = {}
+    current_pos = 0
+    for col in layout_columns:
+        size = int(col['Tamanho'])
+        positions[col['Coluna']] = (current_pos, current_pos + size)
+        current_pos += size
+
+    missing = [name for name in key_columns if name not in positions]
+    if missing:
+        raise ValueError(f"Colunas chave ausentes no layout: {missing}")
+
+    return [positions[name] for name in key_columns]
+
+
+class FileSnapshot:
+    """
+    Representação compacta de um arquivo de dados: hashes das chaves e das
+    linhas, ordenados pela chave, e as posições das colunas chave no layout.
+    """
+
+    def __init__(self, key_hashes: np.ndarray, line_hashes: np.ndarray,
+                 key_slices: List[Tuple[int, int]], offsets: Optional[np.ndarray] = None):
+        """
+        Inicializa o snapshot.
+
+        Args:
+            key_hashes: Hashes das chaves (ordenados)
+            line_hashes: Hashes das linhas, na mesma ordem das chaves
+            key_slices: Posições (início, fim) das colunas chave
+            offsets: Posição de cada linha no arquivo de origem (somente para o arquivo atual)
+        """
+        self.key_hashes = key_hashes
+        self.line_hashes = line_hashes
+        self.key_slices = [tuple(s) for s in key_slices]
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.key_hashes)
+
+    def iter_groups(self) -> Iterator[Tuple[int, List[Tuple[int, int]]]]:
+        """
+        Percorre o snapshot agrupando as linhas de mesma chave.
+
+        Yields:
+            Tupla (hash da chave, lista de (hash da linha, offset))
+        """
+        current_key = None
+        group = []
+        for start in range(0, len(self), MERGE_CHUNK_SIZE):
+            end = start + MERGE_CHUNK_SIZE
+            keys = self.key_hashes[start:end].tolist()
+            lines = self.line_hashes[start:end].tolist()
+            offsets = self.offsets[start:end].tolist() if self.offsets is not None else [None] * len(keys)
+            for key, line, offset in zip(keys, lines, offsets):
+                if key != current_key:
+                    if group:
+                        yield current_key, group
+                    current_key = key
+                    group = []
+                group.append((line, offset))
+        if group:
+            yield current_key, group
+
+
+def build_snapshot(data_file: str, layout_columns: List[Dict[str, Any]], key_columns: List[str]) -> FileSnapshot:
+    """
+    Gera o snapshot de um arquivo de dados em uma única passada sequencial.
+
+    Args:
+        data_file: Caminho do arquivo de dados
+        layout_columns: Lista de dicionários com as configurações das colunas
+        key_columns: Nomes das colunas chave
+
+    Returns:
+        FileSnapshot do arquivo
+    """
+    key_slices = get_key_slices(layout_columns, key_columns)
+    key_hashes = array('Q')
+    line_hashes = array('Q')
+    offsets = array('Q')
+
+    with open(data_file, 'rb') as f:
+        offset = 0
+        for raw_line in f:
+            line = raw_line.rstrip(b'\r\n')
+            if line.strip():
+                key = KEY_SEPARATOR.join(line[start:end] for start, end in key_slices)
+                key_hashes.append(_digest(key))
+                line_hashes.append(_digest(line))
+                offsets.append(offset)
+            offset += len(raw_line)
+
+    keys = np.frombuffer(key_hashes, dtype=np.uint64)
+    lines = np.frombuffer(line_hashes, dtype=np.uint64)
+    order = np.lexsort((lines, keys))
+
+    logger.info(f"Snapshot gerado para {data_file}: {len(order)} linhas")
+    return FileSnapshot(
+        keys[order],
+        lines[order],
+        key_slices,
+        np.frombuffer(offsets, dtype=np.uint64)[order]
+    )
+
+
+def _snapshot_path(table_name: str) -> str:
+    return os.path.join(settings.INGESTION_STATE_DIR, f"{table_name}.snapshot.npz")
+
+
+def save_snapshot(table_name: str, snapshot: FileSnapshot) -> None:
+    """
+    Persiste o snapshot do último arquivo aplicado na tabela.
+
+    Args:
+        table_name: Nome da tabela
+        snapshot: Snapshot a ser gravado
+    """
+    os.makedirs(settings.INGESTION_STATE_DIR, exist_ok=True)
+    path = _snapshot_path(table_name)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(
+            f,
+            key_hash=snapshot.key_hashes,
+            line_hash=snapshot.line_hashes,
+            key_slices=np.array(snapshot.key_slices, dtype=np.int64)
+        )
+    os.replace(tmp_path, path)
+    logger.info(f"Snapshot de {table_name} gravado com {len(snapshot)} linhas")
+
+
+def load_snapshot(table_name: str, key_slices: List[Tuple[int, int]]) -> Optional[FileSnapshot]:
+    """
+    Carrega o snapshot do último arquivo aplicado na tabela.
+
+    Args:
+        table_name: Nome da tabela
+        key_slices: Posições das colunas chave do layout atual
+
+    Returns:
+        FileSnapshot ou None se não existir ou tiver sido gerado com outra chave
+    """
+    path = _snapshot_path(table_name)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with np.load(path) as data:
+            stored_slices = [tuple(s) for s in data['key_slices'].tolist()]
+            if stored_slices != [tuple(s) for s in key_slices]:
+                logger.info(f"Snapshot de {table_name} gerado com outra chave, ignorando")
+                return None
+            return FileSnapshot(data['key_hash'], data['line_hash'], stored_slices)
+    except Exception as e:
+        logger.error(f"Erro ao carregar snapshot de {table_name}: {str(e)}")
+        return None
+
+
+def discard_snapshot(table_name: str) -> None:
+    """
+    Remove o snapshot da tabela, forçando uma comparação completa na próxima carga.
+    """
+    path = _snapshot_path(table_name)
+    if os.path.exists(path):
+        os.remove(path)
+        logger.info(f"Snapshot de {table_name} descartado")
+
+
+def diff_snapshots(previous: FileSnapshot, current: FileSnapshot) -> Dict[str, Any]:
+    """
+    Compara dois snapshots por intercalação (merge) sequencial das chaves ordenadas.
+
+    Args:
+        previous: Snapshot do último arquivo aplicado
+        current: Snapshot do arquivo atual (com offsets)
+
+    Returns:
+        Dicionário com os offsets das linhas adicionadas e alteradas no arquivo
+        atual e a contagem de linhas removidas e inalteradas
+    """
+    added = []
+    changed = []
+    removed = 0
+    unchanged = 0
+
+    previous_groups = previous.iter_groups()
+    current_groups = current.iter_groups()
+    prev = next(previous_groups, None)
+    cur = next(current_groups, None)
+
+    while prev is not None or cur is not None:
+        if cur is None or (prev is not None and prev[0] < cur[0]):
+            removed += len(prev[1])
+            prev = next(previous_groups, None)
+        elif prev is None or cur[0] < prev[0]:
+            added.extend(offset for _, offset in cur[1])
+            cur = next(current_groups, None)
+        else:
+            # Mesma chave: linhas idênticas são inalteradas, as demais são pareadas como alteração
+            previous_lines = [line for line, _ in prev[1]]
+            pending = []
+            for line, offset in cur[1]:
+                if line in previous_lines:
+                    previous_lines.remove(line)
+                    unchanged += 1
+                else:
+                    pending.append(offset)
+            paired = min(len(pending), len(previous_lines))
+            changed.extend(pending[:paired])
+            added.extend(pending[paired:])
+            removed += len(previous_lines) - paired
+            prev = next(previous_groups, None)
+            cur = next(current_groups, None)
+
+    return {
+        'added': added,
+        'changed': changed,
+        'removed': removed,
+        'unchanged': unchanged
+    }
+
+
+def read_lines_at(data_file: str, offsets: List[int]) -> List[bytes]:
+    """
+    Lê as linhas do arquivo que começam nos offsets informados, em ordem de arquivo.
+
+    Args:
+        data_file: Caminho do arquivo de dados
+        offsets: Posições das linhas no arquivo
+
+    Returns:
+        Lista com as linhas lidas (sem o terminador de linha)
+    """
+    lines = []
+    with open(data_file, 'rb') as f:
+        for offset in sorted(offsets):
+            f.seek(offset)
+            lines.append(f.readline().rstrip(b'\r\n'))
+    return lines
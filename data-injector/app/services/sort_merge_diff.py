@@ -0,0 +1,183 @@
+import heapq
+import logging
+import os
+import pickle
+import tempfile
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import text
+from app.models.database import engine
+from app.services.diff_scope import scope_clause
+from app.utils.file_utils import remove_temp_dir
+from config import settings
+
+logger = logging.getLogger("SortMergeDiff")
+
+# Classificações produzidas pelo merge-join
+INSERT = 'insert'
+UPDATE = 'update'
+UNCHANGED = 'unchanged'
+MISSING = 'missing'
+
+KEY_ALIAS = '_merge_key_{}'
+SPILL_BLOCK_SIZE = 1024
+
+SortedRow = Tuple[Tuple[str, ...], Dict[str, Any]]
+
+
+class ExternalSorter:
+    """
+    Ordenação externa: grava execuções (runs) ordenadas em disco e as
+    intercala, mantendo em memória no máximo `run_size` registros.
+    """
+
+    def __init__(self, run_size: Optional[int] = None):
+        """
+        Inicializa o ordenador.
+
+        Args:
+            run_size: Quantidade de registros por execução em memória
+        """
+        self.run_size = run_size or settings.SORT_RUN_SIZE
+        self.temp_dir = None
+        self.run_files: List[str] = []
+
+    def __enter__(self) -> 'ExternalSorter':
+        self.temp_dir = tempfile.mkdtemp(prefix='sort_merge_')
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        remove_temp_dir(self.temp_dir)
+        self.run_files = []
+
+    def sort(self, records: Iterable[Dict[str, Any]], key_func: Callable[[Dict[str, Any]], Tuple]) -> Iterator[SortedRow]:
+        """
+        Ordena os registros pela chave.
+
+        Args:
+            records: Registros a ordenar
+            key_func: Função que calcula a chave de um registro
+
+        Returns:
+            Iterador de tuplas (chave, registro) em ordem crescente de chave
+        """
+        run = []
+        for record in records:
+            run.append((key_func(record), record))
+            if len(run) >= self.run_size:
+                self._spill(run)
+                run = []
+
+        if not self.run_files:
+            # Tudo coube em uma única execução, não há necessidade de disco
+            run.sort(key=itemgetter(0))
+            return iter(run)
+
+        if run:
+            self._spill(run)
+
+        logger.info(f"Intercalando {len(self.run_files)} execuções ordenadas")
+        return heapq.merge(*(self._read_run(path) for path in self.run_files), key=itemgetter(0))
+
+    def _spill(self, run: List[SortedRow]) -> None:
+        run.sort(key=itemgetter(0))
+        path = os.path.join(self.temp_dir, f"run_{len(self.run_files):05d}.pkl")
+        with open(path, 'wb') as f:
+            # Grava em blocos: o pickle compartilha entre os registros do bloco os
+            # objetos repetidos (ex.: nomes das colunas dos registros do layout)
+            for start in range(0, len(run), SPILL_BLOCK_SIZE):
+                pickle.dump(run[start:start + SPILL_BLOCK_SIZE], f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.run_files.append(path)
+        logger.debug(f"Execução gravada em {path} ({len(run)} registros)")
+
+    @staticmethod
+    def _read_run(path: str) -> Iterator[SortedRow]:
+        with open(path, 'rb') as f:
+            while True:
+                try:
+                    block = pickle.load(f)
+                except EOFError:
+                    return
+                yield from block
+
+
+def iter_db_rows_ordered(table_name: str, key_columns: List[str],
+                         scope: Optional[Dict[str, Any]] = None) -> Iterator[SortedRow]:
+    """
+    Percorre os registros da tabela ordenados pela chave, usando um cursor no servidor.
+
+    A chave é lida como texto com collation "C" para que a ordem do banco
+    coincida com a ordenação de strings do Python.
+
+    Args:
+        table_name: Nome da tabela
+        key_columns: Colunas chave (nomes do layout)
+        scope: Restrição aos valores da coluna de escopo presentes no arquivo
+
+    Yields:
+        Tuplas (chave, registro) em ordem crescente de chave
+    """
+    key_aliases = [KEY_ALIAS.format(i) for i in range(len(key_columns))]
+    key_exprs = ", ".join(
+        f"(COALESCE({col.lower()}::text, '') COLLATE \"C\") AS {alias}"
+        for col, alias in zip(key_columns, key_aliases)
+    )
+    params = {}
+    query = text(
+        f"SELECT t.*, {key_exprs} FROM {settings.DATABASE_SCHEMA}.{table_name} t"
+        f"{scope_clause(scope, params)} ORDER BY {', '.join(key_aliases)}"
+    )
+
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=settings.BATCH_SIZE).execute(query, params)
+        for row in result.mappings():
+            key = tuple(row[alias] for alias in key_aliases)
+            record = {name: value for name, value in row.items() if name not in key_aliases}
+            yield key, record
+
+
+def _ensure_sorted(rows: Iterable[SortedRow], source: str) -> Iterator[SortedRow]:
+    previous = None
+    for row in rows:
+        if previous is not None and row[0] < previous:
+            raise ValueError(f"Fluxo '{source}' fora de ordem: {row[0]} após {previous}")
+        previous = row[0]
+        yield row
+
+
+def merge_join(file_rows: Iterable[SortedRow], db_rows: Iterable[SortedRow],
+               is_different: Callable[[Dict[str, Any], Dict[str, Any]], bool]) -> Iterator[Tuple[str, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]:
+    """
+    Intercala os registros do arquivo e do banco, ambos ordenados pela chave,
+    classificando cada registro.
+
+    Args:
+        file_rows: Tuplas (chave, registro) do arquivo
+        db_rows: Tuplas (chave, registro) do banco
+        is_different: Função que compara um registro do arquivo com o do banco
+
+    Yields:
+        Tuplas (classificação, registro do arquivo, registro do banco), onde a
+        classificação é INSERT, UPDATE, UNCHANGED ou MISSING (existe só no banco)
+    """
+    file_iter = _ensure_sorted(file_rows, 'arquivo')
+    db_iter = _ensure_sorted(db_rows, 'banco')
+    file_row = next(file_iter, None)
+    db_row = next(db_iter, None)
+    db_matched = False
+
+    while file_row is not None or db_row is not None:
+        if db_row is None or (file_row is not None and file_row[0] < db_row[0]):
+            yield INSERT, file_row[1], None
+            file_row = next(file_iter, None)
+        elif file_row is None or db_row[0] < file_row[0]:
+            if not db_matched:
+                yield MISSING, None, db_row[1]
+            db_row = next(db_iter, None)
+            db_matched = False
+        else:
+            action = UPDATE if is_different(file_row[1], db_row[1]) else UNCHANGED
+            yield action, file_row[1], db_row[1]
+            # Mantém o registro do banco para chaves repetidas no arquivo
+            db_matched = True
+            file_row = next(file_iter, None)
@@ -1,5 +1,11 @@
 import asyncio
-from typing import Any, Coroutine
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Coroutine
+from config import settings
+
+# Executor dedicado ao trabalho bloqueante de banco, limitado a ASYNC_WORKERS threads
+db_executor = ThreadPoolExecutor(max_workers=settings.ASYNC_WORKERS, thread_name_prefix='db-worker')
 
 async def run_async(task: Coroutine) -> Any:
     """
@@ -27,4 +33,18 @@ async def batch_process(tasks: list, batch_size: int = 10):
     for i in range(0, len(tasks), batch_size):
         batch = tasks[i:i + batch_size]
         await asyncio.gather(*batch)
-        await asyncio.sleep(0.1)  # Pequena pausa entre lotes
\ No newline at end of file
+        await asyncio.sleep(0.1)  # Pequena pausa entre lotes
+
+async def run_in_db_executor(func: Callable, *args, **kwargs) -> Any:
+    """
+    Executa uma função bloqueante de banco no executor dedicado.
+    
+    Args:
+        func: Função a ser executada.
+        *args, **kwargs: Argumentos da função.
+        
+    Returns:
+        Resultado da função.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(func, *args, **kwargs))
@@ -1,99 +1,240 @@
-from typing import Any, Optional, Dict
+from typing import Any, Optional, Dict, Set, Callable
+import sys
 import time
+import threading
+from collections import OrderedDict
 from threading import Lock
 from app.utils.logger import app_logger
+from config import settings
+
+# Separador de namespaces nas chaves (ex.: "catalog:columns:public.tb_cid")
+NAMESPACE_SEPARATOR = ':'
+
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """
+    Estima o tamanho em bytes de um valor, percorrendo até dois níveis de
+    contêineres. Objetos com `nbytes` (arrays NumPy) usam esse valor.
+    """
+    nbytes = getattr(value, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes
+    size = sys.getsizeof(value)
+    if _depth >= 2:
+        return size
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _depth + 1) for item in value)
+    elif hasattr(value, '__dict__'):
+        size += estimate_size(vars(value), _depth + 1)
+    return size
+
 
 class Cache:
     """
     Classe para gerenciamento de cache em memória.
+
+    Limitado por quantidade de entradas e por bytes, com descarte das entradas
+    usadas há mais tempo (LRU). Entradas expiradas são removidas no acesso e
+    por uma thread de limpeza a cada CACHE_CLEANUP_INTERVAL segundos. As chaves
+    são indexadas por namespace, de modo que a invalidação por prefixo percorre
+    apenas as chaves afetadas.
     """
-    
-    def __init__(self):
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 cleanup_interval: Optional[int] = None):
         """
         Inicializa o cache em memória.
+
+        Args:
+            max_entries: Quantidade máxima de entradas (padrão: CACHE_MAX_ENTRIES)
+            max_bytes: Tamanho máximo estimado em bytes (padrão: CACHE_MAX_BYTES)
+            cleanup_interval: Intervalo da limpeza de expirados em segundos (padrão: CACHE_CLEANUP_INTERVAL)
         """
-        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._cache: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._prefixes: Dict[str, Set[str]] = {}
         self._lock = Lock()
         self.logger = app_logger
+        self.max_entries = max_entries or settings.CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes or settings.CACHE_MAX_BYTES
+        self.cleanup_interval = cleanup_interval or settings.CACHE_CLEANUP_INTERVAL
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _key_prefixes(key: str):
+        # "a:b:c" -> "a:", "a:b:"
+        position = key.find(NAMESPACE_SEPARATOR)
+        while position != -1:
+            yield key[:position + 1]
+            position = key.find(NAMESPACE_SEPARATOR, position + 1)
+
+    def _remove(self, key: str) -> None:
+        item = self._cache.pop(key)
+        self.total_bytes -= item['size']
+        for prefix in self._key_prefixes(key):
+            keys = self._prefixes.get(prefix)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._prefixes[prefix]
+
+    def _evict(self) -> None:
+        while self._cache and (len(self._cache) > self.max_entries or self.total_bytes > self.max_bytes):
+            key = next(iter(self._cache))
+            self._remove(key)
+            self.evictions += 1
 
     def get(self, key: str) -> Optional[Any]:
         """
         Obtém um valor do cache.
-        
+
         Args:
             key: Chave do cache
-            
+
         Returns:
             Optional[Any]: Valor armazenado ou None
         """
         try:
             with self._lock:
-                if key not in self._cache:
+                item = self._cache.get(key)
+                if item is None:
+                    self.misses += 1
                     return None
-                    
-                item = self._cache[key]
+
                 if item['expires_at'] and time.time() > item['expires_at']:
-                    del self._cache[key]
+                    self._remove(key)
+                    self.expirations += 1
+                    self.misses += 1
                     return None
-                    
+
+                self._cache.move_to_end(key)
+                self.hits += 1
                 return item['value']
-                
+
         except Exception as e:
             self.logger.error(f"Erro ao obter valor do cache para chave {key}: {str(e)}")
             return None
 
-    def set(self, key: str, value: Any, expire: int = 3600) -> bool:
+    def set(self, key: str, value: Any, expire: Optional[int] = None, size: Optional[int] = None) -> bool:
         """
         Armazena um valor no cache.
-        
+
         Args:
             key: Chave do cache
             value: Valor a ser armazenado
-            expire: Tempo de expiração em segundos
-            
+            expire: Tempo de expiração em segundos (padrão: CACHE_EXPIRE_TIME; 0 não expira)
+            size: Tamanho do valor em bytes (estimado quando não informado)
+
         Returns:
             bool: True se o valor foi armazenado com sucesso
         """
         try:
+            expire = settings.CACHE_EXPIRE_TIME if expire is None else expire
+            size = estimate_size(value) if size is None else size
+            if size > self.max_bytes:
+                self.logger.warning(f"Valor de {size} bytes excede o limite do cache, chave {key} não armazenada")
+                return False
+
+            self._ensure_sweeper()
             with self._lock:
+                if key in self._cache:
+                    self._remove(key)
                 self._cache[key] = {
                     'value': value,
-                    'expires_at': time.time() + expire if expire else None
+                    'expires_at': time.time() + expire if expire else None,
+                    'size': size
                 }
+                self.total_bytes += size
+                for prefix in self._key_prefixes(key):
+                    self._prefixes.setdefault(prefix, set()).add(key)
+                self._evict()
                 return True
-                
+
         except Exception as e:
             self.logger.error(f"Erro ao armazenar valor no cache para chave {key}: {str(e)}")
             return False
 
+    def get_or_set(self, key: str, loader: Callable[[], Any], expire: Optional[int] = None) -> Any:
+        """
+        Obtém um valor do cache ou o carrega e armazena.
+
+        Args:
+            key: Chave do cache
+            loader: Função que calcula o valor quando ele não está no cache
+            expire: Tempo de expiração em segundos
+
+        Returns:
+            Any: Valor armazenado ou carregado
+        """
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.set(key, value, expire)
+        return value
+
     def delete(self, key: str) -> bool:
         """
         Remove um valor do cache.
-        
+
         Args:
             key: Chave do cache
-            
+
         Returns:
             bool: True se o valor foi removido com sucesso
         """
         try:
             with self._lock:
                 if key in self._cache:
-                    del self._cache[key]
+                    self._remove(key)
                     return True
                 return False
-                
+
         except Exception as e:
             self.logger.error(f"Erro ao remover valor do cache para chave {key}: {str(e)}")
             return False
 
+    def clear_prefix(self, prefix: str) -> int:
+        """
+        Remove todos os valores de um namespace (chaves iniciadas pelo prefixo).
+
+        Prefixos terminados no separador (ex.: "catalog:") usam o índice de
+        namespaces; outros prefixos percorrem todas as chaves.
+
+        Args:
+            prefix: Prefixo das chaves a serem removidas
+
+        Returns:
+            int: Quantidade de valores removidos
+        """
+        try:
+            with self._lock:
+                if prefix.endswith(NAMESPACE_SEPARATOR):
+                    keys_to_delete = list(self._prefixes.get(prefix, ()))
+                else:
+                    keys_to_delete = [key for key in self._cache if key.startswith(prefix)]
+                for key in keys_to_delete:
+                    self._remove(key)
+                return len(keys_to_delete)
+
+        except Exception as e:
+            self.logger.error(f"Erro ao limpar cache com prefixo {prefix}: {str(e)}")
+            return 0
+
     def clear_pattern(self, pattern: str) -> bool:
         """
         Remove todos os valores que correspondem a um padrão.
-        
+
         Args:
             pattern: Padrão de chaves a serem removidas
-            
+
         Returns:
             bool: True se os valores foram removidos com sucesso
         """
@@ -104,16 +245,19 @@ class Cache:
                     if pattern in key
                 ]
                 for key in keys_to_delete:
-                    del self._cache[key]
+                    self._remove(key)
                 return True
-                
+
         except Exception as e:
             self.logger.error(f"Erro ao limpar cache com padrão {pattern}: {str(e)}")
             return False
 
-    def clear_expired(self) -> None:
+    def clear_expired(self) -> int:
         """
         Remove todos os valores expirados do cache.
+
+        Returns:
+            int: Quantidade de valores removidos
         """
         try:
             with self._lock:
@@ -123,10 +267,66 @@ class Cache:
                     if item['expires_at'] and current_time > item['expires_at']
                 ]
                 for key in expired_keys:
-                    del self._cache[key]
-                    
+                    self._remove(key)
+                self.expirations += len(expired_keys)
+                return len(expired_keys)
+
         except Exception as e:
             self.logger.error(f"Erro ao limpar cache expirado: {str(e)}")
+            return 0
+
+    def clear(self) -> None:
+        """
+        Remove todos os valores do cache.
+        """
+        with self._lock:
+            self._cache.clear()
+            self._prefixes.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna as estatísticas de uso do cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._cache),
+                'bytes': self.total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+    def _ensure_sweeper(self) -> None:
+        # Iniciada no primeiro uso, para não criar threads antes do fork dos workers
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        with self._lock:
+            if self._sweeper is not None and self._sweeper.is_alive():
+                return
+            self._stop.clear()
+            self._sweeper = threading.Thread(target=self._sweep, name='cache-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def _sweep(self) -> None:
+        while not self._stop.wait(self.cleanup_interval):
+            removed = self.clear_expired()
+            if removed:
+                self.logger.debug(f"Limpeza do cache: {removed} valores expirados removidos")
+
+    def stop_sweeper(self) -> None:
+        """
+        Interrompe a thread de limpeza.
+        """
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout=1)
+            self._sweeper = None
 
 # Instância global do cache
-cache = Cache() 
\ No newline at end of file
+cache = Cache()
@@ -1,9 +1,25 @@
 import re
+import os
+import copy
+import codecs
+import keyword
 import logging
-from typing import List, Dict, Any
+from collections.abc import Mapping
+from itertools import islice
+from typing import List, Dict, Any, Optional, Iterator, Union, Tuple, Type
+from config import settings
 
 logger = logging.getLogger(__name__)
 
+# Bytes removidos de campos numéricos antes da conversão (tudo exceto dígitos, ponto e sinal)
+NON_NUMERIC_BYTES = bytes(b for b in range(256) if b not in b'0123456789.-')
+
+# Marcador de ausência no dicionário de valores (None é um valor válido)
+_MISSING = object()
+
+# Codificações em que cada caractere ocupa exatamente um byte
+SINGLE_BYTE_ENCODINGS = {'latin-1', 'iso8859-1', 'iso8859-15', 'cp1252', 'ascii'}
+
 def parse_fixed_width_data(data: str, layout_file: str) -> List[Dict[str, Any]]:
     """
     Processa dados em formato fixed-width usando um arquivo de layout.
@@ -76,4 +92,286 @@ def parse_fixed_width_data(data: str, layout_file: str) -> List[Dict[str, Any]]:
         
     except Exception as e:
         logger.error(f"Erro ao processar dados fixed-width: {str(e)}")
-        raise 
\ No newline at end of file
+        raise 
+
+def get_layout_encoding(layout_file: str) -> str:
+    """
+    Retorna a codificação dos arquivos de dados de um layout.
+    
+    A codificação padrão é DATA_ENCODING e pode ser sobrescrita por tabela em
+    LAYOUT_ENCODINGS (ex.: "tb_procedimento:cp1252,rl_excecao:utf-8").
+    
+    Args:
+        layout_file: Caminho do arquivo de layout (<tabela>_layout.txt)
+        
+    Returns:
+        Nome da codificação
+    """
+    table_name = os.path.basename(layout_file).lower()
+    for suffix in ('.txt', '_layout'):
+        if table_name.endswith(suffix):
+            table_name = table_name[:-len(suffix)]
+    
+    overrides = {}
+    for item in settings.LAYOUT_ENCODINGS.split(','):
+        if ':' in item:
+            name, encoding = item.split(':', 1)
+            overrides[name.strip().lower()] = encoding.strip()
+    
+    return overrides.get(table_name, settings.DATA_ENCODING)
+
+
+class LayoutRecord(Mapping):
+    """
+    Base dos registros gerados por layout: os valores ficam em __slots__ e os
+    nomes das colunas são compartilhados pela classe, mas o registro continua
+    acessível como um mapeamento somente leitura (record['CO_X'], keys(), items()).
+    """
+    
+    __slots__ = ()
+    _columns: Tuple[str, ...] = ()
+    _slot_for: Dict[str, str] = {}
+    
+    def __getitem__(self, column: str) -> Any:
+        try:
+            slot = self._slot_for[column]
+        except KeyError:
+            raise KeyError(column) from None
+        return getattr(self, slot)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._columns)
+    
+    def __len__(self) -> int:
+        return len(self._columns)
+    
+    def __contains__(self, column: object) -> bool:
+        return column in self._slot_for
+    
+    def values(self) -> List[Any]:
+        return [getattr(self, slot) for slot in self.__slots__]
+    
+    def items(self) -> List[Tuple[str, Any]]:
+        return list(zip(self._columns, self.values()))
+    
+    def __reduce__(self):
+        return (_rebuild_record, (self._columns, tuple(self.values())))
+    
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self.items())})"
+
+
+_record_classes: Dict[Tuple[str, ...], Type[LayoutRecord]] = {}
+
+
+def _slot_names(columns: Tuple[str, ...]) -> List[str]:
+    # Usa o nome da coluna como slot quando possível; senão, um nome posicional
+    reserved = set(dir(LayoutRecord))
+    slots = []
+    for i, column in enumerate(columns):
+        if column.isidentifier() and not keyword.iskeyword(column) and column not in reserved and column not in slots:
+            slots.append(column)
+        else:
+            slots.append(f"_f{i}")
+    return slots
+
+
+def record_class_for(columns: Tuple[str, ...]) -> Type[LayoutRecord]:
+    """
+    Retorna (gerando na primeira chamada) a classe de registro das colunas informadas.
+    
+    Args:
+        columns: Nomes das colunas, na ordem do layout
+        
+    Returns:
+        Subclasse de LayoutRecord com um slot por coluna
+    """
+    columns = tuple(columns)
+    record_class = _record_classes.get(columns)
+    if record_class is None:
+        slots = _slot_names(columns)
+        # __init__ gerado com argumentos posicionais, como em namedtuple
+        args = ", ".join(f"v{i}" for i in range(len(slots)))
+        body = "".join(f"\n    self.{slot} = v{i}" for i, slot in enumerate(slots)) or "\n    pass"
+        namespace = {}
+        exec(f"def __init__(self, {args}):{body}", namespace)
+        record_class = type(f"LayoutRecord{len(_record_classes)}", (LayoutRecord,), {
+            '__slots__': tuple(slots),
+            '__init__': namespace['__init__'],
+            '_columns': columns,
+            '_slot_for': dict(zip(columns, slots))
+        })
+        _record_classes[columns] = record_class
+    return record_class
+
+
+def _rebuild_record(columns: Tuple[str, ...], values: Tuple[Any, ...]) -> LayoutRecord:
+    return record_class_for(columns)(*values)
+
+
+class LayoutPlan:
+    """
+    Plano de leitura pré-calculado de um layout: posições de cada campo e se
+    ele é numérico, para fatiar as linhas diretamente em bytes.
+    """
+    
+    def __init__(self, layout_columns: List[Dict[str, Any]], encoding: str):
+        """
+        Inicializa o plano.
+        
+        Args:
+            layout_columns: Lista de dicionários com as configurações das colunas
+            encoding: Codificação dos campos de texto
+        """
+        self.encoding = encoding
+        self.single_byte = codecs.lookup(encoding).name in SINGLE_BYTE_ENCODINGS
+        self.fields = []
+        current_pos = 0
+        for col in layout_columns:
+            size = int(col['Tamanho'])
+            self.fields.append((col['Coluna'], current_pos, current_pos + size, col['Tipo'] == 'NUMBER'))
+            current_pos += size
+        self.record_length = current_pos
+        self.record_class = record_class_for(tuple(self.columns))
+        # Dicionário de valores por campo (None quando a coluna não é codificada)
+        self.dictionaries: List[Optional[Dict[Any, Any]]] = [None] * len(self.fields)
+    
+    @property
+    def columns(self) -> List[str]:
+        return [name for name, _, _, _ in self.fields]
+    
+    def copy(self) -> 'LayoutPlan':
+        """
+        Cópia do plano sem dicionários, para ler outro arquivo a partir de um plano em cache.
+        """
+        plan = copy.copy(self)
+        plan.dictionaries = [None] * len(self.fields)
+        return plan
+    
+    def enable_dictionary_encoding(self, sample_lines: List[bytes]) -> List[str]:
+        """
+        Ativa a codificação por dicionário nas colunas de baixa cardinalidade,
+        conforme a proporção de valores distintos na amostra: até
+        DICTIONARY_PREFIX_MAX_DISTINCT_RATIO nas colunas de prefixo configurado
+        em DICTIONARY_COLUMN_PREFIXES e até DICTIONARY_MAX_DISTINCT_RATIO nas
+        demais. Colunas de valores únicos (ex.: CO_PROCEDIMENTO em
+        tb_procedimento) ficam de fora mesmo com o prefixo, já que o dicionário
+        só ocuparia memória. Ocorrências repetidas do mesmo valor passam a
+        compartilhar um único objeto.
+        
+        Args:
+            sample_lines: Primeiras linhas do arquivo (sem o terminador)
+            
+        Returns:
+            Nomes das colunas codificadas
+        """
+        if not settings.DICTIONARY_ENCODING:
+            return []
+        
+        prefixes = tuple(p.strip() for p in settings.DICTIONARY_COLUMN_PREFIXES.split(',') if p.strip())
+        sample = [line for line in sample_lines if line.strip()]
+        encoded = []
+        if not sample:
+            return []
+        for i, (name, start, end, _) in enumerate(self.fields):
+            if name.startswith(prefixes):
+                max_ratio = settings.DICTIONARY_PREFIX_MAX_DISTINCT_RATIO
+            else:
+                max_ratio = settings.DICTIONARY_MAX_DISTINCT_RATIO
+            if len({line[start:end] for line in sample}) / len(sample) <= max_ratio:
+                self.dictionaries[i] = {}
+                encoded.append(name)
+        
+        if encoded:
+            logger.debug(f"Colunas com codificação por dicionário: {encoded}")
+        return encoded
+
+
+def _parse_number(value: Union[bytes, str], line_num: int, field_name: str) -> Optional[float]:
+    if isinstance(value, bytes):
+        clean_value = value.translate(None, NON_NUMERIC_BYTES)
+    else:
+        clean_value = re.sub(r'[^0-9.-]', '', value)
+    if not clean_value:
+        return None
+    try:
+        return float(clean_value)
+    except ValueError:
+        logger.warning(f"Linha {line_num}, Coluna {field_name}: Valor não numérico '{value}', convertendo para None")
+        return None
+
+
+def parse_line(line: bytes, line_num: int, plan: LayoutPlan) -> LayoutRecord:
+    """
+    Converte uma linha de largura fixa (em bytes, sem o terminador) em um registro.
+    
+    Campos NUMBER são convertidos direto dos bytes; apenas os demais campos são
+    decodificados, com a codificação do layout. Colunas com codificação por
+    dicionário reaproveitam o valor já convertido para os mesmos bytes.
+    
+    Args:
+        line: Linha de dados
+        line_num: Número da linha, usado nas mensagens de erro
+        plan: Plano de leitura do layout
+        
+    Returns:
+        Registro da classe gerada para o layout
+    """
+    if not plan.single_byte:
+        # Em codificações multibyte as posições do layout são em caracteres
+        line = line.decode(plan.encoding, errors='replace')
+    
+    if len(line) < plan.record_length:
+        for name, start, end, _ in plan.fields:
+            if end > len(line):
+                raise ValueError(f"Linha {line_num} muito curta para o campo {name}")
+    if len(line) > plan.record_length:
+        raise ValueError(f"Linha {line_num} mais longa que o esperado: {len(line)} vs {plan.record_length}")
+    
+    values = []
+    for (name, start, end, is_number), dictionary in zip(plan.fields, plan.dictionaries):
+        raw = line[start:end].strip()
+        if dictionary is not None:
+            value = dictionary.get(raw, _MISSING)
+            if value is not _MISSING:
+                values.append(value)
+                continue
+        
+        if is_number:
+            value = _parse_number(raw, line_num, name) if raw else None
+        elif isinstance(raw, bytes):
+            value = raw.decode(plan.encoding, errors='replace')
+        else:
+            value = raw
+        
+        if dictionary is not None and len(dictionary) < settings.DICTIONARY_MAX_VALUES:
+            dictionary[raw] = value
+        values.append(value)
+    return plan.record_class(*values)
+
+
+def parse_lines(data: bytes, plan: LayoutPlan) -> List[LayoutRecord]:
+    """
+    Converte o conteúdo bruto de um arquivo de largura fixa em registros.
+    Aceita terminadores de linha LF e CRLF e ignora linhas vazias.
+    """
+    lines = data.splitlines()
+    plan.enable_dictionary_encoding(lines[:settings.DICTIONARY_SAMPLE_LINES])
+    return [
+        parse_line(line, line_num, plan)
+        for line_num, line in enumerate(lines, 1)
+        if line.strip()
+    ]
+
+
+def iter_file_records(data_file_path: str, plan: LayoutPlan) -> Iterator[LayoutRecord]:
+    """
+    Lê um arquivo de largura fixa em modo binário, linha a linha.
+    """
+    with open(data_file_path, 'rb') as f:
+        plan.enable_dictionary_encoding([line.rstrip(b'\r\n') for line in islice(f, settings.DICTIONARY_SAMPLE_LINES)])
+        f.seek(0)
+        for line_num, line in enumerate(f, 1):
+            line = line.rstrip(b'\r\n')
+            if line.strip():
+                yield parse_line(line, line_num, plan)
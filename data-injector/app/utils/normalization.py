@@ -0,0 +1,55 @@
+from decimal import Decimal
+from typing import Any, Dict, List, Tuple
+
+
+def normalize_key_value(value: Any) -> str:
+    """
+    Normaliza um valor de coluna chave para a mesma representação textual
+    usada pelo PostgreSQL em `COALESCE(coluna::text, '')`.
+    
+    Args:
+        value: Valor vindo do arquivo
+        
+    Returns:
+        Valor normalizado como string
+    """
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def build_record_key(record: Dict[str, Any], key_columns: List[str]) -> Tuple[str, ...]:
+    """
+    Monta a chave normalizada de um registro do arquivo.
+    
+    Args:
+        record: Registro do arquivo
+        key_columns: Colunas chave (nomes do layout)
+        
+    Returns:
+        Tupla com os valores normalizados das colunas chave
+    """
+    return tuple(normalize_key_value(record[col]) for col in key_columns)
+
+
+def normalize_compare_value(value: Any) -> str:
+    """
+    Normaliza um valor para a comparação entre o registro do arquivo e o do banco.
+    
+    Números são comparados pelo valor: o float lido do arquivo (10.0) e o
+    NUMERIC do banco (Decimal('10') ou Decimal('10.00')) resultam em '10'.
+    Os demais valores são comparados como texto, sem brancos nas pontas.
+    
+    Args:
+        value: Valor do arquivo ou do banco
+        
+    Returns:
+        Valor normalizado como string
+    """
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        number = Decimal(repr(value)) if isinstance(value, float) else Decimal(value)
+        if number.is_finite():
+            return format(number.normalize(), 'f')
+    return str(value).strip()
@@ -0,0 +1,172 @@
+import os
+import uuid
+import logging
+from typing import Dict, Any, List, Optional
+import aiofiles
+from multipart.multipart import MultipartParser, parse_options_header
+from werkzeug.utils import secure_filename
+from config import settings
+
+logger = logging.getLogger("UploadStream")
+
+
+class UploadError(Exception):
+    """
+    Erro no recebimento do upload, com o status HTTP a ser retornado.
+    """
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _MultipartReceiver:
+    """
+    Estado do parser multipart: o conteúdo do campo de arquivo é acumulado em
+    blocos pendentes, gravados em disco de forma assíncrona após cada parte do
+    corpo recebida; os demais campos ficam em memória.
+    """
+
+    def __init__(self, file_field: str, upload_dir: str):
+        self.file_field = file_field
+        self.upload_dir = upload_dir
+        self.fields: Dict[str, str] = {}
+        self.filename: Optional[str] = None
+        self.path: Optional[str] = None
+        self.size = 0
+        self.pending: List[bytes] = []
+        self.handle = None
+        self._header_field = b''
+        self._header_value = b''
+        self._headers: Dict[bytes, bytes] = {}
+        self._part_name: Optional[str] = None
+        self._part_is_file = False
+        self._part_value: List[bytes] = []
+
+    @property
+    def callbacks(self) -> Dict[str, Any]:
+        return {
+            'on_part_begin': self.on_part_begin,
+            'on_header_field': self.on_header_field,
+            'on_header_value': self.on_header_value,
+            'on_header_end': self.on_header_end,
+            'on_headers_finished': self.on_headers_finished,
+            'on_part_data': self.on_part_data,
+            'on_part_end': self.on_part_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+        self._part_value = []
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b''
+        self._header_value = b''
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b'content-disposition', b''))
+        self._part_name = options.get(b'name', b'').decode('utf-8', errors='replace')
+        filename = options.get(b'filename')
+        self._part_is_file = filename is not None and self._part_name == self.file_field
+        if self._part_is_file:
+            if self.path is not None:
+                raise UploadError(f"Mais de um arquivo no campo '{self.file_field}'")
+            self.filename = filename.decode('utf-8', errors='replace')
+            # Nome único: uploads simultâneos do mesmo arquivo não se sobrescrevem
+            self.path = os.path.join(self.upload_dir, f"{uuid.uuid4().hex}_{secure_filename(self.filename) or 'upload'}")
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._part_is_file:
+            self.pending.append(data[start:end])
+            self.size += end - start
+        else:
+            self._part_value.append(data[start:end])
+
+    def on_part_end(self) -> None:
+        if not self._part_is_file and self._part_name:
+            self.fields[self._part_name] = b''.join(self._part_value).decode('utf-8', errors='replace')
+        self._part_is_file = False
+
+    async def flush(self) -> None:
+        if not self.pending:
+            return
+        if self.handle is None:
+            self.handle = await aiofiles.open(self.path, 'wb')
+        data = b''.join(self.pending)
+        self.pending = []
+        await self.handle.write(data)
+
+    async def close(self) -> None:
+        if self.handle is not None:
+            await self.handle.close()
+            self.handle = None
+
+
+async def receive_upload(request, file_field: str = 'file', upload_dir: Optional[str] = None,
+                         max_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Recebe um upload multipart/form-data gravando o arquivo em disco à medida
+    que o corpo da requisição chega, sem carregá-lo inteiro em memória.
+
+    Args:
+        request: Requisição Starlette
+        file_field: Nome do campo com o arquivo
+        upload_dir: Pasta de destino (padrão: UPLOAD_FOLDER)
+        max_size: Tamanho máximo do corpo em bytes (padrão: MAX_CONTENT_LENGTH)
+
+    Returns:
+        Dicionário com filename, path, size e os demais campos do formulário
+
+    Raises:
+        UploadError: Requisição inválida, sem arquivo ou acima do tamanho máximo
+    """
+    upload_dir = upload_dir or settings.UPLOAD_FOLDER
+    max_size = max_size or settings.MAX_CONTENT_LENGTH
+    content_type, params = parse_options_header(request.headers.get('content-type', ''))
+    if content_type != b'multipart/form-data' or b'boundary' not in params:
+        raise UploadError('A requisição deve ser multipart/form-data')
+
+    declared = request.headers.get('content-length')
+    if declared and declared.isdigit() and int(declared) > max_size:
+        raise UploadError(f'Arquivo excede o tamanho máximo de {max_size} bytes', 413)
+
+    receiver = _MultipartReceiver(file_field, upload_dir)
+    parser = MultipartParser(params[b'boundary'], receiver.callbacks)
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_size:
+                raise UploadError(f'Arquivo excede o tamanho máximo de {max_size} bytes', 413)
+            parser.write(chunk)
+            await receiver.flush()
+        parser.finalize()
+        await receiver.flush()
+        await receiver.close()
+    except Exception:
+        await receiver.close()
+        if receiver.path and os.path.exists(receiver.path):
+            os.remove(receiver.path)
+        raise
+
+    if receiver.path is None:
+        raise UploadError('Nenhum arquivo enviado')
+    if receiver.handle is None and not os.path.exists(receiver.path):
+        # Arquivo vazio: nenhuma parte foi gravada
+        async with aiofiles.open(receiver.path, 'wb'):
+            pass
+
+    logger.info(f"Upload de {receiver.filename} recebido ({receiver.size} bytes) em {receiver.path}")
+    return {
+        'filename': receiver.filename,
+        'path': receiver.path,
+        'size': receiver.size,
+        'fields': receiver.fields
+    }
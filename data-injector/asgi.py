@@ -0,0 +1,81 @@
+"""
+Entrada ASGI da aplicação (uvicorn asgi:app).
+
+Upload, consulta de jobs e saúde do banco são atendidos de forma assíncrona:
+o corpo do upload é gravado em disco à medida que chega e o processamento
+roda em segundo plano, com a carga no executor de banco. As demais rotas
+(página inicial e arquivos estáticos) continuam servidas pela aplicação Flask.
+"""
+import os
+import asyncio
+import logging
+from starlette.applications import Starlette
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route, Mount
+from main import app as flask_app
+from app.models.database import get_pool_status
+from app.services.file_processor import process_zip_file
+from app.services.job_manager import job_manager
+from app.utils.upload_stream import receive_upload, UploadError
+
+logger = logging.getLogger("ASGI")
+
+
+def _remove(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+
+
+async def upload(request):
+    """
+    Recebe o ZIP e agenda o processamento, retornando o job para consulta.
+    """
+    try:
+        received = await receive_upload(request)
+    except UploadError as e:
+        logger.warning(f"Upload recusado: {str(e)}")
+        return JSONResponse({'status': 'error', 'message': str(e)}, status_code=e.status_code)
+    except Exception as e:
+        logger.error(f"Erro ao receber upload: {str(e)}")
+        return JSONResponse({'status': 'error', 'message': f'Erro ao receber arquivo: {str(e)}'}, status_code=500)
+
+    if not received['filename'].lower().endswith('.zip'):
+        await asyncio.to_thread(_remove, received['path'])
+        return JSONResponse({'status': 'error', 'message': 'Apenas arquivos ZIP são permitidos'}, status_code=400)
+
+    force = received['fields'].get('force', '').lower() in ('1', 'true', 'on', 'sim')
+    job = job_manager.submit(process_zip_file, received['path'], force=force, description=received['filename'])
+    return JSONResponse({
+        'status': 'accepted',
+        'message': 'Arquivo recebido, processamento em andamento',
+        'job': job
+    }, status_code=202)
+
+
+async def job_status(request):
+    job = job_manager.get(request.path_params['job_id'])
+    if job is None:
+        return JSONResponse({'status': 'error', 'message': 'Job não encontrado'}, status_code=404)
+    return JSONResponse({'status': 'success', 'job': job})
+
+
+async def list_jobs(request):
+    return JSONResponse({'status': 'success', 'jobs': job_manager.list()})
+
+
+async def database_health(request):
+    try:
+        return JSONResponse({'status': 'success', 'pool': await asyncio.to_thread(get_pool_status)})
+    except Exception as e:
+        logger.error(f"Erro ao consultar o pool de conexões: {str(e)}")
+        return JSONResponse({'status': 'error', 'message': str(e)}, status_code=500)
+
+
+app = Starlette(routes=[
+    Route('/api/upload', upload, methods=['POST']),
+    Route('/api/jobs', list_jobs, methods=['GET']),
+    Route('/api/jobs/{job_id}', job_status, methods=['GET']),
+    Route('/api/health/db', database_health, methods=['GET']),
+    Mount('/', app=WSGIMiddleware(flask_app)),
+])
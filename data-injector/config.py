@@ -22,14 +22,65 @@ class Settings:
     UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB
     
+    # Codificação dos arquivos de dados (padrão e por tabela, ex.: "tb_procedimento:cp1252,rl_excecao:utf-8")
+    DATA_ENCODING = os.getenv('DATA_ENCODING', 'latin-1')
+    LAYOUT_ENCODINGS = os.getenv('LAYOUT_ENCODINGS', '')
+    
+    # Codificação por dicionário de colunas com poucos valores distintos
+    DICTIONARY_ENCODING = os.getenv('DICTIONARY_ENCODING', 'True').lower() == 'true'
+    DICTIONARY_COLUMN_PREFIXES = os.getenv('DICTIONARY_COLUMN_PREFIXES', 'CO_,DT_,TP_,ST_')
+    DICTIONARY_SAMPLE_LINES = int(os.getenv('DICTIONARY_SAMPLE_LINES', 1000))
+    DICTIONARY_MAX_DISTINCT_RATIO = float(os.getenv('DICTIONARY_MAX_DISTINCT_RATIO', 0.05))
+    DICTIONARY_PREFIX_MAX_DISTINCT_RATIO = float(os.getenv('DICTIONARY_PREFIX_MAX_DISTINCT_RATIO', 0.5))  # Colunas com os prefixos
+    DICTIONARY_MAX_VALUES = int(os.getenv('DICTIONARY_MAX_VALUES', 100000))
+    
+    # Pré-validação dos arquivos de dados
+    PREVALIDATION_MAX_ERRORS = int(os.getenv('PREVALIDATION_MAX_ERRORS', 100))  # Interrompe ao atingir
+    PREVALIDATION_ERROR_SAMPLE = int(os.getenv('PREVALIDATION_ERROR_SAMPLE', 20))  # Erros retornados
+    
+    # Configurações do estado de ingestão (snapshots dos últimos arquivos aplicados)
+    INGESTION_STATE_DIR = os.getenv('INGESTION_STATE_DIR', 'state')
+    
+    # Configurações da comparação com o banco
+    DIFF_MODE = os.getenv('DIFF_MODE', 'auto')  # auto, dict ou sort_merge
+    SORT_MERGE_MIN_ROWS = int(os.getenv('SORT_MERGE_MIN_ROWS', 500000))
+    SORT_RUN_SIZE = int(os.getenv('SORT_RUN_SIZE', 100000))
+    DIFF_SCOPE_COLUMNS = os.getenv('DIFF_SCOPE_COLUMNS', 'DT_COMPETENCIA')  # Restringem a busca no banco
+    DIFF_SCOPE_MAX_VALUES = int(os.getenv('DIFF_SCOPE_MAX_VALUES', 24))
+    KEY_INDEX_FALSE_POSITIVE_RATE = float(os.getenv('KEY_INDEX_FALSE_POSITIVE_RATE', 0.01))
+    KEY_INDEX_STATS_WAIT = float(os.getenv('KEY_INDEX_STATS_WAIT', 5))  # Segundos aguardando as estatísticas da carga
+    INDEX_ADVISOR = os.getenv('INDEX_ADVISOR', 'True').lower() == 'true'  # Verifica índices das buscas
+    AUTO_CREATE_INDEXES = os.getenv('AUTO_CREATE_INDEXES', 'False').lower() == 'true'  # CREATE INDEX CONCURRENTLY
+    
+    # Recarga por troca de partição (tabelas particionadas por competência)
+    PARTITION_SWAP = os.getenv('PARTITION_SWAP', 'True').lower() == 'true'
+    PARTITION_KEY_COLUMN = os.getenv('PARTITION_KEY_COLUMN', 'dt_competencia')
+    PARTITION_LOCK_TIMEOUT_MS = int(os.getenv('PARTITION_LOCK_TIMEOUT_MS', 10000))
+    PARTITION_DROP_OLD = os.getenv('PARTITION_DROP_OLD', 'False').lower() == 'true'  # Sem manter a partição substituída como _old
+    
     # Configurações de cache
     CACHE_EXPIRE_TIME = int(os.getenv('CACHE_EXPIRE_TIME', 3600))  # 1 hora
     CACHE_CLEANUP_INTERVAL = int(os.getenv('CACHE_CLEANUP_INTERVAL', 300))  # 5 minutos
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 10000))
+    CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', 256 * 1024 * 1024))  # 256MB (estimado)
+    CATALOG_CACHE_TTL = int(os.getenv('CATALOG_CACHE_TTL', 300))  # Tabelas e colunas do banco
     
     # Configurações de processamento assíncrono
     ASYNC_WORKERS = int(os.getenv('ASYNC_WORKERS', 4))
     BATCH_SIZE = int(os.getenv('BATCH_SIZE', 1000))
+    REJECT_FOLDER = os.getenv('REJECT_FOLDER', 'rejects')  # Registros rejeitados pelo banco (JSONL)
     MAX_CONCURRENT_TASKS = int(os.getenv('MAX_CONCURRENT_TASKS', 10))
+    JOB_RETENTION = int(os.getenv('JOB_RETENTION', 3600))  # Segundos que um job finalizado fica consultável
+    
+    # Configurações do pool de conexões: cada worker pode manter um cursor de
+    # leitura e uma sessão de escrita abertos ao mesmo tempo
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', ASYNC_WORKERS * 2))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', MAX_CONCURRENT_TASKS))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))  # Segundos aguardando uma conexão livre
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # 30 minutos
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 600000))  # 10 minutos
+    DB_LEAK_THRESHOLD = int(os.getenv('DB_LEAK_THRESHOLD', 900))  # Segundos fora do pool
+    DB_LEAK_TRACEBACK = os.getenv('DB_LEAK_TRACEBACK', 'False').lower() == 'true'
     
     # Configurações de logging
     LOG_FILE = os.getenv('LOG_FILE', 'logs/data_processor.log')
@@ -0,0 +1,92 @@
+import pytest
+from app.utils import cache as cache_module
+from app.utils.cache import Cache
+
+
+@pytest.fixture
+def make_cache():
+    created = []
+
+    def factory(**kwargs):
+        kwargs.setdefault('cleanup_interval', 3600)
+        instance = Cache(**kwargs)
+        created.append(instance)
+        return instance
+
+    yield factory
+    for instance in created:
+        instance.stop_sweeper()
+
+
+def test_evicts_least_recently_used(make_cache):
+    """Testa que, ao exceder a quantidade de entradas, sai a usada há mais tempo"""
+    cache = make_cache(max_entries=3)
+    for key in ('a', 'b', 'c'):
+        cache.set(key, key, size=1)
+
+    # A leitura de "a" o torna o mais recente; "b" passa a ser o mais antigo
+    assert cache.get('a') == 'a'
+    cache.set('d', 'd', size=1)
+
+    assert cache.get('b') is None
+    assert [cache.get(key) for key in ('a', 'c', 'd')] == ['a', 'c', 'd']
+    assert cache.stats()['evictions'] == 1
+
+
+def test_max_bytes_bound(make_cache):
+    """Testa o limite de bytes: entradas antigas são descartadas e valores maiores que o limite recusados"""
+    cache = make_cache(max_entries=100, max_bytes=100)
+    cache.set('a', 'a', size=40)
+    cache.set('b', 'b', size=40)
+    cache.set('c', 'c', size=40)
+
+    assert cache.get('a') is None
+    assert cache.stats()['bytes'] == 80
+
+    assert cache.set('grande', 'x', size=101) is False
+    assert cache.get('b') == 'b' and cache.stats()['bytes'] == 80
+
+    # Regravar uma chave substitui o tamanho anterior
+    cache.set('b', 'b', size=10)
+    assert cache.stats()['bytes'] == 50
+
+
+def test_clear_prefix_uses_namespace_index(make_cache):
+    """Testa a invalidação por namespace e a limpeza do índice de prefixos"""
+    cache = make_cache()
+    cache.set('catalog:columns:public.tb_a', 1, size=1)
+    cache.set('catalog:columns:public.tb_b', 2, size=1)
+    cache.set('catalog:layout:tb_a', 3, size=1)
+    cache.set('other:catalog:x', 4, size=1)
+
+    assert cache.clear_prefix('catalog:columns:') == 2
+    assert cache.get('catalog:layout:tb_a') == 3
+    assert 'catalog:columns:' not in cache._prefixes
+
+    assert cache.clear_prefix('catalog:') == 1
+    assert cache.get('other:catalog:x') == 4
+    assert 'catalog:' not in cache._prefixes
+
+    # Prefixos fora do separador percorrem as chaves
+    assert cache.clear_prefix('oth') == 1
+    assert cache._prefixes == {}
+
+
+def test_expiration_counting(make_cache, monkeypatch):
+    """Testa que entradas expiradas contam como expiração e como falta, no acesso e na limpeza"""
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, 'time', lambda: now[0])
+    cache = make_cache()
+    cache.set('a', 1, expire=10, size=1)
+    cache.set('b', 2, expire=10, size=1)
+    cache.set('c', 3, expire=0, size=1)
+
+    now[0] += 11
+    assert cache.get('a') is None
+    assert cache.clear_expired() == 1
+    assert cache.get('c') == 3
+
+    stats = cache.stats()
+    assert stats['expirations'] == 2
+    assert stats['misses'] == 1 and stats['hits'] == 1
+    assert stats['entries'] == 1 and stats['bytes'] == 1
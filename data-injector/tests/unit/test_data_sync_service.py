@@ -0,0 +1,155 @@
+from decimal import Decimal
+import numpy as np
+from app.services import data_sync_service
+from app.services.data_sync_service import DataSyncService
+from app.services.key_index import KeyIndex, hash_keys, load_key_index, save_key_index
+from app.services.snapshot_service import build_snapshot
+from app.services.data_validator import parse_layout_file
+from config import settings
+
+
+def _write_files(tmp_path):
+    layout = tmp_path / 'tb_teste_layout.txt'
+    layout.write_text(
+        "Coluna,Tamanho,Inicio,Fim,Tipo\n"
+        "CO_CHAVE,4,1,4,VARCHAR2\n"
+        "DT_COMPETENCIA,6,5,10,VARCHAR2\n"
+        "VL_TOTAL,5,11,15,NUMBER\n",
+        encoding='utf-8'
+    )
+    data = tmp_path / 'tb_teste.txt'
+    data.write_bytes(b"A1  20240100010\nB2  20240100020\nC3  20240200030\n")
+    return str(data), str(layout)
+
+
+def test_sync_full_matches_db_typed_keys(tmp_path, monkeypatch):
+    """Testa a comparação completa com valores do banco em outra representação (CHAR com brancos, NUMERIC)"""
+    data_file, layout_file = _write_files(tmp_path)
+    service = DataSyncService()
+    scopes = []
+    applied = {}
+
+    def get_existing(session, table_name, scope=None):
+        scopes.append(scope)
+        return [
+            {'co_chave': 'A1  ', 'dt_competencia': '202401', 'vl_total': Decimal('10')},
+            {'co_chave': 'B2  ', 'dt_competencia': '202401', 'vl_total': Decimal('99.00')},
+        ]
+
+    def apply_changes(table_name, to_insert, to_update, key_columns):
+        applied['insert'] = [record['CO_CHAVE'] for record in to_insert]
+        applied['update'] = [record['CO_CHAVE'] for record in to_update]
+        return {'inserted': len(to_insert), 'updated': len(to_update)}
+
+    monkeypatch.setattr(service, '_get_existing_records', get_existing)
+    monkeypatch.setattr(service, '_apply_changes', apply_changes)
+
+    result = service._sync_full('tb_teste', data_file, layout_file, ['CO_CHAVE', 'DT_COMPETENCIA'])
+
+    assert applied == {'insert': ['C3'], 'update': ['B2']}
+    assert result['details']['unchanged'] == 1
+    # O escopo é coletado durante a leitura do arquivo
+    assert scopes == [{'column': 'DT_COMPETENCIA', 'values': ['202401', '202402']}]
+    assert result['details']['scope'] == ['202401', '202402']
+
+
+def test_records_are_different_compares_numbers_by_value():
+    """Testa que o float do arquivo e o NUMERIC do banco com o mesmo valor não geram atualização"""
+    service = DataSyncService()
+    new = {'CO_CHAVE': 'A1', 'VL_TOTAL': 10.0, 'VL_TAXA': 0.5, 'NO_NOME': 'X'}
+
+    assert not service._records_are_different(new, {
+        'co_chave': 'A1  ', 'vl_total': Decimal('10'), 'vl_taxa': Decimal('0.50'), 'no_nome': 'X'
+    })
+    assert service._records_are_different(new, {
+        'co_chave': 'A1', 'vl_total': Decimal('10.01'), 'vl_taxa': Decimal('0.5'), 'no_nome': 'X'
+    })
+    assert service._records_are_different({'VL_TOTAL': None}, {'vl_total': Decimal('0')})
+
+
+def test_key_index_discarded_after_external_writes(tmp_path, monkeypatch):
+    """Testa que o índice de chaves é descartado quando outro processo escreveu na tabela"""
+    monkeypatch.setattr(settings, 'INGESTION_STATE_DIR', str(tmp_path))
+    save_key_index('tb_teste', KeyIndex(['CO_CHAVE'], np.unique(hash_keys([('A1',)])), write_counters=(10, 2)))
+    service = DataSyncService()
+
+    monkeypatch.setattr(data_sync_service, 'read_write_counters', lambda table_name: (10, 2))
+    assert service._load_key_index('tb_teste', ['CO_CHAVE']) is not None
+
+    monkeypatch.setattr(data_sync_service, 'read_write_counters', lambda table_name: (11, 2))
+    assert service._load_key_index('tb_teste', ['CO_CHAVE']) is None
+    assert load_key_index('tb_teste', ['CO_CHAVE']) is None
+
+
+def test_refresh_key_index_records_write_counters(tmp_path, monkeypatch):
+    """Testa que o índice é gravado com os contadores que incluem as inclusões da carga"""
+    monkeypatch.setattr(settings, 'INGESTION_STATE_DIR', str(tmp_path))
+    expected = []
+
+    def wait_for_write_counters(table_name, min_inserted):
+        expected.append(min_inserted)
+        return (min_inserted, 2)
+
+    monkeypatch.setattr(data_sync_service, 'wait_for_write_counters', wait_for_write_counters)
+    service = DataSyncService()
+    service.write_counters = (10, 2)
+    service._refresh_key_index('tb_teste', ['CO_CHAVE'], KeyIndex(['CO_CHAVE'], np.unique(hash_keys([('A1',)]))), 3)
+
+    assert expected == [13]
+    assert load_key_index('tb_teste', ['CO_CHAVE']).write_counters == (13, 2)
+
+    # Sem estatísticas da tabela o índice não é gravado
+    service.write_counters = None
+    service._refresh_key_index('tb_teste', ['CO_CHAVE'], KeyIndex(['CO_CHAVE'], np.unique(hash_keys([('A1',)]))), 3)
+    assert load_key_index('tb_teste', ['CO_CHAVE']) is None
+
+
+def _delta_setup(tmp_path, monkeypatch):
+    data_file, layout_file = _write_files(tmp_path)
+    layout_columns = parse_layout_file(layout_file)
+    previous_file = tmp_path / 'tb_teste_anterior.txt'
+    previous_file.write_bytes(b"A1  20240100010\nB2  20240100025\nD4  20240100040\n")
+    previous = build_snapshot(str(previous_file), layout_columns, ['CO_CHAVE'])
+    snapshot = build_snapshot(data_file, layout_columns, ['CO_CHAVE'])
+
+    service = DataSyncService()
+    applied = {}
+
+    def apply_changes(table_name, to_insert, to_update, key_columns):
+        applied['insert'] = [record['CO_CHAVE'] for record in to_insert]
+        applied['update'] = [record['CO_CHAVE'] for record in to_update]
+        return {'inserted': len(to_insert), 'updated': len(to_update), 'inserted_records': to_insert}
+
+    monkeypatch.setattr(service, '_apply_changes', apply_changes)
+    return service, data_file, layout_file, previous, snapshot, applied
+
+
+def test_sync_delta_applies_only_changed_lines(tmp_path, monkeypatch):
+    """Testa que a carga por delta aplica apenas as linhas adicionadas e alteradas desde o último arquivo"""
+    service, data_file, layout_file, previous, snapshot, applied = _delta_setup(tmp_path, monkeypatch)
+
+    result = service._sync_delta('tb_teste', data_file, layout_file, ['CO_CHAVE'], previous, snapshot)
+
+    assert applied == {'insert': ['C3'], 'update': ['B2']}
+    assert result['details'] == {
+        'inserted': 1, 'updated': 1, 'unchanged': 1, 'removed_from_file': 1, 'mode': 'delta'
+    }
+
+
+def test_sync_delta_checks_probable_existing_keys(tmp_path, monkeypatch):
+    """Testa que linhas adicionadas cuja chave já existe na tabela viram atualização ou inalteradas"""
+    service, data_file, layout_file, previous, snapshot, applied = _delta_setup(tmp_path, monkeypatch)
+    key_index = KeyIndex(['CO_CHAVE'], np.unique(hash_keys([('A1',), ('B2',), ('C3',)])))
+    fetched = []
+
+    def fetch_existing_by_keys(table_name, key_columns, keys):
+        fetched.extend(keys)
+        return {('C3',): {'co_chave': 'C3  ', 'dt_competencia': '202402', 'vl_total': Decimal('30')}}
+
+    monkeypatch.setattr(data_sync_service, 'fetch_existing_by_keys', fetch_existing_by_keys)
+
+    result = service._sync_delta('tb_teste', data_file, layout_file, ['CO_CHAVE'], previous, snapshot, key_index)
+
+    assert fetched == [('C3',)]
+    assert applied == {'insert': [], 'update': ['B2']}
+    assert result['details']['unchanged'] == 2
@@ -0,0 +1,76 @@
+from contextlib import contextmanager
+import pytest
+from sqlalchemy.exc import DataError, IntegrityError, OperationalError
+from app.services.database_service import _execute_with_bisection
+
+
+class FakeSession:
+    """Sessão que recusa os lotes com registros inválidos, como o banco faria no savepoint"""
+
+    def __init__(self, error=IntegrityError):
+        self.error = error
+        self.applied = []
+        self.executions = 0
+        self._pending = None
+
+    @contextmanager
+    def begin_nested(self):
+        self._pending = []
+        try:
+            yield
+        except Exception:
+            self._pending = None
+            raise
+        self.applied.extend(self._pending)
+
+    def execute(self, query, records):
+        self.executions += 1
+        bad = [record for record in records if record['valor'] < 0]
+        if bad:
+            raise self.error("INSERT", bad[0], Exception(f"valor inválido: {bad[0]['valor']}"))
+        self._pending.extend(records)
+
+
+def _records(n, bad=()):
+    return [{'id': i, 'valor': -1 if i in bad else i} for i in range(n)]
+
+
+def test_bisection_isolates_single_bad_row():
+    """Testa que um registro inválido é isolado e os demais do lote são aplicados"""
+    db = FakeSession()
+    rejects = []
+    records = _records(64, bad={37})
+
+    applied = _execute_with_bisection(db, "INSERT", records, rejects)
+
+    assert applied == 63
+    assert [record['id'] for record in db.applied] == [i for i in range(64) if i != 37]
+    assert [(record['id'], error) for record, error in rejects] == [(37, 'valor inválido: -1')]
+    # Uma tentativa do lote inteiro e duas por nível da bisseção (log2 de 64)
+    assert db.executions == 1 + 2 * 6
+
+
+def test_bisection_several_bad_rows_and_data_errors():
+    """Testa vários registros inválidos, com erro de tipo de dado do banco"""
+    db = FakeSession(error=DataError)
+    rejects = []
+
+    applied = _execute_with_bisection(db, "INSERT", _records(10, bad={0, 5, 9}), rejects)
+
+    assert applied == 7
+    assert [record['id'] for record, _ in rejects] == [0, 5, 9]
+
+
+def test_bisection_valid_batch_runs_once():
+    """Testa que lotes válidos são executados uma única vez"""
+    db = FakeSession()
+    assert _execute_with_bisection(db, "INSERT", _records(100), []) == 100
+    assert db.executions == 1
+
+
+def test_bisection_does_not_hide_connection_errors():
+    """Testa que erros que não vêm dos dados interrompem a carga"""
+    db = FakeSession(error=OperationalError)
+    with pytest.raises(OperationalError):
+        _execute_with_bisection(db, "INSERT", _records(4, bad={1}), [])
+    assert db.executions == 1
@@ -0,0 +1,35 @@
+from app.utils.fixed_width import LayoutPlan, parse_line
+
+LAYOUT = [
+    {'Coluna': 'CO_PROCEDIMENTO', 'Tamanho': '4', 'Tipo': 'VARCHAR2'},
+    {'Coluna': 'TP_SEXO', 'Tamanho': '1', 'Tipo': 'VARCHAR2'},
+    {'Coluna': 'CO_GRUPO', 'Tamanho': '2', 'Tipo': 'VARCHAR2'},
+    {'Coluna': 'NO_PROCEDIMENTO', 'Tamanho': '6', 'Tipo': 'VARCHAR2'},
+    {'Coluna': 'NU_IDADE', 'Tamanho': '3', 'Tipo': 'NUMBER'},
+]
+
+
+def _lines(n):
+    return [f"{i:04d}{'MF'[i % 2]}{i % 40:02d}PROC{i % 3:02d}{i % 7:03d}".encode('latin-1') for i in range(n)]
+
+
+def test_dictionary_encoding_requires_low_cardinality():
+    """Testa que colunas de valores únicos não são codificadas, mesmo com o prefixo configurado"""
+    plan = LayoutPlan(LAYOUT, 'latin-1')
+    encoded = plan.enable_dictionary_encoding(_lines(200))
+
+    # CO_PROCEDIMENTO é única na amostra; CO_GRUPO (20%) só é aceita pelo limite das colunas com prefixo
+    assert encoded == ['TP_SEXO', 'CO_GRUPO', 'NO_PROCEDIMENTO', 'NU_IDADE']
+    assert plan.enable_dictionary_encoding([]) == []
+
+
+def test_dictionary_encoding_shares_values():
+    """Testa que valores repetidos das colunas codificadas compartilham o mesmo objeto"""
+    plan = LayoutPlan(LAYOUT, 'latin-1')
+    lines = _lines(200)
+    plan.enable_dictionary_encoding(lines)
+
+    first, second = parse_line(lines[0], 1, plan), parse_line(lines[40], 41, plan)
+    assert first['CO_GRUPO'] == second['CO_GRUPO'] == '00'
+    assert first['CO_GRUPO'] is second['CO_GRUPO']
+    assert first['CO_PROCEDIMENTO'] == '0000' and second['CO_PROCEDIMENTO'] == '0040'
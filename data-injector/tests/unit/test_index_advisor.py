@@ -0,0 +1,124 @@
+import pytest
+from app.services import index_advisor
+from app.services.index_advisor import IndexAdvisor, parse_index_columns, covers, index_name_for
+from config import settings
+
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class FakeConnection:
+    def __init__(self, invalid=(), fail_create=False):
+        self.invalid = set(invalid)
+        self.fail_create = fail_create
+        self.statements = []
+        self.isolation_level = None
+
+    def execution_options(self, isolation_level=None):
+        self.isolation_level = isolation_level
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, statement, params=None):
+        sql = str(statement).strip()
+        self.statements.append(sql)
+        if 'FROM pg_index x' in sql:
+            return FakeResult(True if params['index'] in self.invalid else None)
+        if sql.startswith('CREATE INDEX') and self.fail_create:
+            raise RuntimeError('canceling statement due to statement timeout')
+        return FakeResult(None)
+
+
+class FakeEngine:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def connect(self):
+        return self.conn
+
+
+@pytest.fixture
+def advisor():
+    return IndexAdvisor()
+
+
+def _use_connection(monkeypatch, conn):
+    monkeypatch.setattr(index_advisor, 'engine', FakeEngine(conn))
+    return conn
+
+
+def test_parse_index_columns():
+    """Testa a extração das colunas da definição do índice"""
+    assert parse_index_columns(
+        'CREATE INDEX i ON public.t USING btree (dt_competencia, "co_chave" DESC NULLS LAST, lower(no_nome))'
+    ) == ['dt_competencia', 'co_chave', 'lower(no_nome)']
+    assert parse_index_columns('CREATE INDEX i ON public.t USING btree (a) INCLUDE (b)') == ['a']
+    assert parse_index_columns('CREATE INDEX i ON public.t USING btree (a) WHERE (a IS NOT NULL)') == []
+
+
+def test_covers_compares_layout_names_case_insensitively():
+    """Testa que o índice atende à busca pelas primeiras colunas, em qualquer ordem entre elas"""
+    assert covers(['dt_competencia', 'co_chave'], ['CO_CHAVE', 'DT_COMPETENCIA'])
+    assert covers(['dt_competencia', 'co_chave'], ['DT_COMPETENCIA'])
+    assert not covers(['co_chave', 'dt_competencia'], ['DT_COMPETENCIA'])
+    assert not covers(['dt_competencia'], [])
+
+
+def test_advise_recommends_one_index_for_key_and_scope(advisor, monkeypatch):
+    """Testa que a chave com a competência à frente atende às duas buscas e que índices inválidos são ignorados"""
+    monkeypatch.setattr(settings, 'DIFF_SCOPE_COLUMNS', 'DT_COMPETENCIA')
+    monkeypatch.setattr(advisor, 'get_indexes', lambda table_name: [
+        {'name': 'ix_tb_teste_co_chave_dt_competencia', 'columns': ['co_chave', 'dt_competencia'], 'valid': False},
+    ])
+
+    report = advisor.advise('tb_teste', ['CO_CHAVE', 'DT_COMPETENCIA'])
+
+    assert report['missing'] == [['dt_competencia', 'co_chave']]
+    assert report['invalid'] == ['ix_tb_teste_co_chave_dt_competencia']
+    assert not any(lookup['index_scan'] for lookup in report['lookups'])
+
+
+def test_create_index_lifts_statement_timeout(advisor, monkeypatch):
+    """Testa a criação concorrente em autocommit, sem statement_timeout e com o limite restaurado ao final"""
+    conn = _use_connection(monkeypatch, FakeConnection())
+
+    assert advisor.create_index('tb_teste', ['DT_COMPETENCIA', 'CO_CHAVE']) == 'ix_tb_teste_dt_competencia_co_chave'
+
+    assert conn.isolation_level == 'AUTOCOMMIT'
+    assert conn.statements[0] == 'SET statement_timeout = 0'
+    assert conn.statements[-2].startswith('CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tb_teste_dt_competencia_co_chave')
+    assert conn.statements[-1] == f'SET statement_timeout = {settings.DB_STATEMENT_TIMEOUT_MS}'
+    assert not any(sql.startswith('DROP') for sql in conn.statements)
+
+
+def test_create_index_drops_invalid_index_first(advisor, monkeypatch):
+    """Testa que o índice inválido de mesmo nome é removido antes da criação"""
+    name = index_name_for('tb_teste', ['DT_COMPETENCIA'])
+    conn = _use_connection(monkeypatch, FakeConnection(invalid={name}))
+
+    advisor.create_index('tb_teste', ['DT_COMPETENCIA'])
+
+    commands = [sql for sql in conn.statements if sql.startswith(('DROP', 'CREATE'))]
+    assert commands[0] == f'DROP INDEX CONCURRENTLY IF EXISTS {settings.DATABASE_SCHEMA}.{name}'
+    assert commands[1].startswith('CREATE INDEX CONCURRENTLY')
+
+
+def test_create_index_failure_removes_index_and_restores_timeout(advisor, monkeypatch):
+    """Testa que a falha na criação remove o índice inválido e restaura o statement_timeout"""
+    conn = _use_connection(monkeypatch, FakeConnection(fail_create=True))
+
+    with pytest.raises(RuntimeError):
+        advisor.create_index('tb_teste', ['DT_COMPETENCIA'])
+
+    assert conn.statements[-2].startswith('DROP INDEX CONCURRENTLY IF EXISTS')
+    assert conn.statements[-1] == f'SET statement_timeout = {settings.DB_STATEMENT_TIMEOUT_MS}'
@@ -0,0 +1,89 @@
+from array import array
+import numpy as np
+from app.services.key_index import (
+    BloomFilter,
+    KeyIndex,
+    collect_key_hashes,
+    hash_keys,
+    load_key_index,
+    save_key_index
+)
+from config import settings
+
+
+def _keys(start, stop):
+    return [(f"{i:08d}", '202401') for i in range(start, stop)]
+
+
+def test_key_index_membership():
+    """Testa que chaves existentes são sempre encontradas e as ausentes, descartadas"""
+    existing = _keys(0, 5000)
+    index = KeyIndex(['CO_CHAVE', 'DT_COMPETENCIA'], np.unique(hash_keys(existing)))
+
+    assert len(index) == 5000
+    assert index.probable_hits(hash_keys(existing)).all()
+    # A confirmação no vetor ordenado elimina os falsos positivos do filtro
+    assert not index.probable_hits(hash_keys(_keys(5000, 15000))).any()
+
+
+def test_key_index_add_rebuilds_bloom():
+    """Testa que novas chaves são incluídas, reconstruindo o filtro ao exceder a capacidade"""
+    index = KeyIndex(['CO_CHAVE'], np.unique(hash_keys(_keys(0, 10))))
+    capacity = index.bloom.capacity
+
+    index.add(hash_keys(_keys(10, capacity + 10)))
+
+    assert len(index) == capacity + 10
+    assert index.bloom.capacity > capacity
+    assert index.probable_hits(hash_keys(_keys(0, capacity + 10))).all()
+
+
+def test_key_index_empty():
+    """Testa o índice sem chaves e consultas vazias"""
+    index = KeyIndex(['CO_CHAVE'], np.zeros(0, dtype=np.uint64))
+    assert not index.probable_hits(hash_keys(_keys(0, 100))).any()
+    assert len(index.probable_hits(hash_keys([]))) == 0
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Testa que o filtro nunca descarta uma chave adicionada"""
+    bloom = BloomFilter.for_capacity(1000, 0.01)
+    hashes = hash_keys(_keys(0, 1000))
+    bloom.add(hashes)
+
+    assert bloom.might_contain(hashes).all()
+    assert bloom.might_contain(hash_keys(_keys(1000, 11000))).mean() < 0.05
+
+
+def test_key_index_from_visited_keys():
+    """Testa o índice gerado a partir das chaves percorridas no merge-join"""
+    hashes = array('Q')
+    rows = [(key, {}) for key in _keys(0, 100) + _keys(50, 150)]
+
+    assert list(collect_key_hashes(rows, hashes)) == rows
+    index = KeyIndex.from_hashes(['CO_CHAVE', 'DT_COMPETENCIA'], hashes)
+
+    assert len(index) == 150
+    assert index.probable_hits(hash_keys(_keys(0, 150))).all()
+
+
+def test_save_and_load_key_index(tmp_path, monkeypatch):
+    """Testa a gravação do índice e a recusa de índices gerados com outras colunas chave"""
+    monkeypatch.setattr(settings, 'INGESTION_STATE_DIR', str(tmp_path))
+    index = KeyIndex(['CO_CHAVE'], np.unique(hash_keys(_keys(0, 100))), write_counters=(120, 20))
+    save_key_index('tb_teste', index)
+
+    loaded = load_key_index('tb_teste', ['CO_CHAVE'])
+    assert np.array_equal(loaded.key_hashes, index.key_hashes)
+    assert loaded.write_counters == (120, 20)
+    assert loaded.probable_hits(hash_keys(_keys(0, 100))).all()
+    assert load_key_index('tb_teste', ['CO_OUTRA']) is None
+    assert load_key_index('tb_inexistente', ['CO_CHAVE']) is None
+
+
+def test_load_key_index_without_write_counters(tmp_path, monkeypatch):
+    """Testa que índices gravados sem contadores de escrita são carregados sem eles"""
+    monkeypatch.setattr(settings, 'INGESTION_STATE_DIR', str(tmp_path))
+    save_key_index('tb_teste', KeyIndex(['CO_CHAVE'], np.unique(hash_keys(_keys(0, 10)))))
+
+    assert load_key_index('tb_teste', ['CO_CHAVE']).write_counters is None
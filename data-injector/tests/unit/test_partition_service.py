@@ -0,0 +1,111 @@
+from types import SimpleNamespace
+import pytest
+from app.services import partition_service
+from app.services.partition_service import PartitionSwapService
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, query, params=None):
+        return SimpleNamespace(all=lambda: self.rows)
+
+
+class FakeEngine:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def connect(self):
+        return FakeConnection(self.rows)
+
+
+def test_spool_by_partition_normalizes_competencia():
+    """Testa que competências lidas como NUMBER (float) são agrupadas pelo texto usado no banco"""
+    records = [
+        {'CO_CHAVE': 'A1', 'DT_COMPETENCIA': 202401.0},
+        {'CO_CHAVE': 'B2', 'DT_COMPETENCIA': 202401.0},
+        {'CO_CHAVE': 'C3', 'DT_COMPETENCIA': 202402.0},
+    ]
+    buffers = PartitionSwapService()._spool_by_partition(records, ['CO_CHAVE', 'DT_COMPETENCIA'], 'DT_COMPETENCIA')
+    try:
+        assert {value: count for value, (_, count) in buffers.items()} == {'202401': 2, '202402': 1}
+        assert buffers['202401'][0].read() == "A1,202401\nB2,202401\n"
+    finally:
+        for buffer, _ in buffers.values():
+            buffer.close()
+
+    with pytest.raises(ValueError):
+        PartitionSwapService()._spool_by_partition([{'DT_COMPETENCIA': None}], ['DT_COMPETENCIA'], 'DT_COMPETENCIA')
+
+
+def test_find_partition_matches_normalized_value(monkeypatch):
+    """Testa a busca da partição pelo valor normalizado da competência"""
+    monkeypatch.setattr(partition_service, 'engine', FakeEngine([
+        SimpleNamespace(relname='tb_teste_p202401', bound="FOR VALUES IN ('202401')"),
+        SimpleNamespace(relname='tb_teste_pvarias', bound="FOR VALUES IN ('202402', '202403')"),
+    ]))
+    service = PartitionSwapService()
+
+    assert service.find_partition('tb_teste', '202401') == 'tb_teste_p202401'
+    assert service.find_partition('tb_teste', '202404') is None
+    with pytest.raises(ValueError):
+        service.find_partition('tb_teste', '202402')
+
+
+class FakeCursor:
+    def __init__(self, statements):
+        self.statements = statements
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+
+    def copy_expert(self, sql, buffer):
+        self.statements.append(sql)
+
+
+class FakeRawConnection:
+    def __init__(self):
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self.statements)
+
+    def commit(self):
+        self.statements.append('COMMIT')
+
+    def rollback(self):
+        self.statements.append('ROLLBACK')
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize('drop_old', [False, True])
+def test_swap_partition_keeps_old_partition(monkeypatch, drop_old):
+    """Testa que a partição substituída é mantida como _old, salvo com PARTITION_DROP_OLD"""
+    conn = FakeRawConnection()
+    monkeypatch.setattr(partition_service, 'engine', SimpleNamespace(raw_connection=lambda: conn))
+    monkeypatch.setattr(partition_service.settings, 'PARTITION_DROP_OLD', drop_old)
+    service = PartitionSwapService()
+    monkeypatch.setattr(service, 'find_partition', lambda table_name, value: 'tb_teste_p202401')
+
+    service._swap_partition('tb_teste', ['CO_CHAVE', 'DT_COMPETENCIA'], '202401', None)
+
+    schema = partition_service.settings.DATABASE_SCHEMA
+    swap = conn.statements[conn.statements.index('COMMIT') + 1:]
+    detach = swap.index(f"ALTER TABLE {schema}.tb_teste DETACH PARTITION {schema}.tb_teste_p202401")
+    if drop_old:
+        assert swap[detach + 1] == f"DROP TABLE {schema}.tb_teste_p202401"
+        assert not any('_old' in sql for sql in conn.statements)
+    else:
+        assert swap[detach + 1] == f"ALTER TABLE {schema}.tb_teste_p202401 RENAME TO tb_teste_p202401_old"
+        # A cópia da troca anterior é descartada antes da transação da troca
+        assert f"DROP TABLE IF EXISTS {schema}.tb_teste_p202401_old" in conn.statements[:conn.statements.index('COMMIT')]
+    assert swap[-1] == 'COMMIT'
@@ -0,0 +1,75 @@
+import pytest
+from app.services.prevalidation import prevalidate_fixed_width_file
+from app.utils.fixed_width import LayoutPlan
+
+LAYOUT = [
+    {'Coluna': 'CO_PROCEDIMENTO', 'Tamanho': '4', 'Tipo': 'NUMBER'},
+    {'Coluna': 'NO_PROCEDIMENTO', 'Tamanho': '6', 'Tipo': 'VARCHAR2'},
+    {'Coluna': 'VL_SA', 'Tamanho': '5', 'Tipo': 'NUMBER'},
+]
+
+
+@pytest.fixture
+def plan():
+    return LayoutPlan(LAYOUT, 'latin-1')
+
+
+def _write(tmp_path, lines, terminator=b'\n', trailing=True):
+    path = tmp_path / 'dados.txt'
+    content = terminator.join(lines)
+    path.write_bytes(content + terminator if trailing else content)
+    return str(path)
+
+
+def _line(code, name, value):
+    return f"{code:>4}{name:<6}{value:>5}".encode('latin-1')
+
+
+@pytest.mark.parametrize("terminator, trailing", [(b'\n', True), (b'\r\n', True), (b'\n', False)])
+def test_valid_file_uses_matrix(tmp_path, plan, terminator, trailing):
+    """Testa arquivos corretos, validados de uma vez sobre a matriz de bytes"""
+    lines = [_line(i, 'PROC', f"{i}.5") for i in range(1, 50)]
+    result = prevalidate_fixed_width_file(_write(tmp_path, lines, terminator, trailing), plan)
+
+    assert result['valid'] and result['method'] == 'matrix'
+    assert result['lines_checked'] == 49 and result['error_count'] == 0
+
+
+def test_non_numeric_fields(tmp_path, plan):
+    """Testa a identificação da linha, coluna e valor dos campos numéricos inválidos"""
+    lines = [_line(1, 'PROC', '10'), _line('12A4', 'PROC', '10'), _line(3, 'PROÇ', 'x1')]
+    result = prevalidate_fixed_width_file(_write(tmp_path, lines), plan)
+
+    assert not result['valid'] and result['method'] == 'matrix'
+    assert [(e['line'], e['column'], e['value']) for e in result['errors']] == [
+        (2, 'CO_PROCEDIMENTO', '12A4'),
+        (3, 'VL_SA', 'x1'),
+    ]
+    assert result['errors'][0]['error'] == 'numeric'
+
+
+def test_size_mismatch_falls_back_to_lines(tmp_path, plan):
+    """Testa linhas com tamanho diferente do layout, validadas linha a linha"""
+    lines = [_line(1, 'PROC', '10'), _line(2, 'PROC', '10') + b'X', _line(3, 'PROC', '10')[:-2]]
+    result = prevalidate_fixed_width_file(_write(tmp_path, lines), plan)
+
+    assert result['method'] == 'lines'
+    assert [(e['line'], e['error']) for e in result['errors']] == [(2, 'length'), (3, 'length')]
+
+
+def test_misplaced_terminator_falls_back_to_lines(tmp_path, plan):
+    """Testa linhas que compensam o tamanho entre si, o que mantém o arquivo com tamanho múltiplo do registro"""
+    lines = [_line(1, 'PROC', '10') + b'X', _line(2, 'PROC', '10')[:-1]]
+    result = prevalidate_fixed_width_file(_write(tmp_path, lines), plan)
+
+    assert result['method'] == 'lines'
+    assert result['error_count'] == 2
+
+
+def test_stops_at_max_errors(tmp_path, plan):
+    """Testa a interrupção ao atingir o limite de erros"""
+    lines = [_line(i, 'PROC', '10') + b'XX' for i in range(100)]
+    result = prevalidate_fixed_width_file(_write(tmp_path, lines), plan, max_errors=5)
+
+    assert result['stopped_early']
+    assert result['error_count'] == 5 and result['lines_checked'] == 5
@@ -0,0 +1,91 @@
+from app.services.snapshot_service import (
+    build_snapshot,
+    diff_snapshots,
+    read_lines_at,
+    save_snapshot,
+    load_snapshot,
+    get_key_slices
+)
+from config import settings
+
+LAYOUT = [
+    {'Coluna': 'CO_CHAVE', 'Tamanho': '4'},
+    {'Coluna': 'DT_COMPETENCIA', 'Tamanho': '6'},
+    {'Coluna': 'VL_TOTAL', 'Tamanho': '5'},
+]
+
+PREVIOUS = [
+    b"A1  20240100010",
+    b"B2  20240100020",
+    b"C3  20240200030",
+    b"D4  20240200040",
+    b"F6  20240300060",
+    b"F6  20240300061",
+]
+
+CURRENT = [
+    b"A1  20240100010",  # inalterada
+    b"B2  20240100099",  # alterada
+    b"E5  20240300050",  # adicionada
+    b"D4  20240200040",  # inalterada
+    b"D4  20240200041",  # chave repetida: adicionada
+    b"F6  20240300061",  # inalterada
+    b"F6  20240300062",  # alterada (pareada com a linha removida de F6)
+]
+
+
+def _write(tmp_path, name, lines):
+    path = tmp_path / name
+    path.write_bytes(b"\n".join(lines) + b"\n")
+    return str(path)
+
+
+def test_diff_snapshots_classifies_lines(tmp_path):
+    """Testa linhas adicionadas, alteradas, removidas, inalteradas e chaves repetidas"""
+    previous = build_snapshot(_write(tmp_path, 'anterior.txt', PREVIOUS), LAYOUT, ['CO_CHAVE'])
+    current_file = _write(tmp_path, 'atual.txt', CURRENT)
+    current = build_snapshot(current_file, LAYOUT, ['CO_CHAVE'])
+
+    delta = diff_snapshots(previous, current)
+
+    assert delta['unchanged'] == 3
+    assert delta['removed'] == 1
+    assert read_lines_at(current_file, delta['added']) == [b"E5  20240300050", b"D4  20240200041"]
+    assert read_lines_at(current_file, delta['changed']) == [b"B2  20240100099", b"F6  20240300062"]
+
+
+def test_diff_snapshots_without_changes(tmp_path):
+    """Testa que o mesmo conteúdo em outra ordem não gera alterações"""
+    previous = build_snapshot(_write(tmp_path, 'anterior.txt', PREVIOUS), LAYOUT, ['CO_CHAVE'])
+    current = build_snapshot(_write(tmp_path, 'atual.txt', PREVIOUS[::-1]), LAYOUT, ['CO_CHAVE'])
+
+    assert diff_snapshots(previous, current) == {'added': [], 'changed': [], 'removed': 0, 'unchanged': len(PREVIOUS)}
+
+
+def test_build_snapshot_skips_blank_lines_and_keeps_offsets(tmp_path):
+    """Testa que linhas em branco são ignoradas e os offsets apontam para o início de cada linha (CRLF)"""
+    data_file = str(tmp_path / 'dados.txt')
+    with open(data_file, 'wb') as f:
+        f.write(b"B2  20240100020\r\n\r\nA1  20240100010\r\n")
+
+    snapshot = build_snapshot(data_file, LAYOUT, ['CO_CHAVE'])
+
+    assert len(snapshot) == 2
+    assert read_lines_at(data_file, snapshot.offsets.tolist()) == [b"B2  20240100020", b"A1  20240100010"]
+
+
+def test_load_snapshot_rejects_other_key(tmp_path, monkeypatch):
+    """Testa que o snapshot é invalidado quando a chave ou o layout mudam as posições das colunas chave"""
+    monkeypatch.setattr(settings, 'INGESTION_STATE_DIR', str(tmp_path / 'state'))
+    snapshot = build_snapshot(_write(tmp_path, 'dados.txt', PREVIOUS), LAYOUT, ['CO_CHAVE', 'DT_COMPETENCIA'])
+    save_snapshot('tb_teste', snapshot)
+
+    loaded = load_snapshot('tb_teste', get_key_slices(LAYOUT, ['CO_CHAVE', 'DT_COMPETENCIA']))
+    assert loaded is not None and (loaded.line_hashes == snapshot.line_hashes).all()
+
+    # Outra coluna chave
+    assert load_snapshot('tb_teste', get_key_slices(LAYOUT, ['CO_CHAVE'])) is None
+    # Layout com outro tamanho da coluna chave
+    wider = [{'Coluna': 'CO_CHAVE', 'Tamanho': '5'}] + LAYOUT[1:]
+    assert load_snapshot('tb_teste', get_key_slices(wider, ['CO_CHAVE', 'DT_COMPETENCIA'])) is None
+    assert load_snapshot('tb_inexistente', snapshot.key_slices) is None
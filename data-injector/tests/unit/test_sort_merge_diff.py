@@ -0,0 +1,72 @@
+import os
+import pytest
+from app.services.sort_merge_diff import ExternalSorter, merge_join, INSERT, UPDATE, UNCHANGED, MISSING
+
+
+def _is_different(new_record, existing_record):
+    return new_record['valor'] != existing_record['valor']
+
+
+def _rows(*items):
+    return [((key,), {'chave': key, 'valor': valor}) for key, valor in items]
+
+
+def test_merge_join_classifies_records():
+    """Testa a classificação de inserções, alterações, inalterados e registros só do banco"""
+    file_rows = _rows(('a', 1), ('b', 2), ('d', 4))
+    db_rows = _rows(('b', 2), ('c', 3), ('d', 5), ('e', 6))
+
+    result = [(action, (file or db)['chave']) for action, file, db in merge_join(file_rows, db_rows, _is_different)]
+
+    assert result == [(INSERT, 'a'), (UNCHANGED, 'b'), (MISSING, 'c'), (UPDATE, 'd'), (MISSING, 'e')]
+
+
+def test_merge_join_duplicate_file_keys():
+    """Testa que chaves repetidas no arquivo são comparadas com o mesmo registro do banco"""
+    file_rows = _rows(('a', 1), ('a', 2), ('a', 1))
+    db_rows = _rows(('a', 1))
+
+    actions = [action for action, _, _ in merge_join(file_rows, db_rows, _is_different)]
+
+    # O registro do banco já correspondido não é reportado como MISSING
+    assert actions == [UNCHANGED, UPDATE, UNCHANGED]
+
+
+def test_merge_join_empty_streams():
+    """Testa fluxos vazios de um lado ou de ambos"""
+    assert list(merge_join([], [], _is_different)) == []
+    assert [a for a, _, _ in merge_join(_rows(('a', 1)), [], _is_different)] == [INSERT]
+    assert [a for a, _, _ in merge_join([], _rows(('a', 1)), _is_different)] == [MISSING]
+
+
+@pytest.mark.parametrize("file_rows, db_rows, source", [
+    (_rows(('b', 1), ('a', 1)), [], 'arquivo'),
+    ([], _rows(('b', 1), ('a', 1)), 'banco'),
+])
+def test_merge_join_rejects_unsorted_input(file_rows, db_rows, source):
+    """Testa que fluxos fora de ordem interrompem a comparação em vez de gerar resultado errado"""
+    with pytest.raises(ValueError, match=source):
+        list(merge_join(file_rows, db_rows, _is_different))
+
+
+def test_external_sorter_spills_runs():
+    """Testa a ordenação com mais registros que cabem em uma execução em memória"""
+    records = [{'chave': f"{(i * 7919) % 1000:04d}", 'linha': i} for i in range(1000)]
+
+    with ExternalSorter(run_size=64) as sorter:
+        rows = list(sorter.sort(records, lambda record: (record['chave'],)))
+        assert len(sorter.run_files) == 16
+        temp_dir = sorter.temp_dir
+
+    assert [key for key, _ in rows] == sorted((record['chave'],) for record in records)
+    assert sorted(record['linha'] for _, record in rows) == list(range(1000))
+    assert not os.path.exists(temp_dir)
+
+
+def test_external_sorter_single_run_in_memory():
+    """Testa que entradas menores que uma execução não usam o disco"""
+    with ExternalSorter(run_size=100) as sorter:
+        rows = list(sorter.sort([{'chave': k} for k in 'cab'], lambda record: (record['chave'],)))
+        assert sorter.run_files == []
+
+    assert [key for key, _ in rows] == [('a',), ('b',), ('c',)]
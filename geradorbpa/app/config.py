@@ -12,6 +12,12 @@ class Settings(BaseSettings):
     DB_PASSWORD: str = "postgres"
     DATABASE_SCHEMA: str = "public"
 
+    # Pool de conexões
+    DB_POOL_MIN: int = 1
+    DB_POOL_MAX: int = 10
+    DB_POOL_TIMEOUT: float = 30.0  # Segundos de espera por uma conexão livre
+    DB_POOL_PING_INTERVAL: float = 60.0  # Conexões ociosas há mais tempo são testadas no checkout
+
     # Configurações da aplicação
     SECRET_KEY: str = "your-secret-key"
     DEBUG: bool = True
@@ -20,6 +26,13 @@ class Settings(BaseSettings):
     # Configurações do BPA
     BPA_BATCH_SIZE: int = 1000
     BPA_MAX_LINES_PER_PAGE: int = 50
+    BPA_STREAM_CHUNK_SIZE: int = 65536  # Bytes por bloco no download em streaming
+    BPA_CACHE_MAX_ROWS: int = 10000  # Competências maiores não são mantidas no cache
+    BPA_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # Tamanho máximo estimado dos dados em cache
+    BPA_SPOOL_MAX_SIZE: int = 8 * 1024 * 1024  # Bytes do arquivo mantidos em memória antes de ir para o disco
+    BPA_ARTIFACT_CACHE: bool = True  # Guarda os arquivos gerados em disco, por versão dos dados
+    BPA_ARTIFACT_DIR: str = "bpa_artifacts"
+    BPA_REJECT_INVALID_CHECK_DIGITS: bool = False  # Descarta registros com CNS/CNES de dígito verificador inválido
 
     class Config:
         env_file = ".env"
@@ -57,4 +57,7 @@ def formulario_bpa():
         return bpa_controller.process_form(request.form)
     return bpa_view.render_form()
 
-
+@app.route("/bpa/<year_month>/<tipo_relatorio>", methods=["GET"])
+@login_required
+def download_bpa(year_month, tipo_relatorio):
+    return bpa_controller.download(year_month, tipo_relatorio)
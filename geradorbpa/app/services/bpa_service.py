@@ -1,6 +1,10 @@
 import io
+import itertools
+from typing import Iterable, Iterator, Optional
 import pandas as pd
+from app.utils.bpa.artifacts import Artifact, BPAArtifactStore
 from app.utils.bpa.generator_factory import BPAGeneratorFactory
+from app.utils.bpa.writer import BPAFileWriter
 from app.utils.fetch_data import DataFetcher
 from app.utils.logger import logger
 from app.utils.cache import cache
@@ -9,55 +13,178 @@ from app.config import settings
 class BPAService:
     def __init__(self):
         self.data_fetcher = DataFetcher(schema="public")
-    
+        self.artifacts = BPAArtifactStore()
+
+    def _iter_batches(self, year_month: str, version: str = None) -> Iterator[pd.DataFrame]:
+        """
+        Percorre os lotes de registros da competência, usando o cache quando disponível
+
+        Os dados são compartilhados pelos dois tipos de relatório. Competências
+        com até BPA_CACHE_MAX_ROWS registros são lidas por inteiro e guardadas no
+        cache, e requisições simultâneas da mesma competência aguardam uma única
+        leitura do banco; as maiores são percorridas em lotes, sem cache. Com a
+        versão dos dados, o cache é separado por versão.
+        """
+        cache_key = f"bpa_data_{year_month}"
+        if version:
+            cache_key = f"{cache_key}_{version}"
+        uncached = {}
+
+        def read_batches():
+            return iter(self.data_fetcher.iter_competencia_batches(
+                year_month, columns=BPAGeneratorFactory.data_columns(), as_frame=True
+            ))
+
+        def load():
+            logger.log_info(f"Buscando dados para competência {year_month}")
+            batches = read_batches()
+            loaded = []
+            rows = 0
+            for batch in batches:
+                loaded.append(batch)
+                rows += len(batch)
+                if rows > settings.BPA_CACHE_MAX_ROWS:
+                    # Grande demais para o cache: segue em lotes a partir do que já foi lido
+                    uncached['batches'] = itertools.chain(loaded, batches)
+                    return None
+            if not rows:
+                uncached['batches'] = iter(loaded)
+                return None
+            return loaded
+
+        data = cache.get_or_load(cache_key, load)
+        if data is not None:
+            yield from data
+        elif 'batches' in uncached:
+            yield from uncached['batches']
+        else:
+            # A leitura simultânea de outra requisição não foi guardada no cache
+            yield from read_batches()
+
+    def _fetch_batches(self, year_month: str, version: str = None) -> Iterator[pd.DataFrame]:
+        """
+        Inicia a leitura dos lotes da competência
+
+        Raises:
+            ValueError: Se não houver registros para a competência
+        """
+        batches = self._iter_batches(year_month, version)
+        for first in batches:
+            if len(first):
+                return itertools.chain([first], batches)
+        logger.log_warning(f"Nenhum dado encontrado para competência {year_month}")
+        raise ValueError(f"Nenhum registro encontrado para competência {year_month}")
+
+    def _log_generated(self, chunks: Iterable[bytes], tipo_relatorio: str) -> Iterator[bytes]:
+        yield from chunks
+        logger.log_info(f"Arquivo BPA {tipo_relatorio} gerado com sucesso")
+
+    def stream_bpa_file(self, year_month: str, tipo_relatorio: str) -> Iterator[bytes]:
+        """
+        Gera o arquivo BPA em blocos, para envio com transferência chunked
+
+        O arquivo é gravado em uma única passada pelos dados (em memória ou em
+        disco, conforme o tamanho) e o cabeçalho é preenchido ao final com os
+        totais e o campo de controle; só então os blocos são enviados. Assim os
+        erros ocorrem antes do início da resposta.
+
+        Args:
+            year_month: Mês/Ano de competência
+            tipo_relatorio: Tipo do relatório ('consolidado' ou 'individualizado')
+
+        Returns:
+            Iterador de blocos do arquivo codificados
+
+        Raises:
+            ValueError: Se o tipo for inválido ou não houver dados
+        """
+        try:
+            # Valida o tipo antes de buscar os dados
+            generator = BPAGeneratorFactory.create_generator(tipo_relatorio)
+            with self.data_fetcher.db.session():
+                batches = self._fetch_batches(year_month)
+                writer = BPAFileWriter.from_organization(year_month)
+                file = writer.write(generator, batches)
+            return self._log_generated(writer.iter_file(file), tipo_relatorio)
+
+        except Exception as e:
+            error_msg = f"Erro ao gerar arquivo BPA: {str(e)}"
+            logger.log_error(error_msg)
+            raise ValueError(error_msg)
+
+    def get_bpa_artifact(self, year_month: str, tipo_relatorio: str) -> Optional[Artifact]:
+        """
+        Obtém o arquivo BPA gravado em disco para a versão atual dos dados da
+        competência, gerando e gravando o arquivo se ainda não existir
+
+        Args:
+            year_month: Mês/Ano de competência
+            tipo_relatorio: Tipo do relatório ('consolidado' ou 'individualizado')
+
+        Returns:
+            Artefato gravado, ou None se o cache de arquivos estiver desativado ou
+            a versão dos dados não puder ser obtida (nesse caso, use stream_bpa_file)
+
+        Raises:
+            ValueError: Se o tipo for inválido, não houver dados ou a geração falhar
+        """
+        if not settings.BPA_ARTIFACT_CACHE:
+            return None
+        try:
+            generator = BPAGeneratorFactory.create_generator(tipo_relatorio)
+            tipo = BPAGeneratorFactory.normalize_type(tipo_relatorio)
+            with self.data_fetcher.db.session():
+                version = self.data_fetcher.get_competencia_version(year_month)
+                if version is None:
+                    logger.log_warning(
+                        f"Versão dos dados da competência {year_month} indisponível: "
+                        f"arquivo BPA {tipo} gerado em streaming, sem gravação em disco"
+                    )
+                    return None
+
+                # O arquivo também depende do cabeçalho, do layout e das opções do gerador
+                writer = BPAFileWriter.from_organization(year_month)
+                file_version = f"{version}-{writer.fingerprint(generator)}"
+                artifact = self.artifacts.get(year_month, tipo, file_version)
+                if artifact:
+                    logger.log_info(f"Arquivo BPA {tipo} da competência {year_month} servido do disco (versão {file_version})")
+                    return artifact
+
+                batches = self._fetch_batches(year_month, version)
+                with writer.write(generator, batches) as file:
+                    artifact = self.artifacts.save(year_month, tipo, file_version, file)
+            logger.log_info(f"Arquivo BPA {tipo} gerado com sucesso")
+            return artifact
+
+        except Exception as e:
+            error_msg = f"Erro ao gerar arquivo BPA: {str(e)}"
+            logger.log_error(error_msg)
+            raise ValueError(error_msg)
+
     def generate_bpa_file(self, year_month: str, tipo_relatorio: str) -> io.BytesIO:
         """
         Gera o arquivo BPA
-        
+
         Args:
             year_month: Mês/Ano de competência
             tipo_relatorio: Tipo do relatório ('consolidado' ou 'individualizado')
-            
+
         Returns:
             Buffer contendo o arquivo gerado
-            
+
         Raises:
             ValueError: Se houver erro na geração do arquivo
         """
+        chunks = self.stream_bpa_file(year_month, tipo_relatorio)
         try:
-            # Tenta obter dados do cache
-            cache_key = f"bpa_data_{year_month}_{tipo_relatorio}"
-            data = cache.get(cache_key)
-            
-            if data is None:
-                logger.log_info(f"Buscando dados para competência {year_month}")
-                data = self.data_fetcher.fetch_data_by_competencia(year_month)
-                
-                if not data:
-                    logger.log_warning(f"Nenhum dado encontrado para competência {year_month}")
-                    raise ValueError(f"Nenhum registro encontrado para competência {year_month}")
-                
-                # Armazena no cache
-                cache.set(cache_key, data)
-            
-            # Converte para DataFrame
-            df = pd.DataFrame(data)
-            
-            # Cria o gerador apropriado
-            generator = BPAGeneratorFactory.create_generator(tipo_relatorio)
-            
-            # Gera o arquivo
-            content = generator.process_data(df)
-            
             # Cria o buffer de memória
             memoria = io.BytesIO()
-            memoria.write(content.encode("utf-8"))
+            for chunk in chunks:
+                memoria.write(chunk)
             memoria.seek(0)
-            
-            logger.log_info(f"Arquivo BPA {tipo_relatorio} gerado com sucesso")
             return memoria
-            
+
         except Exception as e:
             error_msg = f"Erro ao gerar arquivo BPA: {str(e)}"
             logger.log_error(error_msg)
-            raise ValueError(error_msg)
\ No newline at end of file
+            raise ValueError(error_msg)
@@ -0,0 +1,119 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import IO, NamedTuple, Optional
+from app.config import settings
+from app.utils.logger import logger
+
+# Bytes lidos por vez ao copiar e calcular o hash do arquivo
+_COPY_BLOCK = 1024 * 1024
+
+
+class Artifact(NamedTuple):
+    """Arquivo BPA gerado e gravado em disco"""
+    path: str
+    etag: str  # SHA-256 do conteúdo
+    size: int
+    version: str  # Versão dos dados e da geração (cabeçalho, layout e opções do gerador)
+
+
+class BPAArtifactStore:
+    """
+    Arquivos BPA gerados, gravados em disco por (competência, tipo, versão dos dados)
+
+    Cada arquivo é acompanhado de um .json com o hash SHA-256 do conteúdo (usado
+    como ETag), o tamanho e a versão dos dados. A gravação usa um arquivo
+    temporário no mesmo diretório e os.replace, de modo que um arquivo
+    incompleto nunca é servido. Ao gravar uma nova versão, as anteriores da
+    mesma competência e tipo são removidas.
+    """
+
+    def __init__(self, directory: str = None):
+        """
+        Args:
+            directory: Diretório dos arquivos (padrão: BPA_ARTIFACT_DIR)
+        """
+        self.directory = directory or settings.BPA_ARTIFACT_DIR
+
+    def _prefix(self, year_month: str, tipo: str) -> str:
+        if not year_month.isdigit() or not tipo.isalnum():
+            raise ValueError(f"Competência ou tipo inválido para o arquivo BPA: {year_month}, {tipo}")
+        return os.path.join(self.directory, f"bpa_{year_month}_{tipo}_")
+
+    def _path(self, year_month: str, tipo: str, version: str) -> str:
+        key = hashlib.sha256(version.encode("utf-8")).hexdigest()[:16]
+        return f"{self._prefix(year_month, tipo)}{key}.txt"
+
+    @staticmethod
+    def _meta_path(path: str) -> str:
+        return f"{path[:-len('.txt')]}.json"
+
+    def get(self, year_month: str, tipo: str, version: str) -> Optional[Artifact]:
+        """
+        Obtém o arquivo gravado para a versão dos dados
+
+        Returns:
+            Artefato, ou None se não houver arquivo para essa versão
+        """
+        path = self._path(year_month, tipo, version)
+        try:
+            with open(self._meta_path(path), encoding="utf-8") as meta_file:
+                meta = json.load(meta_file)
+            if meta.get('version') != version or os.path.getsize(path) != meta.get('size'):
+                return None
+        except (OSError, ValueError):
+            return None
+        return Artifact(path, meta['sha256'], meta['size'], version)
+
+    def save(self, year_month: str, tipo: str, version: str, file: IO[bytes]) -> Artifact:
+        """
+        Grava o conteúdo de um arquivo (lido a partir da posição atual) para a versão dos dados
+
+        Returns:
+            Artefato gravado
+        """
+        path = self._path(year_month, tipo, version)
+        os.makedirs(self.directory, exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp_bpa_")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for block in iter(lambda: file.read(_COPY_BLOCK), b""):
+                    digest.update(block)
+                    out.write(block)
+                    size += len(block)
+            os.replace(tmp_path, path)
+
+            meta = {'version': version, 'sha256': digest.hexdigest(), 'size': size}
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp_bpa_")
+            with os.fdopen(fd, "w", encoding="utf-8") as out:
+                json.dump(meta, out)
+            os.replace(tmp_path, self._meta_path(path))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self._remove_stale(year_month, tipo, keep=path)
+        logger.log_info(f"Arquivo BPA gravado em disco: {path} ({size} bytes)")
+        return Artifact(path, meta['sha256'], size, version)
+
+    def _remove_stale(self, year_month: str, tipo: str, keep: str):
+        """Remove os arquivos de outras versões dos dados da mesma competência e tipo"""
+        for path in glob.glob(f"{glob.escape(self._prefix(year_month, tipo))}*"):
+            if path in (keep, self._meta_path(keep)):
+                continue
+            try:
+                os.remove(path)
+                logger.log_debug(f"Arquivo BPA de versão anterior removido: {path}")
+            except OSError as e:
+                logger.log_warning(f"Não foi possível remover o arquivo BPA {path}: {e}")
+
+    def clear(self):
+        """Remove todos os arquivos gravados"""
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -1,32 +1,188 @@
-from abc import ABC, abstractmethod
+from abc import ABC
+from typing import Any, Iterable, Iterator, List
+import numpy as np
+import pandas as pd
+from app.config import settings
+from app.utils.bpa.layout import RecordLayout, control_field
+from app.utils.bpa.renderer import BPARenderer, render_line
+from app.utils.logger import logger
 
 class BaseBPAGenerator(ABC):
     """Classe base abstrata para geradores de BPA"""
-    
-    @abstractmethod
+
+    # Layout do registro (definido por tipo de BPA)
+    layout: RecordLayout = None
+
+    def __init__(self):
+        self.max_lines_per_page = settings.BPA_MAX_LINES_PER_PAGE
+        self.reset()
+
+    @property
+    def columns(self) -> List[str]:
+        """Colunas lidas do banco para este tipo de BPA"""
+        return self.layout.columns
+
+    def _generate_line(self, row) -> str:
+        """
+        Gera a linha de um registro (string vazia se o registro for inválido)
+
+        Args:
+            row: Série do pandas (ou dicionário) com os dados da linha
+
+        Returns:
+            Linha formatada conforme o layout
+        """
+        if not self.validator.validate(row):
+            logger.log_error(f"Dados inválidos para {self.layout.name}", {"row": self._row_dict(row)})
+            return ""
+        return render_line(self.layout, row, self.current_page)
+
     def generate(self, data):
         """
-        Método abstrato que deve ser implementado por todas as classes filhas
-        para gerar o BPA com base nos dados fornecidos
-        
+        Gera o BPA com base nos dados fornecidos
+
         Args:
-            data: Dados necessários para gerar o BPA
-            
+            data: DataFrame com os registros
+
         Returns:
-            O BPA gerado
+            Conteúdo do BPA
         """
-        pass
-    
-    @abstractmethod
+        return self.process_data(data)
+
     def validate(self, data):
         """
-        Método abstrato que deve ser implementado por todas as classes filhas
-        para validar os dados antes da geração do BPA
-        
+        Valida os dados antes da geração do BPA
+
         Args:
-            data: Dados a serem validados
-            
+            data: Registro a ser validado
+
         Returns:
             bool: True se os dados são válidos, False caso contrário
         """
-        pass 
\ No newline at end of file
+        return self.validator.validate(data)
+
+    def reset(self):
+        """Reinicia a paginação e os totais para um novo arquivo"""
+        self.current_page = 1
+        self.lines_in_page = 0
+        self.line_count = 0
+        self.procedimento_sum = 0
+        self.quantidade_sum = 0
+
+    @property
+    def sheet_count(self) -> int:
+        """Folhas usadas pelas linhas geradas"""
+        return self.current_page if self.line_count else 0
+
+    @property
+    def control(self) -> int:
+        """Campo de controle do cabeçalho para as linhas geradas"""
+        return control_field(self.procedimento_sum, self.quantidade_sum)
+
+    def iter_lines(self, rows: Iterable[Any]) -> Iterator[str]:
+        """
+        Gera as linhas do BPA uma a uma, sem montar o arquivo em memória
+
+        Args:
+            rows: Registros (dicionários ou séries do pandas)
+
+        Yields:
+            Linha formatada, com o terminador CRLF
+        """
+        self.reset()
+        for row in rows:
+            if self.lines_in_page >= self.max_lines_per_page:
+                self.current_page += 1
+                self.lines_in_page = 0
+
+            line = self._generate_line(row)
+            if line:
+                self.lines_in_page += 1
+                self._accumulate_line(line)
+                yield line
+
+    def iter_chunks(self, batches: Iterable[Any], chunk_size: int = None) -> Iterator[bytes]:
+        """
+        Gera o BPA em blocos de bytes, validando e renderizando cada lote por coluna
+
+        Produz os mesmos bytes (em UTF-8) que iter_lines, sem formatar linha a linha.
+
+        Args:
+            batches: Lotes de registros (DataFrames ou listas de dicionários)
+            chunk_size: Tamanho aproximado dos blocos em bytes (padrão: BPA_STREAM_CHUNK_SIZE)
+
+        Yields:
+            Blocos com linhas completas terminadas em CRLF
+        """
+        chunk_size = chunk_size or settings.BPA_STREAM_CHUNK_SIZE
+        renderer = BPARenderer(self.layout)
+        self.reset()
+        for batch in batches:
+            frame = batch if isinstance(batch, pd.DataFrame) else pd.DataFrame.from_records(batch)
+            if frame.empty:
+                continue
+            frame = frame.reset_index(drop=True)
+
+            valid = self.validator.valid_mask(frame)
+            if not valid.all():
+                self._log_invalid(frame[~valid])
+                frame = frame[valid].reset_index(drop=True)
+
+            pages = self._paginate(len(frame))
+            rendered = renderer.render(frame, pages)
+            self._accumulate(rendered)
+            yield from renderer.iter_chunks(rendered, chunk_size)
+
+    def _accumulate_line(self, line: str):
+        """Soma uma linha gerada aos totais do arquivo"""
+        self.line_count += 1
+        self.procedimento_sum += self._field_value(line, 'procedimento')
+        self.quantidade_sum += self._field_value(line, 'quantidade')
+
+    def _field_value(self, line: str, name: str) -> int:
+        spec = self.layout[name]
+        text = line[spec.offset:spec.offset + spec.width].strip()
+        return int(text) if text.isdigit() else 0
+
+    def _accumulate(self, rendered):
+        """Soma as linhas, procedimentos e quantidades de um lote aos totais do arquivo"""
+        self.line_count += len(rendered.matrix)
+        self.procedimento_sum += rendered.field_sum(self.layout['procedimento'])
+        self.quantidade_sum += rendered.field_sum(self.layout['quantidade'])
+
+    def _paginate(self, count: int) -> np.ndarray:
+        """
+        Calcula a folha de cada uma das próximas `count` linhas, com as mesmas
+        regras de iter_lines, e avança a paginação
+        """
+        offsets = self.lines_in_page + np.arange(count)
+        pages = self.current_page + offsets // self.max_lines_per_page
+        if count:
+            last = self.lines_in_page + count - 1
+            self.current_page += last // self.max_lines_per_page
+            self.lines_in_page = last % self.max_lines_per_page + 1
+        return pages
+
+    def _log_invalid(self, frame: pd.DataFrame):
+        # A validação linha a linha registra os erros de cada campo
+        for _, row in frame.iterrows():
+            self.validator.validate(row)
+            logger.log_error(f"Dados inválidos para {self.layout.name}", {"row": self._row_dict(row)})
+
+    def process_data(self, df: pd.DataFrame) -> str:
+        """
+        Gera o conteúdo do BPA a partir de um DataFrame
+
+        Args:
+            df: DataFrame com os registros
+
+        Returns:
+            String com todas as linhas geradas
+        """
+        if df.empty:
+            return ""
+        return "".join(self.iter_lines(row for _, row in df.iterrows()))
+
+    @staticmethod
+    def _row_dict(row) -> dict:
+        return row.to_dict() if hasattr(row, "to_dict") else dict(row)
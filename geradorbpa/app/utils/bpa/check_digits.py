@@ -0,0 +1,164 @@
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from app.utils.bpa.renderer import column_text
+
+# Primeiro dígito do CNS definitivo e do provisório
+CNS_DEFINITIVE_PREFIXES = (1, 2)
+CNS_PROVISIONAL_PREFIXES = (7, 8, 9)
+
+# Pesos dos dígitos, da esquerda para a direita
+CNS_WEIGHTS = tuple(range(15, 0, -1))
+CNES_WEIGHTS = (7, 6, 5, 4, 3, 2)
+CNPJ_WEIGHTS_1 = (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+CNPJ_WEIGHTS_2 = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+
+
+def digit_matrix(values, width: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converte uma coluna de códigos em uma matriz de dígitos
+
+    Args:
+        values: Série do pandas (ou sequência) com os códigos
+        width: Quantidade de dígitos do código
+
+    Returns:
+        Matriz (n, width) de dígitos e máscara das linhas com exatamente
+        `width` dígitos (as demais linhas da matriz ficam zeradas)
+    """
+    if isinstance(values, np.ndarray) and values.dtype.kind == 'U':
+        text = values
+    else:
+        text = column_text(values)
+    if not len(text):
+        return np.zeros((0, width), dtype=np.uint8), np.zeros(0, dtype=bool)
+
+    too_long = np.zeros(len(text), dtype=bool)
+    if text.dtype.itemsize // 4 != width:
+        # Strings de tamanho fixo igual ao do código dispensam o strip: brancos já as invalidam
+        text = np.char.strip(text)
+        too_long = np.char.str_len(text) > width
+    codes = np.ascontiguousarray(text.astype(f'U{width}')).view(np.uint32).reshape(len(text), width)
+    # Na subtração sem sinal, posições vazias (código 0) e caracteres que não
+    # são dígitos ASCII resultam em valores acima de 9
+    offsets = codes - np.uint32(ord('0'))
+    well_formed = ~too_long & (offsets <= 9).all(axis=1)
+    digits = offsets.astype(np.uint8)
+    digits[~well_formed] = 0
+    return digits, well_formed
+
+
+def _weighted_sum(digits: np.ndarray, weights: Sequence[int]) -> np.ndarray:
+    # Produto em float32: exato para as somas de dígitos com pesos pequenos
+    return (digits.astype(np.float32) @ np.asarray(weights, dtype=np.float32)).astype(np.int64)
+
+
+def cns_valid(values) -> np.ndarray:
+    """
+    Valida uma coluna de CNS (Cartão Nacional de Saúde)
+
+    Definitivos (iniciados em 1 ou 2) são os 11 dígitos do PIS seguidos de
+    "000" ou "001" e do dígito verificador; provisórios (iniciados em 7, 8 ou 9)
+    têm apenas a soma ponderada. Em ambos, a soma dos dígitos com pesos de 15
+    a 1 é múltipla de 11.
+
+    Returns:
+        Array booleano com True para os CNS válidos
+    """
+    digits, valid = digit_matrix(values, 15)
+    first = digits[:, 0]
+    definitive = np.isin(first, CNS_DEFINITIVE_PREFIXES)
+    provisional = np.isin(first, CNS_PROVISIONAL_PREFIXES)
+    padding_ok = (digits[:, 11] == 0) & (digits[:, 12] == 0) & (digits[:, 13] <= 1)
+    checksum_ok = _weighted_sum(digits, CNS_WEIGHTS) % 11 == 0
+    return valid & checksum_ok & (provisional | (definitive & padding_ok))
+
+
+def cnes_valid(values) -> np.ndarray:
+    """
+    Valida uma coluna de CNES: o sétimo dígito é o verificador módulo 11 dos
+    seis primeiros, com pesos de 7 a 2 (restos 0 e 1 resultam em 0)
+
+    Returns:
+        Array booleano com True para os CNES válidos
+    """
+    digits, valid = digit_matrix(values, 7)
+    remainder = _weighted_sum(digits[:, :6], CNES_WEIGHTS) % 11
+    check = np.where(remainder == 0, 0, 11 - remainder) % 10
+    return valid & (digits[:, 6] == check)
+
+
+def _mod11_digit(weighted_sum: np.ndarray) -> np.ndarray:
+    remainder = weighted_sum % 11
+    return np.where(remainder < 2, 0, 11 - remainder)
+
+
+def cnpj_valid(values) -> np.ndarray:
+    """
+    Valida uma coluna de CNPJ (14 dígitos, sem pontuação): os dois últimos
+    dígitos são verificadores módulo 11; sequências de um único dígito são
+    recusadas
+
+    Returns:
+        Array booleano com True para os CNPJ válidos
+    """
+    digits, valid = digit_matrix(values, 14)
+    first_check = _mod11_digit(_weighted_sum(digits[:, :12], CNPJ_WEIGHTS_1))
+    second_check = _mod11_digit(_weighted_sum(digits[:, :13], CNPJ_WEIGHTS_2))
+    repeated = (digits == digits[:, :1]).all(axis=1)
+    return valid & ~repeated & (digits[:, 12] == first_check) & (digits[:, 13] == second_check)
+
+
+# Validação de um único valor, com os mesmos algoritmos dos kernels, para a
+# validação linha a linha (os kernels têm custo fixo alto para um só valor)
+
+def _digit_list(value, width: int) -> Optional[List[int]]:
+    if value is None:
+        return None
+    text = str(value).strip()
+    if len(text) != width or not (text.isascii() and text.isdigit()):
+        return None
+    return [ord(char) - 48 for char in text]
+
+
+def _dot(digits: Sequence[int], weights: Sequence[int]) -> int:
+    return sum(digit * weight for digit, weight in zip(digits, weights))
+
+
+def _cnes_digit(weighted_sum: int) -> int:
+    remainder = weighted_sum % 11
+    return (11 - remainder) % 10 if remainder else 0
+
+
+def _cnpj_digit(weighted_sum: int) -> int:
+    remainder = weighted_sum % 11
+    return 0 if remainder < 2 else 11 - remainder
+
+
+def is_valid_cns(value) -> bool:
+    """Valida um CNS com as regras de cns_valid"""
+    digits = _digit_list(value, 15)
+    if digits is None or _dot(digits, CNS_WEIGHTS) % 11:
+        return False
+    if digits[0] in CNS_PROVISIONAL_PREFIXES:
+        return True
+    return digits[0] in CNS_DEFINITIVE_PREFIXES and digits[11] == 0 and digits[12] == 0 and digits[13] <= 1
+
+
+def is_valid_cnes(value) -> bool:
+    """Valida um CNES com as regras de cnes_valid"""
+    digits = _digit_list(value, 7)
+    return digits is not None and digits[6] == _cnes_digit(_dot(digits, CNES_WEIGHTS))
+
+
+def is_valid_cnpj(value) -> bool:
+    """Valida um CNPJ com as regras de cnpj_valid"""
+    digits = _digit_list(value, 14)
+    if digits is None or len(set(digits)) == 1:
+        return False
+    return (digits[12] == _cnpj_digit(_dot(digits, CNPJ_WEIGHTS_1))
+            and digits[13] == _cnpj_digit(_dot(digits, CNPJ_WEIGHTS_2)))
+
+
+# Validação por coluna e por valor de cada tipo de código
+COLUMN_CHECKS = {'cns': cns_valid, 'cnes': cnes_valid, 'cnpj': cnpj_valid}
+VALUE_CHECKS = {'cns': is_valid_cns, 'cnes': is_valid_cnes, 'cnpj': is_valid_cnpj}
@@ -1,17 +1,41 @@
+from typing import List
 from app.utils.bpa.consolidado_generator import BPAConsolidadoGenerator
 from app.utils.bpa.individualizado_generator import BPAIndividualizadoGenerator
 from app.utils.logger import logger
 
+# Nomes aceitos para cada tipo (o formulário envia "individualizada")
+BPA_TYPE_ALIASES = {
+    'consolidado': 'consolidado',
+    'consolidada': 'consolidado',
+    'individualizado': 'individualizado',
+    'individualizada': 'individualizado',
+}
+
 class BPAGeneratorFactory:
     """Fábrica para criação de geradores de BPA"""
     
+    @staticmethod
+    def normalize_type(bpa_type: str) -> str:
+        """
+        Converte o tipo informado para o nome canônico
+        
+        Raises:
+            ValueError: Se o tipo de BPA for inválido
+        """
+        normalized = BPA_TYPE_ALIASES.get(str(bpa_type).lower())
+        if normalized is None:
+            error_msg = f"Tipo de BPA inválido: {bpa_type}"
+            logger.log_error(error_msg)
+            raise ValueError(error_msg)
+        return normalized
+    
     @staticmethod
     def create_generator(bpa_type: str):
         """
         Cria um gerador de BPA baseado no tipo
         
         Args:
-            bpa_type: Tipo do BPA ('consolidado' ou 'individualizado')
+            bpa_type: Tipo do BPA ('consolidado' ou 'individualizado', aceitando 'individualizada')
             
         Returns:
             Instância do gerador apropriado
@@ -19,15 +43,21 @@ class BPAGeneratorFactory:
         Raises:
             ValueError: Se o tipo de BPA for inválido
         """
-        bpa_type = bpa_type.lower()
+        bpa_type = BPAGeneratorFactory.normalize_type(bpa_type)
         
         if bpa_type == 'consolidado':
             logger.log_info("Criando gerador de BPA Consolidado")
             return BPAConsolidadoGenerator()
-        elif bpa_type == 'individualizado':
-            logger.log_info("Criando gerador de BPA Individualizado")
-            return BPAIndividualizadoGenerator()
-        else:
-            error_msg = f"Tipo de BPA inválido: {bpa_type}"
-            logger.log_error(error_msg)
-            raise ValueError(error_msg) 
\ No newline at end of file
+        logger.log_info("Criando gerador de BPA Individualizado")
+        return BPAIndividualizadoGenerator() 
+
+    @staticmethod
+    def data_columns() -> List[str]:
+        """
+        Colunas lidas do banco para qualquer tipo de BPA: os dados de uma
+        competência são lidos uma vez e compartilhados pelos dois tipos
+        """
+        columns = []
+        for generator_class in (BPAIndividualizadoGenerator, BPAConsolidadoGenerator):
+            columns += [column for column in generator_class.layout.columns if column not in columns]
+        return columns
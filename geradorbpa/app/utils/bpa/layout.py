@@ -0,0 +1,168 @@
+from typing import Dict, List, NamedTuple, Optional
+
+# Tipos de campo (verificados na leitura do arquivo)
+NUMERIC = 'N'  # Apenas dígitos (ou brancos, quando o preenchimento é com espaços)
+ALPHA = 'A'    # Texto livre
+
+# Preenchimento: zeros à esquerda ou espaços à direita
+ZERO = '0'
+SPACE = ' '
+
+# Lado descartado quando o valor excede o tamanho do campo
+LEFT = 'left'
+RIGHT = 'right'
+
+# Campo preenchido com a folha calculada na paginação
+FOLHA = 'folha'
+
+LINE_TERMINATOR = b"\r\n"
+
+# Versão da geração do arquivo: incrementar a cada mudança na renderização
+# que altere o conteúdo gerado, para invalidar os arquivos gravados em disco
+FORMAT_VERSION = 1
+
+# Módulo do campo de controle do cabeçalho
+CONTROL_MODULUS = 1111
+
+# Tipos de registro (dois primeiros caracteres da linha)
+HEADER_TYPE = '01'
+BPA_C_TYPE = '02'
+BPA_I_TYPE = '03'
+
+
+def control_field(procedimento_sum: int, quantidade_sum: int) -> int:
+    """Campo de controle do cabeçalho: (soma dos procedimentos + soma das quantidades) % 1111 + 1111"""
+    return (procedimento_sum + quantidade_sum) % CONTROL_MODULUS + CONTROL_MODULUS
+
+
+class Field(NamedTuple):
+    """Campo de um registro de largura fixa"""
+    name: str
+    offset: int
+    width: int
+    pad: str
+    type: str
+    truncate: str
+    value: Optional[str] = None  # Valor fixo (ex.: tipo da linha, origem)
+
+
+def field(name: str, width: int, type: str = NUMERIC, pad: str = None,
+          value: str = None, truncate: str = None) -> Field:
+    """
+    Declara um campo; o deslocamento é calculado pelo RecordLayout
+
+    Por padrão, campos numéricos são preenchidos com zeros à esquerda e mantêm
+    os dígitos finais; campos alfanuméricos são preenchidos com espaços à direita
+    e truncados no final.
+    """
+    pad = pad or (ZERO if type == NUMERIC else SPACE)
+    truncate = truncate or (LEFT if pad == ZERO else RIGHT)
+    return Field(name, 0, width, pad, type, truncate, value)
+
+
+class RecordLayout:
+    """Layout de um tipo de registro do arquivo BPA"""
+
+    def __init__(self, name: str, fields: List[Field]):
+        self.name = name
+        self.fields = []
+        offset = 0
+        for spec in fields:
+            self.fields.append(spec._replace(offset=offset))
+            offset += spec.width
+        self.record_len = offset
+        self.record_type = self.fields[0].value
+        self._by_name = {spec.name: spec for spec in self.fields}
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __getitem__(self, name: str) -> Field:
+        return self._by_name[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    @property
+    def columns(self) -> List[str]:
+        """Campos preenchidos com dados dos registros (sem fixos e folha)"""
+        return [spec.name for spec in self.fields if spec.value is None and spec.name != FOLHA]
+
+
+# Cabeçalho (tipo 01)
+HEADER = RecordLayout('Cabeçalho', [
+    field('tipo_linha', 2, ALPHA, value=HEADER_TYPE),
+    field('marcador', 5, ALPHA, value='#BPA#'),
+    field('competencia', 6),
+    field('total_linhas', 6),
+    field('total_folhas', 6),
+    field('controle', 4),
+    field('orgao', 30, ALPHA),
+    field('sigla', 6, ALPHA),
+    field('cgc_cpf', 14),
+    field('destino', 40, ALPHA),
+    field('indicador_destino', 1, ALPHA),
+    field('versao', 10, ALPHA),
+])
+
+# BPA Consolidado (tipo 02)
+BPA_C = RecordLayout('BPA Consolidado', [
+    field('tipo_linha', 2, ALPHA, value=BPA_C_TYPE),
+    field('cnes', 7),
+    field('competencia', 6),
+    field('cbo', 6, ALPHA),
+    field(FOLHA, 3),
+    field('sequencial', 2),
+    field('procedimento', 10),
+    field('idade', 3),
+    field('quantidade', 6),
+    field('origem', 3, ALPHA, value='EXT'),
+])
+
+# BPA Individualizado (tipo 03)
+BPA_I = RecordLayout('BPA Individualizado', [
+    field('tipo_linha', 2, ALPHA, value=BPA_I_TYPE),
+    field('cnes', 7),
+    field('competencia', 6),
+    field('cns_profissional', 15),
+    field('cbo', 6, ALPHA),
+    field('data_atendimento', 8),
+    field(FOLHA, 3),
+    field('sequencial', 2),
+    field('procedimento', 10),
+    field('cns_paciente', 15),
+    field('sexo', 1, ALPHA),
+    # Código IBGE de 6 dígitos: o dígito verificador do código de 7 é descartado
+    field('codigo_municipio', 6, truncate=RIGHT),
+    field('cid', 4, ALPHA),
+    field('idade', 3),
+    field('quantidade', 6),
+    field('carater_atendimento', 2),
+    field('numero_autorizacao', 13, ALPHA),
+    field('origem', 3, ALPHA, value='EXT'),
+    field('nome_paciente', 30, ALPHA),
+    field('data_nascimento', 8),
+    field('raca', 2),
+    field('etnia', 4, ALPHA),
+    field('nacionalidade', 3),
+    field('servico', 3, ALPHA),
+    field('classificacao', 3, ALPHA),
+    field('equipe_seq', 8, ALPHA),
+    field('equipe_area', 4, ALPHA),
+    field('cnpj', 14, pad=SPACE),
+    field('cep', 8, pad=SPACE),
+    field('codigo_logradouro', 3, pad=SPACE),
+    field('endereco', 30, ALPHA),
+    field('complemento', 10, ALPHA),
+    field('numero', 5, ALPHA),
+    field('bairro', 30, ALPHA),
+    field('telefone', 11, ALPHA),
+    field('email', 40, ALPHA),
+    field('ine', 10, ALPHA),
+])
+
+LAYOUTS: Dict[str, RecordLayout] = {
+    HEADER_TYPE: HEADER,
+    BPA_C_TYPE: BPA_C,
+    BPA_I_TYPE: BPA_I,
+}
@@ -0,0 +1,229 @@
+from typing import Any, Dict, List, Union
+import numpy as np
+import pandas as pd
+from app.utils.bpa.layout import (
+    LAYOUTS, HEADER_TYPE, FOLHA, NUMERIC, ZERO, RecordLayout, control_field
+)
+from app.utils.logger import logger
+
+_DIGIT_0, _DIGIT_9, _SPACE, _CR, _LF = ord('0'), ord('9'), ord(' '), 13, 10
+
+
+class BPAReader:
+    """
+    Leitura e verificação de arquivos BPA gerados
+
+    As linhas são localizadas no buffer pelos terminadores e os registros de
+    cada tipo são copiados para uma matriz (n_linhas, tamanho_do_registro), de
+    onde cada campo é lido por fatia de colunas, conforme o layout. Linhas com
+    caracteres fora do ASCII são decodificadas individualmente.
+    """
+
+    def __init__(self, encoding: str = "utf-8", max_errors: int = 100):
+        """
+        Args:
+            encoding: Codificação do arquivo
+            max_errors: Quantidade máxima de erros listados no relatório
+        """
+        self.encoding = encoding
+        self.max_errors = max_errors
+
+    def read(self, data: Union[bytes, str]) -> Dict[str, Any]:
+        """
+        Lê um arquivo BPA em colunas
+
+        Args:
+            data: Conteúdo do arquivo
+
+        Returns:
+            Dicionário com 'header' (campos do cabeçalho ou None), 'records'
+            (DataFrame por tipo de registro, com o número da linha em 'linha')
+            e 'errors'
+        """
+        parsed = self._parse(data)
+        return {
+            'header': parsed['header'],
+            'records': {
+                record_type: pd.DataFrame(columns)
+                for record_type, columns in parsed['records'].items()
+            },
+            'errors': parsed['errors'],
+        }
+
+    def verify(self, data: Union[bytes, str]) -> Dict[str, Any]:
+        """
+        Verifica um arquivo BPA: tamanho e tipo dos campos de cada linha e, quando
+        há cabeçalho, total de linhas, total de folhas e campo de controle
+
+        Args:
+            data: Conteúdo do arquivo
+
+        Returns:
+            Relatório com 'status' ('success' ou 'error'), contagens, 'errors' e 'warnings'
+        """
+        parsed = self._parse(data)
+        errors = parsed['errors']
+        warnings = []
+        records = parsed['records']
+        body = {t: columns for t, columns in records.items() if t != HEADER_TYPE}
+        body_lines = sum(len(columns['linha']) for columns in body.values())
+
+        procedimento_sum = 0
+        quantidade_sum = 0
+        sheets = 0
+        for columns in body.values():
+            procedimento_sum += self._sum_digits(columns['procedimento'])
+            quantidade_sum += self._sum_digits(columns['quantidade'])
+            sheets += len(np.unique(columns[FOLHA]))
+        control = control_field(procedimento_sum, quantidade_sum)
+
+        header = parsed['header']
+        if header is None:
+            warnings.append("Arquivo sem cabeçalho: totais e campo de controle não verificados")
+        else:
+            expected = {
+                'total_linhas': body_lines,
+                'total_folhas': sheets,
+                'controle': control,
+            }
+            for name, value in expected.items():
+                if not header[name].isdigit() or int(header[name]) != value:
+                    errors.append(f"Cabeçalho: {name} = {header[name]!r}, esperado {value}")
+            for record_type, columns in body.items():
+                divergent = np.flatnonzero(columns['competencia'] != header['competencia'])
+                for i in divergent[:self.max_errors]:
+                    errors.append(f"Linha {columns['linha'][i]}: competência diferente do cabeçalho")
+
+        report = {
+            'status': 'error' if errors else 'success',
+            'lines': parsed['lines'],
+            'records': {record_type: len(columns['linha']) for record_type, columns in body.items()},
+            'sheets': sheets,
+            'control': control,
+            'header': header,
+            'errors': errors[:self.max_errors],
+            'error_count': len(errors),
+            'warnings': warnings,
+        }
+        if errors:
+            logger.log_warning(f"Arquivo BPA com {len(errors)} erros de verificação")
+        return report
+
+    @staticmethod
+    def _sum_digits(values: np.ndarray) -> int:
+        digits = np.char.isdigit(np.char.strip(values))
+        if not digits.any():
+            return 0
+        return int(np.char.strip(values[digits]).astype(np.int64).sum())
+
+    def _parse(self, data: Union[bytes, str]) -> Dict[str, Any]:
+        if isinstance(data, str):
+            data = data.encode(self.encoding)
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        errors: List[str] = []
+
+        ends = np.flatnonzero(buffer == _LF)
+        starts = np.concatenate(([0], ends[:-1] + 1)).astype(np.int64) if ends.size else np.array([], dtype=np.int64)
+        tail = buffer[ends[-1] + 1:] if ends.size else buffer
+        if tail.size:
+            errors.append(f"Linha {len(ends) + 1}: sem terminador CRLF no final do arquivo")
+
+        has_cr = (ends > starts) & (buffer[np.maximum(ends - 1, 0)] == _CR)
+        for i in np.flatnonzero(~has_cr)[:self.max_errors]:
+            errors.append(f"Linha {i + 1}: terminador diferente de CRLF")
+        lengths = ends - starts - has_cr
+
+        # Tipo do registro pelos dois primeiros bytes
+        short = lengths < 2
+        first = buffer[np.where(short, 0, starts)].astype(np.int32) if starts.size else np.array([], dtype=np.int32)
+        second = buffer[np.where(short, 0, starts + 1)].astype(np.int32) if starts.size else np.array([], dtype=np.int32)
+        types = np.where(short, -1, first * 256 + second)
+
+        known = np.zeros(len(starts), dtype=bool)
+        records = {}
+        for record_type, layout in LAYOUTS.items():
+            code = ord(record_type[0]) * 256 + ord(record_type[1])
+            selected = np.flatnonzero(types == code)
+            known[selected] = True
+            if selected.size:
+                records[record_type] = self._parse_records(buffer, starts, lengths, selected, layout, errors)
+        for i in np.flatnonzero(~known)[:self.max_errors]:
+            errors.append(f"Linha {i + 1}: tipo de registro desconhecido")
+
+        header = None
+        header_columns = records.get(HEADER_TYPE)
+        if header_columns is not None and len(header_columns['linha']):
+            if len(header_columns['linha']) > 1 or header_columns['linha'][0] != 1:
+                errors.append("O cabeçalho deve ser único e estar na primeira linha")
+            header = {name: str(values[0]) for name, values in header_columns.items() if name != 'linha'}
+
+        return {'header': header, 'records': records, 'errors': errors, 'lines': len(starts)}
+
+    def _parse_records(self, buffer: np.ndarray, starts: np.ndarray, lengths: np.ndarray,
+                       selected: np.ndarray, layout: RecordLayout, errors: List[str]) -> Dict[str, np.ndarray]:
+        """Lê os campos das linhas de um tipo de registro"""
+        width = layout.record_len
+        fits = lengths[selected] == width
+        rows = selected[fits]
+        matrix = buffer[starts[rows][:, None] + np.arange(width)] if rows.size else np.empty((0, width), dtype=np.uint8)
+
+        # Linhas com bytes fora do ASCII (ou com tamanho em bytes diferente) são
+        # decodificadas e lidas de uma matriz de códigos UTF-32
+        wide = (matrix >= 0x80).any(axis=1)
+        decoded_rows = []
+        texts = []
+        for i in np.concatenate((selected[~fits], rows[wide])):
+            raw = buffer[starts[i]:starts[i] + lengths[i]].tobytes()
+            try:
+                text = raw.decode(self.encoding)
+            except UnicodeDecodeError:
+                errors.append(f"Linha {i + 1}: caracteres inválidos para {self.encoding}")
+                continue
+            if len(text) != width:
+                errors.append(f"Linha {i + 1}: {len(text)} caracteres, esperado {width} ({layout.name})")
+                continue
+            decoded_rows.append(i)
+            texts.append(text)
+
+        decoded_rows = np.array(decoded_rows, dtype=np.int64)
+        decoded = np.array(texts, dtype=f'U{width}').view(np.uint32).reshape(len(texts), width)
+        parts = [(rows[~wide], matrix[~wide]), (decoded_rows, decoded)]
+        lines = np.sort(np.concatenate([part_rows for part_rows, _ in parts]))
+
+        columns = {'linha': lines + 1}
+        for spec in layout:
+            start, end = spec.offset, spec.offset + spec.width
+            values = np.empty(len(lines), dtype=f'U{spec.width}')
+            for part_rows, part_matrix in parts:
+                if not part_rows.size:
+                    continue
+                chunk = np.ascontiguousarray(part_matrix[:, start:end])
+                if chunk.dtype == np.uint8:
+                    text = chunk.view(f'S{spec.width}').ravel().astype(f'U{spec.width}')
+                else:
+                    text = chunk.view(f'U{spec.width}').ravel()
+                values[np.searchsorted(lines, part_rows)] = text
+                self._check_field(chunk, spec, layout, part_rows, errors)
+            columns[spec.name] = values
+        return columns
+
+    def _check_field(self, chunk: np.ndarray, spec, layout: RecordLayout, rows: np.ndarray, errors: List[str]):
+        """Verifica de uma vez o conteúdo de um campo em todas as linhas da matriz"""
+        if spec.value is not None:
+            expected = np.frombuffer(spec.value.ljust(spec.width)[:spec.width].encode('ascii'), dtype=np.uint8)
+            invalid = (chunk != expected).any(axis=1)
+            message = f"campo {spec.name} diferente de {spec.value!r}"
+        elif spec.type == NUMERIC:
+            digits = (chunk >= _DIGIT_0) & (chunk <= _DIGIT_9)
+            if spec.pad == ZERO:
+                invalid = ~digits.all(axis=1)
+            else:
+                # Dígitos alinhados à esquerda, seguidos de brancos
+                spaces = chunk == _SPACE
+                blank_tail = np.flip(np.cumprod(np.flip(spaces, axis=1), axis=1), axis=1).astype(bool)
+                invalid = ~(digits | blank_tail).all(axis=1)
+            message = f"campo {spec.name} não numérico"
+        else:
+            return
+        for i in rows[invalid][:self.max_errors]:
+            errors.append(f"Linha {i + 1}: {message} ({layout.name})")
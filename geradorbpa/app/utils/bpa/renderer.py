@@ -0,0 +1,226 @@
+from typing import Any, Dict, Iterator, NamedTuple
+import numpy as np
+import pandas as pd
+from app.utils.bpa.layout import Field, RecordLayout, FOLHA, LEFT, LINE_TERMINATOR, ZERO
+
+_MAX_INT = 2 ** 63
+
+# Tipos inferidos de colunas object que podem conter floats
+_MAY_HOLD_FLOATS = ('floating', 'mixed-integer-float', 'mixed', 'mixed-integer')
+
+
+class RenderedBatch(NamedTuple):
+    """Lote renderizado: matriz de bytes e linhas com caracteres fora do ASCII"""
+    matrix: np.ndarray
+    fallback: Dict[int, bytes]
+
+    def field_sum(self, spec: Field) -> int:
+        """
+        Soma os valores de um campo numérico em todas as linhas do lote,
+        ignorando as linhas em que o campo não tem apenas dígitos (como na leitura do arquivo)
+        """
+        start, end = spec.offset, spec.offset + spec.width
+        digits = self.matrix[:, start:end].astype(np.int64) - ord('0')
+        numeric = ((digits >= 0) & (digits <= 9)).all(axis=1)
+        if self.fallback:
+            # Nessas linhas a matriz não guarda os caracteres; o campo é lido do texto
+            numeric[list(self.fallback)] = False
+        total = int((digits[numeric] @ (10 ** np.arange(spec.width - 1, -1, -1, dtype=np.int64))).sum())
+        for line in self.fallback.values():
+            text = line.decode("utf-8")[start:end].strip()
+            if text.isdigit():
+                total += int(text)
+        return total
+
+
+def column_text(values) -> np.ndarray:
+    """
+    Converte uma coluna em texto, como str() faria para cada valor, com floats
+    inteiros sem a parte decimal e valores ausentes como string vazia
+
+    Args:
+        values: Série do pandas (ou sequência) com os valores da coluna
+
+    Returns:
+        Array de strings do NumPy
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    empty = series.isna().to_numpy()
+    text = series.astype(str).to_numpy(dtype=object)
+
+    if pd.api.types.is_float_dtype(series.dtype):
+        numbers = series.to_numpy(dtype=float, na_value=np.nan)
+        whole = ~empty & np.isfinite(numbers) & (numbers == np.trunc(numbers)) & (np.abs(numbers) < _MAX_INT)
+        text[whole] = numbers[whole].astype(np.int64).astype(str)
+    elif series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) in _MAY_HOLD_FLOATS:
+        # Coluna mista: apenas os floats inteiros são convertidos individualmente
+        for i in np.flatnonzero(~empty):
+            value = series.iat[i]
+            if isinstance(value, float) and value.is_integer():
+                text[i] = str(int(value))
+
+    text[empty] = ''
+    return np.asarray(text, dtype=str) if len(text) else np.array([], dtype='<U1')
+
+
+def _codes(text: np.ndarray, width: int) -> np.ndarray:
+    """Matriz (n, width) com os códigos dos caracteres de strings de tamanho width"""
+    return np.ascontiguousarray(text.astype(f'U{width}')).view(np.uint32).reshape(len(text), width)
+
+
+def format_codes(text: np.ndarray, spec: Field) -> np.ndarray:
+    """
+    Formata uma coluna de texto no tamanho do campo
+
+    Returns:
+        Matriz (n, largura) com os códigos dos caracteres
+    """
+    width = spec.width
+    if spec.pad == ZERO:
+        padded = np.char.zfill(np.char.strip(text), width)
+    else:
+        padded = np.char.ljust(text, width)
+    longest = int(np.char.str_len(padded).max())
+    if longest > width and spec.truncate == LEFT:
+        # Alinha à direita para manter os caracteres finais
+        return _codes(np.char.rjust(padded, longest), longest)[:, longest - width:]
+    return _codes(padded, width)
+
+
+def _is_empty(value) -> bool:
+    if value is None:
+        return True
+    try:
+        return bool(pd.isna(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def format_value(spec: Field, value: Any) -> str:
+    """
+    Formata um valor no tamanho do campo, com as mesmas regras de format_codes
+
+    Args:
+        spec: Campo do layout
+        value: Valor a formatar (ignorado em campos fixos)
+
+    Returns:
+        Texto com exatamente spec.width caracteres
+    """
+    if spec.value is not None:
+        text = spec.value
+    elif _is_empty(value):
+        text = ""
+    elif isinstance(value, float) and value.is_integer():
+        text = str(int(value))
+    else:
+        text = str(value)
+
+    if spec.pad == ZERO:
+        text = text.strip().zfill(spec.width)
+    else:
+        text = text.ljust(spec.width)
+    return text[-spec.width:] if spec.truncate == LEFT else text[:spec.width]
+
+
+def render_line(layout: RecordLayout, row: Any, folha: int = None) -> str:
+    """
+    Renderiza um registro (dicionário ou série do pandas) em uma linha terminada em CRLF
+    """
+    values = []
+    for spec in layout:
+        if spec.name == FOLHA and folha is not None:
+            value = folha
+        else:
+            value = None if spec.value is not None else row.get(spec.name)
+        values.append(format_value(spec, value))
+    return "".join(values) + LINE_TERMINATOR.decode("ascii")
+
+
+class BPARenderer:
+    """
+    Renderiza lotes de registros em linhas de largura fixa
+
+    Cada coluna é formatada e gravada de uma vez na sua faixa de bytes de uma
+    matriz (n_linhas, tamanho_do_registro) de uint8, emitida com tobytes().
+    Linhas com caracteres fora do ASCII são codificadas à parte em UTF-8.
+    """
+
+    def __init__(self, layout: RecordLayout):
+        self.layout = layout
+        self.record_len = layout.record_len + len(LINE_TERMINATOR)
+
+    def render(self, frame: pd.DataFrame, pages=None) -> RenderedBatch:
+        """
+        Renderiza um lote de registros
+
+        Args:
+            frame: DataFrame com os registros (colunas ausentes ficam em branco ou zeradas)
+            pages: Folha de cada registro, para o campo FOLHA
+
+        Returns:
+            Lote renderizado
+        """
+        n = len(frame)
+        matrix = np.empty((n, self.record_len), dtype=np.uint8)
+        matrix[:, -len(LINE_TERMINATOR):] = np.frombuffer(LINE_TERMINATOR, dtype=np.uint8)
+        non_ascii = np.zeros(n, dtype=bool)
+        segments = []
+
+        for spec in self.layout:
+            offset, end = spec.offset, spec.offset + spec.width
+            if spec.value is not None:
+                value = format_value(spec, None)
+                matrix[:, offset:end] = np.frombuffer(value.encode('ascii'), dtype=np.uint8)
+                segments.append(value)
+                continue
+
+            if spec.name == FOLHA and pages is not None:
+                source = pd.Series(pages)
+            elif spec.name in frame.columns:
+                source = frame[spec.name]
+            else:
+                source = pd.Series([None] * n, dtype=object)
+
+            codes = format_codes(column_text(source), spec) if n else np.empty((0, spec.width), dtype=np.uint32)
+            wide = codes > 0x7F
+            if wide.any():
+                non_ascii |= wide.any(axis=1)
+            matrix[:, offset:end] = codes
+            segments.append(codes)
+
+        fallback = {}
+        rows = np.flatnonzero(non_ascii)
+        if rows.size:
+            # Monta as linhas com caracteres fora do ASCII em uma matriz de códigos UTF-32
+            wide = np.empty((rows.size, self.layout.record_len), dtype=np.uint32)
+            for spec, segment in zip(self.layout, segments):
+                if isinstance(segment, str):
+                    segment = np.array([ord(char) for char in segment], dtype=np.uint32)
+                else:
+                    segment = segment[rows]
+                wide[:, spec.offset:spec.offset + spec.width] = segment
+            texts = wide.view(f'U{self.layout.record_len}').ravel()
+            fallback = {int(i): text.encode("utf-8") + LINE_TERMINATOR for i, text in zip(rows, texts)}
+
+        return RenderedBatch(matrix, fallback)
+
+    def iter_chunks(self, batch: RenderedBatch, chunk_size: int) -> Iterator[bytes]:
+        """
+        Emite o lote renderizado em blocos de aproximadamente chunk_size bytes,
+        com linhas completas terminadas em CRLF
+        """
+        n = len(batch.matrix)
+        rows_per_chunk = max(1, chunk_size // self.record_len)
+        fallback_rows = np.array(sorted(batch.fallback), dtype=np.int64)
+
+        for start in range(0, n, rows_per_chunk):
+            stop = min(start + rows_per_chunk, n)
+            first = np.searchsorted(fallback_rows, start)
+            if first == len(fallback_rows) or fallback_rows[first] >= stop:
+                yield batch.matrix[start:stop].tobytes()
+            else:
+                yield b"".join(
+                    batch.fallback.get(i) or batch.matrix[i].tobytes()
+                    for i in range(start, stop)
+                )
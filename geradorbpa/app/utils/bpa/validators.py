@@ -1,12 +1,22 @@
 from abc import ABC, abstractmethod
+import numpy as np
 import pandas as pd
+from app.config import settings
+from app.utils.bpa.check_digits import COLUMN_CHECKS, VALUE_CHECKS
 from app.utils.logger import logger
 
 class BaseBPAValidator(ABC):
     """Classe base para validação de BPA"""
     
+    # Campos obrigatórios e campos numéricos de tamanho fixo (definidos por tipo de BPA)
+    required_fields = []
+    digit_fields = {}
+    # Campos com dígito verificador: nome do campo -> tipo de código (cns, cnes)
+    check_digit_fields = {}
+    
     def __init__(self):
         self.errors = []
+        self.reject_invalid_check_digits = settings.BPA_REJECT_INVALID_CHECK_DIGITS
     
     def validate(self, row: pd.Series) -> bool:
         """
@@ -22,6 +32,8 @@ class BaseBPAValidator(ABC):
         self._validate_required_fields(row)
         self._validate_field_formats(row)
         self._validate_field_values(row)
+        if self.reject_invalid_check_digits:
+            self._validate_check_digits(row)
         return len(self.errors) == 0
     
     def get_errors(self) -> list:
@@ -33,6 +45,110 @@ class BaseBPAValidator(ABC):
         self.errors.append(f"{field}: {message}")
         logger.log_warning(f"Erro de validação: {field} - {message}")
     
+    def valid_mask(self, frame: pd.DataFrame) -> np.ndarray:
+        """
+        Valida todas as linhas de um DataFrame de uma vez, com as mesmas regras de validate()
+        
+        Args:
+            frame: DataFrame com os registros
+            
+        Returns:
+            Array booleano com True para as linhas válidas
+        """
+        mask = np.ones(len(frame), dtype=bool)
+        for field in self.required_fields:
+            if field not in frame.columns:
+                return np.zeros(len(frame), dtype=bool)
+            mask &= frame[field].notna().to_numpy()
+        for field, length in self.digit_fields.items():
+            mask &= self._digits_mask(frame, field, length)
+        mask &= self._values_mask(frame)
+        check_digits = self.check_digit_mask(frame, mask)
+        if self.reject_invalid_check_digits:
+            mask &= check_digits
+        return mask
+    
+    def check_digit_mask(self, frame: pd.DataFrame, rows: np.ndarray = None) -> np.ndarray:
+        """
+        Valida os dígitos verificadores de todas as linhas, uma coluna por vez,
+        registrando um aviso com a quantidade de códigos inválidos por campo
+        
+        Args:
+            frame: DataFrame com os registros
+            rows: Linhas a verificar (padrão: todas); as demais são consideradas válidas
+            
+        Returns:
+            Array booleano com True para as linhas sem código inválido (campos ausentes são ignorados)
+        """
+        mask = np.ones(len(frame), dtype=bool)
+        for field, kind in self.check_digit_fields.items():
+            if field not in frame.columns:
+                continue
+            present = frame[field].notna().to_numpy()
+            if rows is not None:
+                present = present & rows
+            ok = ~present | COLUMN_CHECKS[kind](frame[field])
+            invalid = len(ok) - int(ok.sum())
+            if invalid:
+                logger.log_warning(f"{invalid} registro(s) com dígito verificador inválido em {field}")
+            mask &= ok
+        return mask
+    
+    def _validate_check_digits(self, row: pd.Series):
+        for field, kind in self.check_digit_fields.items():
+            if field in row and not pd.isna(row[field]) and not VALUE_CHECKS[kind](row[field]):
+                self._add_error(field, "Dígito verificador inválido")
+    
+    @staticmethod
+    def _raw_text(series: pd.Series) -> np.ndarray:
+        return np.asarray(series.astype(str).to_numpy(dtype=object), dtype=str)
+    
+    def _digits_mask(self, frame: pd.DataFrame, field: str, length: int) -> np.ndarray:
+        """Campo ausente ou apenas dígitos com o tamanho exato"""
+        if field not in frame.columns:
+            return np.ones(len(frame), dtype=bool)
+        present = frame[field].notna().to_numpy()
+        text = self._raw_text(frame[field])
+        ok = np.char.isdigit(text) & (np.char.str_len(text) == length)
+        return ~present | ok
+    
+    def _int_mask(self, frame: pd.DataFrame, field: str, minimum=None, maximum=None) -> np.ndarray:
+        """Campo ausente ou convertível com int() dentro dos limites"""
+        if field not in frame.columns:
+            return np.ones(len(frame), dtype=bool)
+        series = frame[field]
+        present = series.notna().to_numpy()
+        inferred = pd.api.types.infer_dtype(series, skipna=True)
+        if pd.api.types.is_numeric_dtype(series.dtype) or inferred not in ('string', 'mixed', 'mixed-integer'):
+            numbers = pd.to_numeric(series, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+            ok = np.isfinite(numbers)
+        else:
+            # Strings precisam ser inteiros (como em int()); os demais valores são truncados
+            matched = series.str.fullmatch(r'\s*[+-]?\d+\s*')
+            is_text = matched.notna().to_numpy()
+            stripped = series.str.strip()
+            numbers = pd.to_numeric(stripped.where(matched.notna(), series), errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+            ok = np.where(is_text, matched.fillna(False).to_numpy(dtype=bool), np.isfinite(numbers))
+        numbers = np.trunc(np.where(ok, numbers, 0))
+        if minimum is not None:
+            ok &= numbers >= minimum
+        if maximum is not None:
+            ok &= numbers <= maximum
+        return ~present | ok
+    
+    def _choice_mask(self, frame: pd.DataFrame, field: str, choices) -> np.ndarray:
+        """Campo ausente ou, em maiúsculas, entre as opções"""
+        if field not in frame.columns:
+            return np.ones(len(frame), dtype=bool)
+        present = frame[field].notna().to_numpy()
+        text = np.char.upper(self._raw_text(frame[field]))
+        return ~present | np.isin(text, list(choices))
+    
+    @abstractmethod
+    def _values_mask(self, frame: pd.DataFrame) -> np.ndarray:
+        """Valida os valores dos campos de todas as linhas"""
+        pass
+    
     @abstractmethod
     def _validate_required_fields(self, row: pd.Series):
         """Valida campos obrigatórios"""
@@ -51,11 +167,16 @@ class BaseBPAValidator(ABC):
 class BPAConsolidadoValidator(BaseBPAValidator):
     """Validador para BPA Consolidado"""
     
+    required_fields = ['cnes', 'competencia', 'cbo', 'sequencial', 
+                       'procedimento', 'idade', 'quantidade']
+    digit_fields = {'cnes': 7, 'competencia': 6, 'cbo': 6}
+    check_digit_fields = {'cnes': 'cnes'}
+    
+    def _values_mask(self, frame: pd.DataFrame) -> np.ndarray:
+        return self._int_mask(frame, 'idade', 0, 150) & self._int_mask(frame, 'quantidade', 1)
+    
     def _validate_required_fields(self, row: pd.Series):
-        required_fields = ['cnes', 'competencia', 'cbo', 'sequencial', 
-                         'procedimento', 'idade', 'quantidade']
-        
-        for field in required_fields:
+        for field in self.required_fields:
             if field not in row or pd.isna(row[field]):
                 self._add_error(field, "Campo obrigatório ausente")
     
@@ -97,15 +218,28 @@ class BPAConsolidadoValidator(BaseBPAValidator):
 class BPAIndividualizadoValidator(BaseBPAValidator):
     """Validador para BPA Individualizado"""
     
+    required_fields = [
+        'cnes', 'competencia', 'cns_profissional', 'cbo', 'data_atendimento',
+        'sequencial', 'procedimento', 'cns_paciente', 'sexo', 'codigo_municipio',
+        'cid', 'idade', 'quantidade', 'carater_atendimento', 'nome_paciente',
+        'data_nascimento'
+    ]
+    digit_fields = {
+        'cnes': 7, 'competencia': 6, 'cbo': 6, 'cns_profissional': 15,
+        'cns_paciente': 15, 'data_atendimento': 8
+    }
+    check_digit_fields = {'cnes': 'cnes', 'cns_profissional': 'cns', 'cns_paciente': 'cns'}
+    
+    def _values_mask(self, frame: pd.DataFrame) -> np.ndarray:
+        return (
+            self._int_mask(frame, 'idade', 0, 150)
+            & self._int_mask(frame, 'quantidade', 1)
+            & self._choice_mask(frame, 'sexo', ['M', 'F'])
+            & self._choice_mask(frame, 'carater_atendimento', ['1', '2', '3', '4'])
+        )
+    
     def _validate_required_fields(self, row: pd.Series):
-        required_fields = [
-            'cnes', 'competencia', 'cns_profissional', 'cbo', 'data_atendimento',
-            'sequencial', 'procedimento', 'cns_paciente', 'sexo', 'codigo_municipio',
-            'cid', 'idade', 'quantidade', 'carater_atendimento', 'nome_paciente',
-            'data_nascimento'
-        ]
-        
-        for field in required_fields:
+        for field in self.required_fields:
             if field not in row or pd.isna(row[field]):
                 self._add_error(field, "Campo obrigatório ausente")
     
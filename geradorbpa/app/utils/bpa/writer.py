@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, IO
+from app.config import settings
+from app.utils.bpa_generator import BPAGenerator
+from app.utils.bpa.layout import FORMAT_VERSION, HEADER
+from app.utils.config_reader import ConfigReader
+from app.utils.logger import logger
+
+# Diretório do organization.json
+ORG_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data')
+
+
+class BPAFileWriter:
+    """
+    Grava o arquivo BPA completo, com cabeçalho, em uma única passada pelos dados
+
+    As linhas são gravadas em um arquivo temporário (em memória até
+    BPA_SPOOL_MAX_SIZE bytes) enquanto o gerador acumula o total de linhas, de
+    folhas e o campo de controle. O cabeçalho é reservado no início do arquivo e
+    regravado no final com os totais; como os campos numéricos têm tamanho fixo,
+    ele ocupa os mesmos bytes.
+    """
+
+    def __init__(self, header_data: Dict[str, Any], chunk_size: int = None, spool_size: int = None):
+        """
+        Args:
+            header_data: Dados do cabeçalho (year_month, org_name, org_acronym,
+                cgc_cpf, dest_name, dest_type, version)
+            chunk_size: Tamanho aproximado dos blocos em bytes (padrão: BPA_STREAM_CHUNK_SIZE)
+            spool_size: Bytes mantidos em memória (padrão: BPA_SPOOL_MAX_SIZE)
+        """
+        self.header_data = header_data
+        self.chunk_size = chunk_size or settings.BPA_STREAM_CHUNK_SIZE
+        self.spool_size = spool_size or settings.BPA_SPOOL_MAX_SIZE
+        self.summary: Dict[str, int] = {}
+
+    @classmethod
+    def from_organization(cls, year_month: str, config_reader: ConfigReader = None, **kwargs) -> "BPAFileWriter":
+        """Cria o gravador com o cabeçalho da configuração da organização (organization.json)"""
+        config = (config_reader or ConfigReader(ORG_CONFIG_PATH)).get_org_config()
+        organization = config.get('organization', {})
+        destination = config.get('destination', {})
+        return cls({
+            'year_month': year_month,
+            'org_name': organization.get('name', ''),
+            'org_acronym': organization.get('acronym', ''),
+            'cgc_cpf': organization.get('cgc_cpf', ''),
+            'dest_name': destination.get('name', ''),
+            'dest_type': destination.get('type', 'M'),
+            'version': config.get('system', {}).get('version', '1.0.0'),
+        }, **kwargs)
+
+    def fingerprint(self, generator) -> str:
+        """
+        Identifica o que, além dos dados, determina o conteúdo do arquivo: o
+        cabeçalho, os layouts, a versão da geração (FORMAT_VERSION) e as
+        opções de paginação e validação do gerador
+
+        Args:
+            generator: Gerador do tipo de BPA (BaseBPAGenerator)
+
+        Returns:
+            Hash hexadecimal de 16 caracteres
+        """
+        inputs = {
+            'header': self.header_data,
+            'layouts': [[list(spec) for spec in layout] for layout in (HEADER, generator.layout)],
+            'format_version': FORMAT_VERSION,
+            'max_lines_per_page': generator.max_lines_per_page,
+            'reject_invalid_check_digits': generator.validator.reject_invalid_check_digits,
+        }
+        encoded = json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()[:16]
+
+    def _header(self, total_lines: int, total_sheets: int, control: int) -> bytes:
+        header = dict(self.header_data, total_lines=total_lines, total_sheets=total_sheets, control=control)
+        return BPAGenerator().generate_header(header).encode("utf-8")
+
+    def write(self, generator, batches: Iterable[Any]) -> IO[bytes]:
+        """
+        Grava o arquivo a partir dos lotes de registros
+
+        Args:
+            generator: Gerador do tipo de BPA (BaseBPAGenerator)
+            batches: Lotes de registros (DataFrames ou listas de dicionários)
+
+        Returns:
+            Arquivo temporário posicionado no início; fechá-lo o descarta
+        """
+        file = tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+        try:
+            placeholder = self._header(0, 0, 0)
+            file.write(placeholder)
+            for chunk in generator.iter_chunks(batches, self.chunk_size):
+                file.write(chunk)
+
+            self.summary = {
+                'lines': generator.line_count,
+                'sheets': generator.sheet_count,
+                'control': generator.control,
+            }
+            header = self._header(self.summary['lines'], self.summary['sheets'], self.summary['control'])
+            if len(header) != len(placeholder):
+                raise ValueError("Cabeçalho do BPA com tamanho diferente do reservado")
+            file.seek(0)
+            file.write(header)
+            file.seek(0)
+        except Exception:
+            file.close()
+            raise
+
+        logger.log_info(
+            f"Arquivo BPA gravado: {self.summary['lines']} linhas, {self.summary['sheets']} folhas, "
+            f"controle {self.summary['control']}"
+        )
+        return file
+
+    def iter_file(self, file: IO[bytes]) -> Iterator[bytes]:
+        """Lê o arquivo gravado em blocos e o descarta ao final"""
+        try:
+            while True:
+                chunk = file.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            file.close()
@@ -14,6 +14,13 @@ class BPAController:
         )
         self.logger = logging.getLogger('bpa_controller')
 
+    def download(self, year_month, tipo_relatorio):
+        """
+        Envia o arquivo BPA de uma competência por GET, permitindo requisições
+        condicionais (ETag/If-None-Match) em downloads repetidos
+        """
+        return self.process_form({"year_month": year_month, "tipo_relatorio": tipo_relatorio})
+
     def process_form(self, form_data):
         """
         Processa os dados do formulário e gera o arquivo BPA.
@@ -53,10 +60,15 @@ class BPAController:
                 )
 
             self.logger.info(f"Gerando arquivo BPA {tipo_relatorio} para competência {year_month}")
-            memoria = self.service.generate_bpa_file(year_month, tipo_relatorio)
+            artifact = self.service.get_bpa_artifact(year_month, tipo_relatorio)
+            if artifact:
+                self.logger.info(f"Enviando arquivo BPA gravado em disco: {artifact.path}")
+                return self.view.send_artifact(artifact, tipo_relatorio)
+
+            chunks = self.service.stream_bpa_file(year_month, tipo_relatorio)
             
-            self.logger.info(f"Arquivo BPA gerado com sucesso. Enviando para download.")
-            return self.view.send_file(memoria, tipo_relatorio)
+            self.logger.info(f"Iniciando envio do arquivo BPA em streaming.")
+            return self.view.stream_file(chunks, tipo_relatorio)
 
         except ValueError as e:
             # Erros de validação específicos
@@ -1,21 +1,91 @@
+import re
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Callable
+from app.utils.bpa.layout import BPA_C, BPA_I, ZERO, Field
+
+# Marca, na especificação das colunas, os campos de data (formatados como AAAAMMDD)
+DATE = 'date'
+
+# Datas em formatos sem ambiguidade, convertidas de uma vez na formatação por coluna
+_DATE_FORMATS = (
+    (re.compile(r'^\d{8}$'), '%Y%m%d'),
+    (re.compile(r'^\d{4}-\d{2}-\d{2}$'), '%Y-%m-%d'),
+)
 
 class BPAFormatter:
     """Classe responsável por formatar os dados para o BPA"""
-    
+
+    # Campo do layout usado para formatar cada coluna (os mesmos dos métodos format_<coluna>)
+    COLUMNS: Dict[str, str] = {
+        'cnes': 'cnes',
+        'competencia': 'competencia',
+        'cns': 'cns_paciente',
+        'cns_profissional': 'cns_paciente',
+        'cns_paciente': 'cns_paciente',
+        'cbo': 'cbo',
+        'data_atendimento': DATE,
+        'folha': 'folha',
+        'sequencial': 'sequencial',
+        'procedimento': 'procedimento',
+        'codigo_municipio': 'codigo_municipio',
+        'cid': 'cid',
+        'idade': 'idade',
+        'quantidade': 'quantidade',
+        'carater_atendimento': 'carater_atendimento',
+        'numero_autorizacao': 'numero_autorizacao',
+        'nome_paciente': 'nome_paciente',
+        'data_nascimento': DATE,
+        'raca': 'raca',
+        'etnia': 'etnia',
+        'nacionalidade': 'nacionalidade',
+        'servico': 'servico',
+        'classificacao': 'classificacao',
+        'equipe_seq': 'equipe_seq',
+        'equipe_area': 'equipe_area',
+        'cnpj': 'cnpj',
+        'cep': 'cep',
+        'codigo_logradouro': 'codigo_logradouro',
+        'endereco': 'endereco',
+        'complemento': 'complemento',
+        'numero': 'numero',
+        'bairro': 'bairro',
+        'telefone': 'telefone',
+        'email': 'email',
+        'ine': 'ine',
+    }
+
+    @staticmethod
+    def _field(name: str) -> Field:
+        return BPA_I[name] if name in BPA_I else BPA_C[name]
+
+    @classmethod
+    def _pad(cls, name: str, value: str) -> str:
+        """Preenche o valor até o tamanho do campo no layout do BPA"""
+        spec = cls._field(name)
+        if spec.pad == ZERO:
+            return str(value).zfill(spec.width)
+        return str(value).ljust(spec.width)
+
+    @classmethod
+    def _format_date(cls, value: Any) -> str:
+        try:
+            return pd.to_datetime(value).strftime('%Y%m%d')
+        except:
+            # Fallback para formato atual se a conversão falhar
+            return str(value)
+
     @classmethod
     def format_cnes(cls, value: str) -> str:
-        return str(value).zfill(7)
+        return cls._pad('cnes', value)
 
     @classmethod
     def format_competencia(cls, value: str) -> str:
-        return str(value).zfill(6)
+        return cls._pad('competencia', value)
 
     @classmethod
     def format_cns(cls, value: str) -> str:
-        return str(value).zfill(15)
+        return cls._pad('cns_paciente', value)
 
     @classmethod
     def format_cns_profissional(cls, value: str) -> str:
@@ -27,131 +97,123 @@ class BPAFormatter:
 
     @classmethod
     def format_cbo(cls, value: str) -> str:
-        return str(value).ljust(6)
+        return cls._pad('cbo', value)
 
     @classmethod
     def format_data_atendimento(cls, value: str) -> str:
-        try:
-            return pd.to_datetime(value).strftime('%Y%m%d')
-        except:
-            # Fallback para formato atual se a conversão falhar
-            return str(value)
+        return cls._format_date(value)
 
     @classmethod
     def format_folha(cls, value: str) -> str:
-        return str(value).zfill(3)
+        return cls._pad('folha', value)
 
     @classmethod
     def format_sequencial(cls, value: str) -> str:
-        return str(value).zfill(2)
+        return cls._pad('sequencial', value)
 
     @classmethod
     def format_procedimento(cls, value: str) -> str:
-        return str(value).zfill(10)
+        return cls._pad('procedimento', value)
 
     @classmethod
     def format_codigo_municipio(cls, value: str) -> str:
-        return str(value).zfill(6)
+        return cls._pad('codigo_municipio', value)
 
     @classmethod
     def format_cid(cls, value: str) -> str:
-        return str(value).ljust(4)
+        return cls._pad('cid', value)
 
     @classmethod
     def format_idade(cls, value: str) -> str:
-        return str(value).zfill(3)
+        return cls._pad('idade', value)
 
     @classmethod
     def format_quantidade(cls, value: str) -> str:
-        return str(value).zfill(6)
+        return cls._pad('quantidade', value)
 
     @classmethod
     def format_carater_atendimento(cls, value: str) -> str:
-        return str(value).zfill(2)
+        return cls._pad('carater_atendimento', value)
 
     @classmethod
     def format_numero_autorizacao(cls, value: str) -> str:
-        return str(value).ljust(13)
+        return cls._pad('numero_autorizacao', value)
 
     @classmethod
     def format_nome_paciente(cls, value: str) -> str:
-        return str(value).ljust(30)
+        return cls._pad('nome_paciente', value)
 
     @classmethod
     def format_data_nascimento(cls, value: str) -> str:
-        try:
-            return pd.to_datetime(value).strftime('%Y%m%d')
-        except:
-            # Fallback para formato atual se a conversão falhar
-            return str(value)
+        return cls._format_date(value)
 
     @classmethod
     def format_raca(cls, value: str) -> str:
-        return str(value).zfill(2)
+        return cls._pad('raca', value)
 
     @classmethod
     def format_etnia(cls, value: str) -> str:
-        return str(value).ljust(4)
+        return cls._pad('etnia', value)
 
     @classmethod
     def format_nacionalidade(cls, value: str) -> str:
-        return str(value).zfill(3)
+        return cls._pad('nacionalidade', value)
 
     @classmethod
     def format_servico(cls, value: str) -> str:
-        return str(value).ljust(3)
+        return cls._pad('servico', value)
 
     @classmethod
     def format_classificacao(cls, value: str) -> str:
-        return str(value).ljust(3)
+        return cls._pad('classificacao', value)
 
     @classmethod
     def format_equipe_seq(cls, value: str) -> str:
-        return str(value).ljust(8)
+        return cls._pad('equipe_seq', value)
 
     @classmethod
     def format_equipe_area(cls, value: str) -> str:
-        return str(value).ljust(4)
+        return cls._pad('equipe_area', value)
 
     @classmethod
     def format_cnpj(cls, value: str) -> str:
-        return str(value).ljust(14)
+        return cls._pad('cnpj', value)
 
     @classmethod
     def format_cep(cls, value: str) -> str:
-        return str(value).ljust(8)
+        return cls._pad('cep', value)
 
     @classmethod
     def format_codigo_logradouro(cls, value: str) -> str:
-        return str(value).ljust(3)
+        return cls._pad('codigo_logradouro', value)
 
     @classmethod
     def format_endereco(cls, value: str) -> str:
-        return str(value).ljust(30)
+        return cls._pad('endereco', value)
 
     @classmethod
     def format_complemento(cls, value: str) -> str:
-        return str(value).ljust(10)
+        return cls._pad('complemento', value)
 
     @classmethod
     def format_numero(cls, value: str) -> str:
-        return str(value).ljust(5)
+        return cls._pad('numero', value)
 
     @classmethod
     def format_bairro(cls, value: str) -> str:
-        return str(value).ljust(30)
+        return cls._pad('bairro', value)
 
     @classmethod
     def format_telefone(cls, value: str) -> str:
-        return str(value).ljust(11)
+        return cls._pad('telefone', value)
 
     @classmethod
     def format_email(cls, value: str) -> str:
-        return str(value).ljust(40)
+        return cls._pad('email', value)
 
     @classmethod
     def format_ine(cls, value: str) -> str:
-        return str(value).ljust(10)
+        return cls._pad('ine', value)
 
     @classmethod
     def format_data(cls, row: Dict[str, Any]) -> Dict[str, Any]:
@@ -164,3 +226,109 @@ class BPAFormatter:
             else:
                 formatted_row[key] = value
         return formatted_row
+
+    @staticmethod
+    def _text(values: pd.Series) -> np.ndarray:
+        """Texto de cada valor da coluna, como str() faria"""
+        return values.to_numpy(dtype=object).astype(str)
+
+    @classmethod
+    def _pad_column(cls, spec: Field, values: pd.Series) -> np.ndarray:
+        if not len(values):
+            return np.array([], dtype=str)
+        if spec.pad == ZERO:
+            return np.char.zfill(cls._text(values), spec.width)
+        return np.char.ljust(cls._text(values), spec.width)
+
+    @classmethod
+    def _date_column(cls, values: pd.Series) -> np.ndarray:
+        """
+        Formata uma coluna de datas como AAAAMMDD
+
+        Strings em formatos sem ambiguidade (AAAAMMDD e AAAA-MM-DD) são
+        convertidas de uma vez; os demais valores distintos passam pela
+        conversão do formatador por linha, preservando o mesmo resultado.
+        """
+        if pd.api.types.is_datetime64_any_dtype(values.dtype):
+            result = values.dt.strftime('%Y%m%d').to_numpy(dtype=object)
+            result[values.isna().to_numpy()] = str(pd.NaT)
+            return result.astype(str)
+
+        objects = values.to_numpy(dtype=object)
+        result = np.empty(len(objects), dtype=object)
+        mixed = values.dtype == object or pd.api.types.is_string_dtype(values.dtype)
+        if values.dtype == object:
+            is_text = np.fromiter((type(value) is str for value in objects), dtype=bool, count=len(objects))
+        elif mixed:
+            is_text = values.notna().to_numpy()
+        else:
+            is_text = np.zeros(len(objects), dtype=bool)
+
+        if is_text.any():
+            codes, uniques = pd.factorize(objects[is_text])
+            uniques = uniques.astype(object)
+            formatted = np.empty(len(uniques), dtype=object)
+            pending = np.ones(len(uniques), dtype=bool)
+            for pattern, date_format in _DATE_FORMATS:
+                matches = pending & np.array([bool(pattern.match(value)) for value in uniques], dtype=bool)
+                if not matches.any():
+                    continue
+                parsed = pd.to_datetime(pd.Series(uniques[matches]), format=date_format, errors='coerce')
+                ok = parsed.notna().to_numpy()
+                indices = np.flatnonzero(matches)[ok]
+                formatted[indices] = parsed[ok].dt.strftime('%Y%m%d').to_numpy(dtype=object)
+                pending[indices] = False
+            for i in np.flatnonzero(pending):
+                formatted[i] = cls._format_date(uniques[i])
+            result[is_text] = formatted[codes]
+
+        others = np.flatnonzero(~is_text)
+        if others.size:
+            if mixed:
+                result[others] = [cls._format_date(value) for value in objects[others]]
+            else:
+                # Coluna tipada: os valores distintos têm o mesmo tipo
+                codes, uniques = pd.factorize(objects[others], use_na_sentinel=False)
+                result[others] = np.array([cls._format_date(value) for value in uniques], dtype=object)[codes]
+        return result.astype(str) if len(result) else np.array([], dtype='<U1')
+
+    @classmethod
+    def column_formatters(cls) -> Dict[str, Callable[[pd.Series], np.ndarray]]:
+        """Formatadores por coluna, resolvidos uma única vez a partir de COLUMNS"""
+        if '_column_formatters' not in cls.__dict__:
+            formatters = {}
+            for column, name in cls.COLUMNS.items():
+                if name == DATE:
+                    formatters[column] = cls._date_column
+                else:
+                    spec = cls._field(name)
+                    formatters[column] = lambda values, spec=spec: cls._pad_column(spec, values)
+            cls._column_formatters = formatters
+        return cls._column_formatters
+
+    @classmethod
+    def format_frame(cls, frame: pd.DataFrame) -> pd.DataFrame:
+        """
+        Formata os campos de um DataFrame coluna a coluna
+
+        Equivale a aplicar format_data em cada linha: colunas com formatador
+        viram texto e as demais são mantidas como estão. A geração do arquivo
+        não passa por aqui (o BPARenderer formata os campos a partir do layout);
+        é a versão por DataFrame de format_data para quem consome os valores
+        formatados.
+
+        Args:
+            frame: DataFrame com os registros
+
+        Returns:
+            Novo DataFrame com as colunas formatadas
+        """
+        formatters = cls.column_formatters()
+        columns = {}
+        for column in frame.columns:
+            values = frame[column]
+            if column in formatters:
+                columns[column] = formatters[column](values).astype(object)
+            else:
+                columns[column] = values
+        return pd.DataFrame(columns, index=frame.index, columns=frame.columns)
@@ -1,5 +1,6 @@
 import pandas as pd
 from datetime import datetime
+from app.utils.bpa.check_digits import is_valid_cns, is_valid_cnes, CNS_DEFINITIVE_PREFIXES, CNS_PROVISIONAL_PREFIXES
 
 class BPAValidator:
     # Constantes para tamanhos dos campos
@@ -60,46 +61,13 @@ class BPAValidator:
         if not self._validate_digits(cns, "CNS", self.REQUIRED_SIZES['cns']):
             return False
         
-        # Implementação do algoritmo de validação do CNS
-        if str(cns).startswith(('1', '2')):  # CNS Definitivo
-            pis = str(cns)[:-2]
-            dv = str(cns)[-2:]
-
-            soma = 0
-            for i in range(11):
-                soma += int(pis[i]) * (15 - i)
-            
-            resto = soma % 11
-            dv1 = 11 - resto
-            
-            if dv1 == 11:
-                dv1 = 0
-            if dv1 == 10:
-                soma = 0
-                for i in range(11):
-                    soma += int(pis[i]) * (15 - i)
-                soma += dv1 * 2
-                resto = soma % 11
-                dv1 = 11 - resto
-                    
-            dv_calculado = str(dv1) + "0"
-            
-            if int(dv) != int(dv_calculado):
-                self.errors.append("CNS inválido - dígito verificador incorreto")
-                return False
-                    
-        elif str(cns).startswith(('7', '8', '9')):  # CNS Provisório
-            soma = 0
-            for i in range(15):
-                produto = int(str(cns)[i]) * (15 - i)
-                soma += produto
-            
-            if soma % 11 != 0:
-                self.errors.append("CNS inválido - dígito verificador incorreto")
-                return False
-        else:
+        if int(str(cns).strip()[0]) not in CNS_DEFINITIVE_PREFIXES + CNS_PROVISIONAL_PREFIXES:
             self.errors.append("CNS inválido - deve começar com 1, 2, 7, 8 ou 9")
             return False
+
+        if not is_valid_cns(cns):
+            self.errors.append("CNS inválido - dígito verificador incorreto")
+            return False
                 
         return True
 
@@ -108,20 +76,7 @@ class BPAValidator:
         if not self._validate_digits(cnes, "CNES", self.REQUIRED_SIZES['cnes']):
             return False
 
-        # Implementação do algoritmo de validação do CNES
-        soma = 0
-        peso = 2
-        for i in range(5, -1, -1):
-            soma += int(str(cnes)[i]) * peso
-            peso += 1
-            if peso > 9:
-                peso = 2
-                
-        dv = 0 if soma % 11 == 0 else 11 - (soma % 11)
-        if dv == 10:
-            dv = 0
-            
-        if int(str(cnes)[-1]) != dv:
+        if not is_valid_cnes(cnes):
             self.errors.append("CNES inválido - dígito verificador incorreto")
             return False
             
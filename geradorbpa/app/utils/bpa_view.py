@@ -1,4 +1,4 @@
-from flask import render_template, send_file
+from flask import render_template, send_file, Response, stream_with_context
 
 # Classe responsável pela apresentação (interface com usuário)
 class BPAView:
@@ -21,4 +21,41 @@ class BPAView:
             as_attachment=True,
             download_name=f"resultado_bpa_{tipo_relatorio}.txt",
             mimetype="text/plain"
-        )
\ No newline at end of file
+        )
+
+    @staticmethod
+    def send_artifact(artifact, tipo_relatorio):
+        """
+        Envia um arquivo BPA gravado em disco, com ETag para requisições condicionais
+        (If-None-Match responde 304 quando o arquivo não mudou)
+        Args:
+            artifact: arquivo gravado (Artifact)
+        Returns:
+            Resposta HTTP com o arquivo
+        """
+        response = send_file(
+            artifact.path,
+            as_attachment=True,
+            download_name=f"resultado_bpa_{tipo_relatorio}.txt",
+            mimetype="text/plain",
+            etag=artifact.etag,
+            conditional=True,
+        )
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+
+    @staticmethod
+    def stream_file(chunks, tipo_relatorio):
+        """
+        Envia o arquivo à medida que é gerado, com transferência chunked
+        Args:
+            chunks: iterador de blocos do arquivo já codificados
+        Returns:
+            Resposta HTTP em streaming
+        """
+        return Response(
+            stream_with_context(chunks),
+            mimetype="text/plain",
+            headers={"Content-Disposition": f"attachment; filename=resultado_bpa_{tipo_relatorio}.txt"}
+        )
@@ -1,79 +1,231 @@
+import sys
+import threading
 import time
-from typing import Any, Optional
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from app.config import settings
 from app.utils.logger import logger
 
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """
+    Estima o tamanho em bytes de um valor: DataFrames pelo memory_usage,
+    arrays NumPy pelo nbytes e contêineres somando até dois níveis de itens
+    """
+    memory_usage = getattr(value, 'memory_usage', None)
+    if callable(memory_usage) and hasattr(value, 'columns'):
+        return int(memory_usage(index=True, deep=True).sum())
+    nbytes = getattr(value, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes
+    size = sys.getsizeof(value)
+    if _depth >= 2:
+        return size
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_size(item, _depth + 1) for item in value)
+    return size
+
+
+class _Flight:
+    """Carga em andamento de uma chave, aguardada pelas demais requisições"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
 class BPACache:
-    def __init__(self, ttl_seconds: int = 300):
+    """
+    Cache em memória dos dados do BPA
+
+    Limitado pelo tamanho estimado em bytes, com descarte das entradas usadas
+    há mais tempo (LRU), e seguro para uso entre threads. Em get_or_load, uma
+    única requisição executa a carga de uma chave ausente; as requisições
+    simultâneas para a mesma chave aguardam e recebem o mesmo resultado.
+    """
+
+    def __init__(self, ttl_seconds: int = 300, max_bytes: int = None):
         """
         Inicializa o cache
-        
+
         Args:
             ttl_seconds: Tempo de vida dos itens em cache em segundos (padrão: 5 minutos)
+            max_bytes: Tamanho máximo estimado em bytes (padrão: BPA_CACHE_MAX_BYTES)
         """
-        self._cache = {}
+        self._cache: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
         self._ttl = ttl_seconds
-    
+        self.max_bytes = max_bytes or settings.BPA_CACHE_MAX_BYTES
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.loads = 0
+        self.shared_loads = 0
+
+    def _get(self, key: str) -> Optional[Any]:
+        # Chamado com o lock adquirido
+        item = self._cache.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        if self._is_expired(item['timestamp']):
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._cache.move_to_end(key)
+        self.hits += 1
+        return item['value']
+
+    def _remove(self, key: str) -> None:
+        item = self._cache.pop(key)
+        self.total_bytes -= item['size']
+
     def get(self, key: str) -> Optional[Any]:
         """
         Obtém um valor do cache
-        
+
         Args:
             key: Chave do item no cache
-            
+
         Returns:
             O valor armazenado ou None se não existir ou estiver expirado
         """
-        if key in self._cache:
-            item = self._cache[key]
-            if not self._is_expired(item['timestamp']):
-                logger.log_debug(f"Cache hit para chave: {key}")
-                return item['value']
-            else:
-                logger.log_debug(f"Cache expirado para chave: {key}")
-                self.remove(key)
-        return None
-    
-    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            return self._get(key)
+
+    def set(self, key: str, value: Any, size: int = None) -> bool:
         """
-        Armazena um valor no cache
-        
+        Armazena um valor no cache, descartando os itens usados há mais tempo
+        se o limite de bytes for excedido
+
         Args:
             key: Chave para armazenar o valor
             value: Valor a ser armazenado
+            size: Tamanho do valor em bytes (estimado quando não informado)
+
+        Returns:
+            True se o valor foi armazenado; False se excede sozinho o limite do cache
         """
-        self._cache[key] = {
-            'value': value,
-            'timestamp': time.time()
-        }
-        logger.log_debug(f"Item armazenado no cache: {key}")
-    
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            logger.log_warning(f"Valor de {size} bytes excede o limite do cache, chave {key} não armazenada")
+            return False
+
+        with self._lock:
+            if key in self._cache:
+                self._remove(key)
+            self._cache[key] = {
+                'value': value,
+                'timestamp': time.time(),
+                'size': size
+            }
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self._cache)))
+                self.evictions += 1
+        logger.log_debug(f"Item armazenado no cache: {key} ({size} bytes)")
+        return True
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], size: int = None) -> Optional[Any]:
+        """
+        Obtém um valor do cache ou o carrega uma única vez entre as requisições simultâneas
+
+        Args:
+            key: Chave do item no cache
+            loader: Função que carrega o valor; se retornar None, nada é armazenado
+            size: Tamanho do valor em bytes (estimado quando não informado)
+
+        Returns:
+            O valor armazenado ou carregado (None se o loader retornar None)
+
+        Raises:
+            Exception: O erro do loader, também para as requisições que aguardavam a carga
+        """
+        with self._lock:
+            value = self._get(key)
+            if value is not None:
+                return value
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.loads += 1
+            else:
+                self.shared_loads += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+            if flight.value is not None:
+                self.set(key, flight.value, size)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
     def remove(self, key: str) -> None:
         """
         Remove um item do cache
-        
+
         Args:
             key: Chave do item a ser removido
         """
-        if key in self._cache:
-            del self._cache[key]
-            logger.log_debug(f"Item removido do cache: {key}")
-    
+        with self._lock:
+            if key in self._cache:
+                self._remove(key)
+                logger.log_debug(f"Item removido do cache: {key}")
+
     def clear(self) -> None:
         """Limpa todo o cache"""
-        self._cache.clear()
+        with self._lock:
+            self._cache.clear()
+            self.total_bytes = 0
         logger.log_debug("Cache limpo")
-    
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna as estatísticas de uso do cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._cache),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'loads': self.loads,
+                'shared_loads': self.shared_loads,
+            }
+
     def _is_expired(self, timestamp: float) -> bool:
         """
         Verifica se um timestamp está expirado
-        
+
         Args:
             timestamp: Timestamp a ser verificado
-            
+
         Returns:
             True se estiver expirado, False caso contrário
         """
         return time.time() - timestamp > self._ttl
 
 # Instância global do cache
-cache = BPACache() 
\ No newline at end of file
+cache = BPACache()
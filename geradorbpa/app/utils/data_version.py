@@ -0,0 +1,97 @@
+import logging
+from typing import List, Optional
+from .database import Database
+
+# Tabela com a versão dos dados de cada competência de procedimentos
+VERSION_TABLE = "competencia_versao"
+
+
+def install_statements(schema: str) -> List[str]:
+    """
+    Comandos que criam o controle de versão dos dados por competência: a tabela
+    competencia_versao e triggers por comando em procedimentos que incrementam
+    a versão de cada competência incluída, alterada ou excluída (e de todas, no
+    TRUNCATE). Os comandos podem ser executados novamente sem efeito colateral.
+
+    Args:
+        schema (str): Schema das tabelas
+
+    Returns:
+        List[str]: Comandos SQL, na ordem de execução
+    """
+    table = f'"{schema}".{VERSION_TABLE}'
+    function = f'"{schema}".bpa_incrementa_versao'
+    procedimentos = f'"{schema}".procedimentos'
+
+    def bump(transition: str) -> str:
+        return (
+            f"INSERT INTO {table} AS v (competencia) "
+            f"SELECT DISTINCT competencia::text FROM {transition} WHERE competencia IS NOT NULL "
+            f"ON CONFLICT (competencia) DO UPDATE SET versao = v.versao + 1, atualizado_em = now();"
+        )
+
+    statements = [
+        f"CREATE TABLE IF NOT EXISTS {table} ("
+        f"competencia text PRIMARY KEY, "
+        f"versao bigint NOT NULL DEFAULT 1, "
+        f"atualizado_em timestamptz NOT NULL DEFAULT now())",
+        f"""CREATE OR REPLACE FUNCTION {function}() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        UPDATE {table} SET versao = versao + 1, atualizado_em = now();
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        {bump('novas')}
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        {bump('antigas')}
+    END IF;
+    RETURN NULL;
+END
+$$""",
+    ]
+
+    # Tabelas de transição só podem ser declaradas em triggers de um único evento
+    triggers = {
+        'insert': "AFTER INSERT ON {t} REFERENCING NEW TABLE AS novas",
+        'update': "AFTER UPDATE ON {t} REFERENCING OLD TABLE AS antigas NEW TABLE AS novas",
+        'delete': "AFTER DELETE ON {t} REFERENCING OLD TABLE AS antigas",
+        'truncate': "AFTER TRUNCATE ON {t}",
+    }
+    for event, definition in triggers.items():
+        name = f"bpa_versao_{event}"
+        statements.append(f"DROP TRIGGER IF EXISTS {name} ON {procedimentos}")
+        statements.append(
+            f"CREATE TRIGGER {name} {definition.format(t=procedimentos)} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION {function}()"
+        )
+
+    # Competências já existentes antes da instalação começam na versão 1
+    statements.append(
+        f"INSERT INTO {table} (competencia) "
+        f"SELECT DISTINCT competencia::text FROM {procedimentos} WHERE competencia IS NOT NULL "
+        f"ON CONFLICT (competencia) DO NOTHING"
+    )
+    return statements
+
+
+def install_version_tracking(schema: str = "public", db: Optional[Database] = None) -> None:
+    """
+    Instala (ou atualiza) o controle de versão dos dados em uma única transação
+
+    Raises:
+        ConnectionError: Se não for possível obter a conexão
+    """
+    db = db or Database()
+    logger = logging.getLogger('DataVersion')
+    with db.connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                for statement in install_statements(schema):
+                    cur.execute(statement)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    logger.info(f"Controle de versão dos dados instalado em {schema}.procedimentos")
@@ -1,60 +1,279 @@
-import psycopg2
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
 from psycopg2 import pool
-import os
-from dotenv import load_dotenv
+from app.config import settings
+from app.utils.logger import logger
+
+
+class PoolTimeoutError(ConnectionError):
+    """Nenhuma conexão livre no pool dentro do tempo de espera"""
+
+
+class ConnectionPool:
+    """
+    Pool de conexões seguro entre threads
+
+    Usa o ThreadedConnectionPool do psycopg2, que recusa o checkout quando
+    todas as conexões estão em uso; aqui um semáforo limita as conexões
+    emprestadas a maxconn e o checkout aguarda até `timeout` segundos por uma
+    conexão livre. Conexões ociosas há mais de `ping_interval` segundos são
+    testadas com SELECT 1 antes de serem entregues; as que falham são
+    descartadas e substituídas por novas.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, timeout: float, ping_interval: float,
+                 factory=None, **connect_kwargs):
+        """
+        Args:
+            minconn: Conexões abertas na criação do pool
+            maxconn: Máximo de conexões emprestadas ao mesmo tempo
+            timeout: Segundos de espera por uma conexão livre
+            ping_interval: Segundos de ociosidade a partir dos quais a conexão é testada
+            factory: Classe do pool do psycopg2 (padrão: ThreadedConnectionPool)
+            connect_kwargs: Parâmetros de conexão (dbname, user, password, host, port)
+        """
+        factory = factory or pool.ThreadedConnectionPool
+        self._pool = factory(minconn, maxconn, **connect_kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used: Dict[int, float] = {}
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.checkouts = 0
+        self.in_use = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self.discarded = 0
+
+    def getconn(self, timeout: float = None):
+        """
+        Empresta uma conexão, aguardando até `timeout` segundos (padrão: o do pool)
+
+        Raises:
+            PoolTimeoutError: Se nenhuma conexão for liberada a tempo
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise PoolTimeoutError(f"Nenhuma conexão livre no pool após {timeout}s")
+        waited = time.monotonic() - start
+
+        try:
+            conn = self._checkout_healthy()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        return conn
+
+    def _checkout_healthy(self):
+        for _ in range(self.maxconn + 1):
+            conn = self._pool.getconn()
+            if self._is_healthy(conn):
+                return conn
+            self._discard(conn)
+        raise ConnectionError("Nenhuma conexão válida disponível no pool")
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        # Conexões recém-abertas e usadas há pouco dispensam o teste
+        if last_used is None or time.monotonic() - last_used < self.ping_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+                cur.fetchone()
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.log_warning(f"Conexão inválida descartada do pool: {e}")
+            return False
+
+    def _discard(self, conn):
+        self._last_used.pop(id(conn), None)
+        with self._lock:
+            self.discarded += 1
+        try:
+            self._pool.putconn(conn, close=True)
+        except Exception as e:
+            logger.log_warning(f"Erro ao descartar conexão do pool: {e}")
+
+    def putconn(self, conn, close: bool = False):
+        """Devolve uma conexão ao pool (fechando-a se `close` ou se já estiver fechada)"""
+        try:
+            if close or conn.closed:
+                self._discard(conn)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    def closeall(self):
+        """Fecha todas as conexões do pool"""
+        self._pool.closeall()
+        self._last_used.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna as métricas de uso do pool"""
+        with self._lock:
+            return {
+                'max_connections': self.maxconn,
+                'in_use': self.in_use,
+                'checkouts': self.checkouts,
+                'wait_avg_ms': round(self.wait_total / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+                'wait_max_ms': round(self.wait_max * 1000, 2),
+                'timeouts': self.timeouts,
+                'discarded': self.discarded,
+            }
+
+
+# Pool compartilhado pelo processo, criado no primeiro uso
+_shared_pool: Optional[ConnectionPool] = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Retorna o pool de conexões do processo, criando-o na primeira chamada"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = ConnectionPool(
+                minconn=settings.DB_POOL_MIN,
+                maxconn=settings.DB_POOL_MAX,
+                timeout=settings.DB_POOL_TIMEOUT,
+                ping_interval=settings.DB_POOL_PING_INTERVAL,
+                dbname=settings.DB_NAME,
+                user=settings.DB_USER,
+                password=settings.DB_PASSWORD,
+                host=settings.DB_HOST,
+                port=settings.DB_PORT
+            )
+            logger.log_info(f"Pool de conexões criado (máximo de {settings.DB_POOL_MAX} conexões)")
+        return _shared_pool
 
-load_dotenv()
 
 class Database:
-    def __init__(self):
-        self.db_pool = None
-        self.create_pool()
+    """
+    Acesso ao banco pelo pool de conexões compartilhado
+
+    Dentro de session(), todas as consultas da thread usam a mesma conexão,
+    obtida na primeira consulta e devolvida ao final da sessão (uma conexão
+    por requisição ou geração, e não por consulta).
+    """
+
+    def __init__(self, db_pool: ConnectionPool = None):
+        self._db_pool = db_pool
+        self._local = threading.local()
+
+    @property
+    def db_pool(self) -> ConnectionPool:
+        if self._db_pool is None:
+            self._db_pool = get_pool()
+        return self._db_pool
 
     def create_pool(self):
-        """ cria um pool de conexões para otimizar o acesso ao banco. """
-        try:
-            self.db_pool = psycopg2.pool.SimpleConnectionPool(
-                minconn=1,
-                maxconn=10,
-                dbname=os.getenv("DB_NAME"),
-                user=os.getenv("DB_USER"),
-                password=os.getenv("DB_PASSWORD"),
-                host=os.getenv("DB_HOST"),
-                port=os.getenv("DB_PORT")
-            )
-            if self.db_pool:
-                print("Pool de conexões criado com sucesso!")
+        """ obtém o pool de conexões compartilhado (criado no primeiro uso). """
+        try:
+            return self.db_pool
         except Exception as e:
-            print(f" Erro ao criar pool de conexões: {e}")
+            logger.log_error(f"Erro ao criar pool de conexões: {e}")
+            return None
 
-    def get_connection(self):
-        """ obtém uma conexão do pool. """
+    def get_connection(self, timeout: float = None):
+        """
+        obtém uma conexão do pool, aguardando até `timeout` segundos por uma livre.
+
+        Returns:
+            Conexão, ou None se não for possível obtê-la
+        """
+        session = getattr(self._local, 'session', None)
+        if session is not None and session.get('conn') is not None:
+            return session['conn']
         try:
-            if self.db_pool:
-                return self.db_pool.getconn()
+            conn = self.db_pool.getconn(timeout)
         except Exception as e:
-            print(f" Erro ao obter conexão: {e}")
-        return None
+            logger.log_error(f"Erro ao obter conexão: {e}")
+            return None
+        if session is not None:
+            session['conn'] = conn
+        return conn
 
     def release_connection(self, conn):
-        """ devolve a conexão ao pool. """
-        if self.db_pool and conn:
-            self.db_pool.putconn(conn)
+        """ devolve a conexão ao pool (na sessão, ela é mantida até o final). """
+        session = getattr(self._local, 'session', None)
+        if conn is None or (session is not None and session.get('conn') is conn):
+            return
+        self.db_pool.putconn(conn)
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        """
+        Empresta uma conexão durante o bloco with
+
+        Raises:
+            ConnectionError: Se não for possível obter a conexão
+        """
+        conn = self.get_connection(timeout)
+        if conn is None:
+            raise ConnectionError("Erro: Não foi possível conectar ao banco de dados.")
+        try:
+            yield conn
+        finally:
+            self.release_connection(conn)
+
+    @contextmanager
+    def session(self):
+        """
+        Mantém uma única conexão para as consultas da thread durante o bloco with
+
+        A conexão é obtida na primeira consulta (sessões sem consultas não usam
+        o pool). Sessões aninhadas reutilizam a sessão externa.
+        """
+        if getattr(self._local, 'session', None) is not None:
+            yield self
+            return
+        self._local.session = {'conn': None}
+        try:
+            yield self
+        finally:
+            conn = self._local.session['conn']
+            self._local.session = None
+            if conn is not None:
+                self.db_pool.putconn(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        """ retorna as métricas do pool de conexões. """
+        return self.db_pool.stats()
 
     def close_pool(self):
         """ fecha todas as conexões no pool. """
-        if self.db_pool:
-            self.db_pool.closeall()
-            print(" Pool de conexões fechado.")
+        if self._db_pool:
+            self._db_pool.closeall()
+            logger.log_info("Pool de conexões fechado.")
 
 # testando a conexão
 if __name__ == "__main__":
     db = Database()
     conn = db.get_connection()
-    
+
     if conn:
         print("Conexão com PostgreSQL bem-sucedida!")
         db.release_connection(conn)  # devolve a conexão ao pool
     else:
         print(" Falha ao conectar ao banco.")
-
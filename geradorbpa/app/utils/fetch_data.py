@@ -1,6 +1,11 @@
 from .database import Database
+import uuid
 import logging
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Union, Iterator
+import pandas as pd
+from psycopg2 import errors
+from app.config import settings
+from app.utils.data_version import VERSION_TABLE
 
 class DataFetcher:
     def __init__(self, schema="public"):
@@ -169,40 +174,147 @@ class DataFetcher:
         finally:
             self.db.release_connection(conn)
             
-    def fetch_data_by_competencia(self, competencia: str, limit: int = 100) -> List[Dict]:
+    def _get_table_columns(self, conn, table: str) -> List[str]:
+        """Lista as colunas de uma tabela do schema, na ordem de definição"""
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT column_name FROM information_schema.columns "
+                "WHERE table_schema = %s AND table_name = %s ORDER BY ordinal_position;",
+                (self.schema, table)
+            )
+            return [row[0] for row in cur.fetchall()]
+
+    def iter_competencia_batches(self, competencia: str, columns: List[str] = None,
+                                 batch_size: int = None, as_frame: bool = False) -> Iterator[Union[List[Dict], pd.DataFrame]]:
         """
-        Busca dados específicos para uma competência com segurança aprimorada
+        Percorre todos os registros de uma competência em lotes, usando um cursor
+        nomeado (do lado do servidor): apenas um lote fica em memória por vez
+        
+        Args:
+            competencia (str): Competência no formato YYYYMM
+            columns (list, opcional): Colunas a buscar (padrão: todas as da tabela);
+                colunas inexistentes na tabela são ignoradas com aviso
+            batch_size (int, opcional): Registros por lote e itersize do cursor
+                (padrão: BPA_BATCH_SIZE)
+            as_frame (bool, opcional): Retorna cada lote como DataFrame
+            
+        Yields:
+            Lista de dicionários (ou DataFrame) com os registros do lote
+            
+        Raises:
+            ValueError: Se a competência ou as colunas forem inválidas
+        """
+        if not competencia or not competencia.isdigit() or len(competencia) != 6:
+            self.logger.error(f"Formato de competência inválido: {competencia}")
+            raise ValueError("Formato de competência inválido. Use YYYYMM.")
+        batch_size = batch_size or settings.BPA_BATCH_SIZE
+        
+        conn = self.get_connection()
+        try:
+            available = self._get_table_columns(conn, "procedimentos")
+            if columns:
+                missing = [col for col in columns if col not in available]
+                if missing:
+                    self.logger.warning(f"Colunas ausentes em procedimentos, ignoradas: {missing}")
+                selected = [col for col in columns if col in available]
+            else:
+                selected = available
+            if not selected or not all(self._is_valid_identifier(col) for col in selected):
+                self.logger.error(f"Colunas inválidas para a busca por competência: {selected}")
+                raise ValueError("Nenhuma coluna válida para buscar")
+            
+            col_string = ", ".join(f"\"{col}\"" for col in selected)
+            query = f"SELECT {col_string} FROM \"{self.schema}\".procedimentos WHERE competencia = %s;"
+            
+            # Cursor nomeado: os registros são trazidos do servidor a cada itersize linhas
+            with conn.cursor(name=f"bpa_competencia_{uuid.uuid4().hex}") as cur:
+                cur.itersize = batch_size
+                cur.execute(query, (competencia,))
+                total = 0
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    total += len(rows)
+                    if as_frame:
+                        yield pd.DataFrame.from_records(rows, columns=selected)
+                    else:
+                        yield [dict(zip(selected, row)) for row in rows]
+            self.logger.info(f"{total} registros lidos para a competência {competencia}")
+        finally:
+            # Encerra a transação aberta pelo cursor nomeado antes de devolver a conexão
+            try:
+                conn.rollback()
+            except Exception as e:
+                self.logger.error(f"Erro ao encerrar transação da busca por competência: {e}")
+            self.db.release_connection(conn)
+            
+    def get_competencia_version(self, competencia: str) -> Optional[str]:
+        """
+        Obtém a versão dos dados de uma competência, mantida na tabela
+        competencia_versao pelos triggers de procedimentos (scripts/data_version.py),
+        que a incrementam a cada inclusão, alteração ou exclusão de registros
         
         Args:
             competencia (str): Competência no formato YYYYMM
-            limit (int, opcional): Limite de registros
             
         Returns:
-            List[Dict]: Lista de registros no formato de dicionários
+            str: Versão dos dados ("v0" para competências nunca gravadas), ou
+            None se o controle de versão não estiver instalado ou a consulta falhar
+
+        Raises:
+            ValueError: Se a competência não estiver no formato YYYYMM
         """
+        if not competencia or not competencia.isdigit() or len(competencia) != 6:
+            self.logger.error(f"Formato de competência inválido: {competencia}")
+            raise ValueError(f"Competência inválida: {competencia}")
+
         conn = self.get_connection()
         try:
             with conn.cursor() as cur:
-                # Validação de entrada
-                if not competencia.isdigit() or len(competencia) != 6:
-                    self.logger.error(f"Formato de competência inválido: {competencia}")
-                    raise ValueError("Formato de competência inválido. Use YYYYMM.")
-                
-                query = f"""
-                    SELECT * FROM \"{self.schema}\".procedimentos 
-                    WHERE competencia = %s
-                    LIMIT %s;
-                """
-                cur.execute(query, (competencia, limit))
-                colnames = [desc[0] for desc in cur.description]
-                rows = cur.fetchall()
-                return [dict(zip(colnames, row)) for row in rows] if rows else []
+                cur.execute(
+                    f"SELECT versao FROM \"{self.schema}\".{VERSION_TABLE} WHERE competencia = %s;",
+                    (competencia,)
+                )
+                row = cur.fetchone()
+                return f"v{row[0] if row else 0}"
+        except errors.UndefinedTable:
+            conn.rollback()
+            self.logger.warning(
+                f"Tabela {VERSION_TABLE} inexistente: instale o controle de versão dos dados "
+                f"com scripts/data_version.py para reaproveitar os arquivos gerados"
+            )
+            return None
         except Exception as e:
-            self.logger.error(f"Erro ao buscar dados para competência '{competencia}': {e}")
-            return []
+            conn.rollback()
+            self.logger.error(f"Erro ao obter a versão dos dados da competência '{competencia}': {e}")
+            return None
         finally:
             self.db.release_connection(conn)
 
+    def fetch_data_by_competencia(self, competencia: str, limit: int = None, columns: List[str] = None) -> List[Dict]:
+        """
+        Busca dados específicos para uma competência com segurança aprimorada
+        
+        Args:
+            competencia (str): Competência no formato YYYYMM
+            limit (int, opcional): Limite de registros (padrão: todos)
+            columns (list, opcional): Colunas a buscar (padrão: todas)
+            
+        Returns:
+            List[Dict]: Lista de registros no formato de dicionários
+        """
+        records = []
+        try:
+            for batch in self.iter_competencia_batches(competencia, columns=columns):
+                records.extend(batch)
+                if limit and len(records) >= limit:
+                    return records[:limit]
+            return records
+        except Exception as e:
+            self.logger.error(f"Erro ao buscar dados para competência '{competencia}': {e}")
+            return []
+
     def fetch_all_data(self, data_mapping: Dict, fields_to_fetch: List[str] = None, limit: int = 1) -> Dict:
         """
         Busca todos os dados conforme o mapeamento fornecido
@@ -0,0 +1,212 @@
+import re
+import logging
+from typing import Dict, List, Any, Optional
+from .database import Database
+from .data_mapping import DATA_MAPPING
+
+# Buscas fixas feitas pelo DataFetcher, além das verificações do DATA_MAPPING
+FIXED_LOOKUPS = [
+    {"table": "procedimentos", "columns": ["competencia"], "source": "fetch_data_by_competencia"},
+]
+
+# Tamanho máximo de identificadores no PostgreSQL
+MAX_IDENTIFIER_LENGTH = 63
+
+
+# Cópia intencional de parse_index_columns/covers em data-injector/app/services/index_advisor.py:
+# os serviços são implantados separadamente e não compartilham pacotes
+def parse_index_columns(indexdef: str) -> List[str]:
+    """
+    Extrai as colunas de uma definição de índice (pg_indexes.indexdef), na ordem.
+    Índices parciais (com WHERE) não atendem às buscas e retornam lista vazia.
+    """
+    if " WHERE " in indexdef:
+        return []
+    match = re.search(r"USING \w+ \(((?:[^()]|\([^()]*\))*)\)", indexdef)
+    if not match:
+        return []
+    columns = []
+    for part in re.split(r",\s*(?![^()]*\))", match.group(1)):
+        part = re.sub(r"\s+(ASC|DESC|NULLS FIRST|NULLS LAST)\b", "", part.strip())
+        columns.append(part.strip('"'))
+    return columns
+
+
+def covers(index_columns: List[str], lookup_columns: List[str]) -> bool:
+    """Verifica se as primeiras colunas do índice são exatamente as colunas da busca"""
+    size = len(lookup_columns)
+    return size > 0 and set(index_columns[:size]) == set(lookup_columns)
+
+
+def collect_lookups(data_mapping: Dict) -> List[Dict[str, Any]]:
+    """
+    Reúne as buscas por igualdade feitas na geração do BPA: as fixas do
+    DataFetcher e as verificações (check_table/check_column) do mapeamento.
+
+    Args:
+        data_mapping (Dict): Mapeamento de campos
+
+    Returns:
+        List[Dict]: Buscas com tabela, colunas e campos que as utilizam
+    """
+    lookups = {}
+    for lookup in FIXED_LOOKUPS:
+        key = (lookup["table"], tuple(lookup["columns"]))
+        lookups[key] = {"table": lookup["table"], "columns": list(lookup["columns"]), "sources": [lookup["source"]]}
+
+    for field, info in data_mapping.items():
+        if not info.get("check") or not info.get("check_table") or not info.get("check_column"):
+            continue
+        key = (info["check_table"], (info["check_column"],))
+        entry = lookups.setdefault(key, {"table": info["check_table"], "columns": [info["check_column"]], "sources": []})
+        entry["sources"].append(field)
+
+    return list(lookups.values())
+
+
+class IndexAdvisor:
+    """
+    Verifica, via pg_indexes, quais buscas da geração do BPA são atendidas por
+    índices e cria os índices ausentes com CREATE INDEX CONCURRENTLY.
+    """
+
+    def __init__(self, schema="public", db: Optional[Database] = None):
+        self.db = db or Database()
+        self.schema = schema
+        self.logger = logging.getLogger('IndexAdvisor')
+
+    def get_connection(self):
+        conn = self.db.get_connection()
+        if not conn:
+            self.logger.error("Falha ao obter conexão com o banco de dados")
+            raise ConnectionError("Erro: Não foi possível conectar ao banco de dados.")
+        return conn
+
+    def get_indexes(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Lista os índices válidos do schema, agrupados por tabela.
+
+        Returns:
+            Dict: {tabela: [{"name": ..., "columns": [...]}]}
+        """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT i.tablename, i.indexname, i.indexdef
+                    FROM pg_indexes i
+                    JOIN pg_namespace n ON n.nspname = i.schemaname
+                    JOIN pg_class c ON c.relname = i.indexname AND c.relnamespace = n.oid
+                    JOIN pg_index x ON x.indexrelid = c.oid
+                    WHERE i.schemaname = %s AND x.indisvalid;
+                """, (self.schema,))
+                indexes = {}
+                for table, name, indexdef in cur.fetchall():
+                    indexes.setdefault(table, []).append({"name": name, "columns": parse_index_columns(indexdef)})
+                return indexes
+        finally:
+            self.db.release_connection(conn)
+
+    def get_tables(self) -> set:
+        """Lista as tabelas existentes no schema"""
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT tablename FROM pg_tables WHERE schemaname = %s;", (self.schema,))
+                return {row[0] for row in cur.fetchall()}
+        finally:
+            self.db.release_connection(conn)
+
+    def advise(self, data_mapping: Dict = None) -> Dict[str, Any]:
+        """
+        Relaciona cada busca ao índice que a atende.
+
+        Args:
+            data_mapping (Dict, opcional): Mapeamento de campos (padrão: DATA_MAPPING)
+
+        Returns:
+            Dict: Buscas (com o índice usado e se serão index scan) e índices ausentes
+        """
+        indexes = self.get_indexes()
+        tables = self.get_tables()
+        lookups = []
+        missing = []
+        for lookup in collect_lookups(data_mapping if data_mapping is not None else DATA_MAPPING):
+            table_exists = lookup["table"] in tables
+            index = next(
+                (index for index in indexes.get(lookup["table"], []) if covers(index["columns"], lookup["columns"])),
+                None
+            )
+            if table_exists and index is None:
+                missing.append({"table": lookup["table"], "columns": lookup["columns"]})
+            lookups.append({
+                **lookup,
+                "table_exists": table_exists,
+                "index": index["name"] if index else None,
+                "index_scan": index is not None
+            })
+        return {"schema": self.schema, "lookups": lookups, "missing": missing}
+
+    def create_index(self, table: str, columns: List[str]) -> str:
+        """
+        Cria um índice sem bloquear escritas na tabela. CREATE INDEX CONCURRENTLY
+        não roda dentro de transação, por isso a conexão fica em autocommit. Um
+        índice inválido com o mesmo nome (de uma criação interrompida) é removido
+        antes, pois o IF NOT EXISTS o daria como criado; em caso de falha o
+        índice inválido é removido.
+
+        Returns:
+            str: Nome do índice
+        """
+        index_name = f"ix_{table}_{'_'.join(columns)}"[:MAX_IDENTIFIER_LENGTH]
+        column_list = ", ".join(f"\"{col}\"" for col in columns)
+        conn = self.get_connection()
+        autocommit = conn.autocommit
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT NOT x.indisvalid
+                    FROM pg_index x
+                    JOIN pg_class c ON c.oid = x.indexrelid
+                    JOIN pg_namespace n ON n.oid = c.relnamespace
+                    WHERE n.nspname = %s AND c.relname = %s;
+                """, (self.schema, index_name))
+                row = cur.fetchone()
+                if row and row[0]:
+                    self.logger.warning(f"Removendo o índice inválido {index_name} antes de recriá-lo")
+                    cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS \"{self.schema}\".\"{index_name}\";")
+                try:
+                    cur.execute(
+                        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS \"{index_name}\" "
+                        f"ON \"{self.schema}\".\"{table}\" ({column_list});"
+                    )
+                except Exception:
+                    cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS \"{self.schema}\".\"{index_name}\";")
+                    raise
+            self.logger.info(f"Índice {index_name} criado em {table} ({column_list})")
+            return index_name
+        finally:
+            conn.autocommit = autocommit
+            self.db.release_connection(conn)
+
+    def create_missing(self, data_mapping: Dict = None) -> Dict[str, Any]:
+        """
+        Cria os índices ausentes e refaz o relatório.
+
+        Returns:
+            Dict: Relatório de advise() após a criação, com os índices criados e as falhas
+        """
+        report = self.advise(data_mapping)
+        created = []
+        failed = []
+        for item in report["missing"]:
+            try:
+                created.append(self.create_index(item["table"], item["columns"]))
+            except Exception as e:
+                self.logger.error(f"Erro ao criar índice em {item['table']} ({item['columns']}): {e}")
+                failed.append({**item, "error": str(e)})
+        report = self.advise(data_mapping)
+        report["created"] = created
+        report["failed"] = failed
+        return report
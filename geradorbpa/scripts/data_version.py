@@ -0,0 +1,34 @@
+"""
+Instala o controle de versão dos dados por competência, usado para reaproveitar
+os arquivos BPA gravados em disco enquanto os dados da competência não mudam.
+
+Uso:
+    python scripts/data_version.py [--schema public] [--sql]
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.utils.data_version import install_statements, install_version_tracking
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Controle de versão dos dados por competência")
+    parser.add_argument("--schema", default=settings.DATABASE_SCHEMA, help="Schema do banco")
+    parser.add_argument("--sql", action="store_true", help="Apenas exibe os comandos, sem executá-los")
+    args = parser.parse_args()
+
+    if args.sql:
+        print(";\n\n".join(install_statements(args.schema)) + ";")
+        return 0
+
+    install_version_tracking(args.schema)
+    print(f"Controle de versão instalado em {args.schema}.procedimentos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""
+Verifica os índices das buscas feitas na geração do BPA.
+
+Uso:
+    python scripts/index_advisor.py [--schema public] [--create] [--output relatorio.json]
+"""
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.utils.index_advisor import IndexAdvisor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relatório de índices das buscas do BPA")
+    parser.add_argument("--schema", default=settings.DATABASE_SCHEMA, help="Schema do banco")
+    parser.add_argument("--create", action="store_true", help="Cria os índices ausentes (CREATE INDEX CONCURRENTLY)")
+    parser.add_argument("--output", help="Arquivo onde gravar o relatório em JSON")
+    args = parser.parse_args()
+
+    advisor = IndexAdvisor(schema=args.schema)
+    report = advisor.create_missing() if args.create else advisor.advise()
+
+    for lookup in report["lookups"]:
+        status = lookup["index"] or ("tabela inexistente" if not lookup["table_exists"] else "SEM ÍNDICE")
+        print(f"{lookup['table']}({', '.join(lookup['columns'])}): {status}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    advisor.db.close_pool()
+    return 1 if report["missing"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,96 @@ import pandas as pd
 from app.utils.bpa.consolidado_generator import BPAConsolidadoGenerator
 from app.utils.bpa.individualizado_generator import BPAIndividualizadoGenerator
 from app.utils.bpa.validators import BPAConsolidadoValidator, BPAIndividualizadoValidator
+from app.utils.cache import cache
+
+class FakeCursor:
+    """Cursor psycopg2 de teste: registra os comandos e devolve as linhas da conexão"""
+
+    def __init__(self, conn, name=None):
+        self.conn = conn
+        self.name = name
+        self.itersize = 2000
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.queries.append(query)
+        self.conn.executions.append((self.name, query, params, self.itersize))
+        if self.conn.error:
+            raise self.conn.error
+        self.rows = list(self.conn.respond(query, params))
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchmany(self, size):
+        self.conn.fetch_sizes.append(size)
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+
+class FakeConnection:
+    """
+    Conexão psycopg2 de teste. Cada consulta devolve as linhas de
+    `responder(conn, query, params)`, quando informado, ou `rows`; com `error`
+    definido, todos os comandos falham. Atributos extras (`**attrs`) ficam
+    disponíveis para o responder e para as verificações dos testes.
+    """
+
+    def __init__(self, rows=None, responder=None, **attrs):
+        self.rows = list(rows or [])
+        self.responder = responder
+        self.queries = []
+        self.executions = []
+        self.fetch_sizes = []
+        self.rollbacks = 0
+        self.commits = 0
+        self.autocommit = False
+        self.error = None
+        for name, value in attrs.items():
+            setattr(self, name, value)
+
+    def respond(self, query, params):
+        return self.responder(self, query, params) if self.responder else self.rows
+
+    def cursor(self, name=None):
+        return FakeCursor(self, name)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def commit(self):
+        self.commits += 1
+
+
+class FakeDatabase:
+    """Database de teste que sempre entrega a mesma conexão e conta as devoluções"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.released = 0
+
+    def get_connection(self):
+        return self.conn
+
+    def release_connection(self, conn):
+        self.released += 1
+
+@pytest.fixture(autouse=True)
+def clear_bpa_cache():
+    """Isola os testes: dados em cache de um teste não devem vazar para o próximo"""
+    cache.clear()
+    yield
+    cache.clear()
 
 @pytest.fixture
 def sample_consolidado_data():
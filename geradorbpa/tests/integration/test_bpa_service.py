@@ -1,7 +1,9 @@
 import pytest
 import io
 from app.services.bpa_service import BPAService
+from app.utils.bpa.artifacts import BPAArtifactStore
 from app.utils.bpa.generator_factory import BPAGeneratorFactory
+from app.utils.bpa.reader import BPAReader
 from app.utils.cache import cache
 
 class TestBPAService:
@@ -14,11 +16,11 @@ class TestBPAService:
     
     def test_generate_consolidado_file(self, bpa_service, sample_consolidado_data, monkeypatch):
         """Testa a geração de arquivo BPA Consolidado"""
-        # Mock do DataFetcher
+        # Mock do DataFetcher (um único lote)
         def mock_fetch_data(*args, **kwargs):
-            return sample_consolidado_data.to_dict('records')
+            return [sample_consolidado_data.to_dict('records')]
         
-        monkeypatch.setattr(bpa_service.data_fetcher, 'fetch_data_by_competencia', mock_fetch_data)
+        monkeypatch.setattr(bpa_service.data_fetcher, 'iter_competencia_batches', mock_fetch_data)
         
         # Gera o arquivo
         result = bpa_service.generate_bpa_file('202401', 'consolidado')
@@ -27,15 +29,15 @@ class TestBPAService:
         assert isinstance(result, io.BytesIO)
         content = result.getvalue().decode('utf-8')
         assert content
-        assert len(content.split('\r\n')) == len(sample_consolidado_data) + 1  # +1 para a linha em branco final
+        assert len(content.split('\r\n')) == len(sample_consolidado_data) + 2  # +1 para o cabeçalho e +1 para a linha em branco final
     
     def test_generate_individualizado_file(self, bpa_service, sample_individualizado_data, monkeypatch):
         """Testa a geração de arquivo BPA Individualizado"""
-        # Mock do DataFetcher
+        # Mock do DataFetcher (um único lote)
         def mock_fetch_data(*args, **kwargs):
-            return sample_individualizado_data.to_dict('records')
+            return [sample_individualizado_data.to_dict('records')]
         
-        monkeypatch.setattr(bpa_service.data_fetcher, 'fetch_data_by_competencia', mock_fetch_data)
+        monkeypatch.setattr(bpa_service.data_fetcher, 'iter_competencia_batches', mock_fetch_data)
         
         # Gera o arquivo
         result = bpa_service.generate_bpa_file('202401', 'individualizado')
@@ -44,15 +46,15 @@ class TestBPAService:
         assert isinstance(result, io.BytesIO)
         content = result.getvalue().decode('utf-8')
         assert content
-        assert len(content.split('\r\n')) == len(sample_individualizado_data) + 1  # +1 para a linha em branco final
+        assert len(content.split('\r\n')) == len(sample_individualizado_data) + 2  # +1 para o cabeçalho e +1 para a linha em branco final
     
     def test_generate_file_with_cache(self, bpa_service, sample_consolidado_data, monkeypatch):
         """Testa a geração de arquivo com cache"""
-        # Mock do DataFetcher
+        # Mock do DataFetcher (um único lote)
         def mock_fetch_data(*args, **kwargs):
-            return sample_consolidado_data.to_dict('records')
+            return [sample_consolidado_data.to_dict('records')]
         
-        monkeypatch.setattr(bpa_service.data_fetcher, 'fetch_data_by_competencia', mock_fetch_data)
+        monkeypatch.setattr(bpa_service.data_fetcher, 'iter_competencia_batches', mock_fetch_data)
         
         # Primeira geração (sem cache)
         result1 = bpa_service.generate_bpa_file('202401', 'consolidado')
@@ -65,6 +67,23 @@ class TestBPAService:
         # Verifica se os resultados são idênticos
         assert content1 == content2
     
+    def test_report_types_share_cached_data(self, bpa_service, sample_individualizado_data, monkeypatch):
+        """Testa que os dois tipos de relatório da mesma competência usam uma única leitura do banco"""
+        calls = []
+        def mock_fetch_data(*args, **kwargs):
+            calls.append(kwargs.get('columns'))
+            return [sample_individualizado_data.to_dict('records')]
+        
+        monkeypatch.setattr(bpa_service.data_fetcher, 'iter_competencia_batches', mock_fetch_data)
+        
+        hits = cache.stats()['hits']
+        bpa_service.generate_bpa_file('202401', 'individualizado')
+        bpa_service.generate_bpa_file('202401', 'consolidado')
+        
+        assert len(calls) == 1
+        assert 'cns_paciente' in calls[0] and 'quantidade' in calls[0]
+        assert cache.stats()['hits'] == hits + 1
+    
     def test_generate_file_with_invalid_type(self, bpa_service):
         """Testa a geração de arquivo com tipo inválido"""
         with pytest.raises(ValueError) as exc_info:
@@ -77,7 +96,7 @@ class TestBPAService:
         def mock_fetch_data(*args, **kwargs):
             return []
         
-        monkeypatch.setattr(bpa_service.data_fetcher, 'fetch_data_by_competencia', mock_fetch_data)
+        monkeypatch.setattr(bpa_service.data_fetcher, 'iter_competencia_batches', mock_fetch_data)
         
         with pytest.raises(ValueError) as exc_info:
             bpa_service.generate_bpa_file('202401', 'consolidado')
@@ -89,8 +108,80 @@ class TestBPAService:
         def mock_fetch_data(*args, **kwargs):
             raise Exception("Erro simulado")
         
-        monkeypatch.setattr(bpa_service.data_fetcher, 'fetch_data_by_competencia', mock_fetch_data)
+        monkeypatch.setattr(bpa_service.data_fetcher, 'iter_competencia_batches', mock_fetch_data)
         
         with pytest.raises(ValueError) as exc_info:
             bpa_service.generate_bpa_file('202401', 'consolidado')
-        assert 'Erro ao gerar arquivo BPA' in str(exc_info.value) 
\ No newline at end of file
+        assert 'Erro ao gerar arquivo BPA' in str(exc_info.value)
+
+    def test_stream_consolidado_file(self, bpa_service, sample_consolidado_data, monkeypatch):
+        """Testa a geração em streaming: blocos em bytes com o mesmo conteúdo do arquivo completo"""
+        def mock_fetch_data(*args, **kwargs):
+            return [sample_consolidado_data.to_dict('records')]
+        
+        monkeypatch.setattr(bpa_service.data_fetcher, 'iter_competencia_batches', mock_fetch_data)
+        
+        chunks = list(bpa_service.stream_bpa_file('202401', 'consolidado'))
+        assert chunks and all(isinstance(chunk, bytes) for chunk in chunks)
+        
+        expected = bpa_service.generate_bpa_file('202401', 'consolidado').getvalue()
+        assert b''.join(chunks) == expected
+    
+    def test_generated_file_passes_verification(self, bpa_service, sample_individualizado_data, monkeypatch):
+        """Testa que o cabeçalho gerado confere com as linhas na verificação do arquivo"""
+        def mock_fetch_data(*args, **kwargs):
+            return [sample_individualizado_data.to_dict('records')]
+        
+        monkeypatch.setattr(bpa_service.data_fetcher, 'iter_competencia_batches', mock_fetch_data)
+        
+        content = bpa_service.generate_bpa_file('202401', 'individualizado').getvalue()
+        report = BPAReader().verify(content)
+        assert report['status'] == 'success', report['errors']
+        assert report['header']['total_linhas'] == '%06d' % len(sample_individualizado_data)
+    
+    def test_artifact_is_reused_until_data_version_changes(self, bpa_service, sample_consolidado_data, monkeypatch, tmp_path):
+        """Testa o arquivo gravado em disco: reutilizado na mesma versão dos dados e regerado quando ela muda"""
+        calls = []
+        def mock_fetch_data(*args, **kwargs):
+            calls.append(args)
+            return [sample_consolidado_data.to_dict('records')]
+        
+        version = {'value': '1-100'}
+        monkeypatch.setattr(bpa_service.data_fetcher, 'iter_competencia_batches', mock_fetch_data)
+        monkeypatch.setattr(bpa_service.data_fetcher, 'get_competencia_version', lambda competencia: version['value'])
+        bpa_service.artifacts = BPAArtifactStore(str(tmp_path))
+        
+        first = bpa_service.get_bpa_artifact('202401', 'consolidado')
+        second = bpa_service.get_bpa_artifact('202401', 'consolidado')
+        assert first == second
+        assert len(calls) == 1
+        with open(first.path, 'rb') as f:
+            assert f.read() == bpa_service.generate_bpa_file('202401', 'consolidado').getvalue()
+        
+        version['value'] = '2-150'
+        third = bpa_service.get_bpa_artifact('202401', 'consolidado')
+        assert third.path != first.path
+        assert len(calls) == 3
+    
+    def test_artifact_falls_back_without_data_version(self, bpa_service, monkeypatch, tmp_path):
+        """Testa que, sem a versão dos dados, nenhum arquivo é gravado (o envio volta ao streaming)"""
+        monkeypatch.setattr(bpa_service.data_fetcher, 'get_competencia_version', lambda competencia: None)
+        bpa_service.artifacts = BPAArtifactStore(str(tmp_path))
+        
+        assert bpa_service.get_bpa_artifact('202401', 'consolidado') is None
+        assert not list(tmp_path.iterdir())
+    
+    def test_stream_validates_type_before_fetching(self, bpa_service, monkeypatch):
+        """Testa que o tipo inválido é recusado antes de qualquer consulta ao banco"""
+        def mock_fetch_data(*args, **kwargs):
+            raise AssertionError("Não deveria consultar o banco")
+        
+        monkeypatch.setattr(bpa_service.data_fetcher, 'iter_competencia_batches', mock_fetch_data)
+        
+        with pytest.raises(ValueError) as exc_info:
+            bpa_service.stream_bpa_file('202401', 'tipo_invalido')
+        assert 'Tipo de BPA inválido' in str(exc_info.value)
+    
+    def test_individualizada_alias(self):
+        """Testa o nome enviado pelo formulário ('individualizada')"""
+        assert BPAGeneratorFactory.normalize_type('individualizada') == 'individualizado'
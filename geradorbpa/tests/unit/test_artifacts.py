@@ -0,0 +1,61 @@
+import hashlib
+import io
+import os
+import pytest
+from app import app
+from app.utils.bpa.artifacts import BPAArtifactStore
+from app.utils.bpa_view import BPAView
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BPAArtifactStore(str(tmp_path))
+
+
+def test_save_and_get(store):
+    """Testa a gravação do arquivo com hash do conteúdo e a leitura pela versão dos dados"""
+    content = b"01#BPA#...\r\n" * 1000
+    artifact = store.save('202401', 'consolidado', '10-500', io.BytesIO(content))
+
+    assert artifact.etag == hashlib.sha256(content).hexdigest()
+    assert artifact.size == len(content)
+    with open(artifact.path, 'rb') as f:
+        assert f.read() == content
+    assert store.get('202401', 'consolidado', '10-500') == artifact
+    assert store.get('202401', 'consolidado', '11-501') is None
+    assert store.get('202401', 'individualizado', '10-500') is None
+
+
+def test_new_version_removes_previous(store, tmp_path):
+    """Testa que gravar uma nova versão dos dados invalida a anterior da mesma competência e tipo"""
+    old = store.save('202401', 'consolidado', 'v1', io.BytesIO(b"antigo\r\n"))
+    other = store.save('202402', 'consolidado', 'v1', io.BytesIO(b"outra\r\n"))
+    new = store.save('202401', 'consolidado', 'v2', io.BytesIO(b"novo\r\n"))
+
+    assert not os.path.exists(old.path)
+    assert store.get('202401', 'consolidado', 'v1') is None
+    assert store.get('202401', 'consolidado', 'v2') == new
+    assert store.get('202402', 'consolidado', 'v1') == other
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('.tmp')]
+
+
+def test_rejects_unsafe_names(store):
+    """Testa a recusa de competência ou tipo que não formam um nome de arquivo seguro"""
+    with pytest.raises(ValueError):
+        store.get('../../x', 'consolidado', 'v1')
+
+
+def test_send_artifact_conditional_get(store):
+    """Testa o envio com ETag e a resposta 304 quando o cliente já tem o arquivo"""
+    artifact = store.save('202401', 'consolidado', 'v1', io.BytesIO(b"conteudo\r\n"))
+
+    with app.test_request_context('/bpa/202401/consolidado'):
+        response = BPAView.send_artifact(artifact, 'consolidado')
+        assert response.status_code == 200
+        assert response.headers['ETag'] == f'"{artifact.etag}"'
+        response.close()
+
+    with app.test_request_context('/bpa/202401/consolidado', headers={'If-None-Match': f'"{artifact.etag}"'}):
+        response = BPAView.send_artifact(artifact, 'consolidado')
+        assert response.status_code == 304
+        response.close()
@@ -0,0 +1,89 @@
+import threading
+import time
+import pandas as pd
+import pytest
+from app.utils.cache import BPACache, estimate_size
+
+
+def test_lru_bounded_by_bytes():
+    """Testa o descarte dos itens usados há mais tempo quando o limite de bytes é excedido"""
+    cache = BPACache(max_bytes=300)
+    cache.set('a', 'x', size=100)
+    cache.set('b', 'y', size=100)
+    cache.set('c', 'z', size=100)
+    assert cache.get('a') == 'x'  # 'a' passa a ser o mais recente
+
+    cache.set('d', 'w', size=100)
+    assert cache.get('b') is None
+    assert [cache.get(key) for key in ('a', 'c', 'd')] == ['x', 'z', 'w']
+
+    stats = cache.stats()
+    assert stats['entries'] == 3 and stats['bytes'] == 300
+    assert stats['evictions'] == 1
+    assert stats['hits'] == 4 and stats['misses'] == 1
+
+    assert not cache.set('grande', 'v', size=301)
+    assert cache.get('grande') is None
+
+
+def test_expired_items(monkeypatch):
+    """Testa a expiração pelo tempo de vida"""
+    cache = BPACache(ttl_seconds=10, max_bytes=1000)
+    cache.set('a', 1)
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 11)
+
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+    assert cache.stats()['bytes'] == 0
+
+
+def test_estimate_size_of_frames():
+    """Testa a estimativa de tamanho de lotes em DataFrame"""
+    frame = pd.DataFrame({'cnes': ['1234567'] * 100, 'quantidade': range(100)})
+    assert estimate_size([frame, frame]) >= 2 * int(frame.memory_usage(deep=True).sum())
+
+
+def test_get_or_load_single_flight():
+    """Testa que requisições simultâneas para a mesma chave compartilham uma única carga"""
+    cache = BPACache(max_bytes=10 ** 6)
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def loader():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return ['lote']
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('k', loader))) for _ in range(8)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    while cache.stats()['shared_loads'] < 7:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [['lote']] * 8
+    assert cache.get_or_load('k', loader) == ['lote']
+    assert len(calls) == 1
+
+
+def test_get_or_load_errors_and_none():
+    """Testa que erros da carga não ficam no cache e que None não é armazenado"""
+    cache = BPACache(max_bytes=10 ** 6)
+
+    def failing():
+        raise ConnectionError("banco indisponível")
+
+    with pytest.raises(ConnectionError):
+        cache.get_or_load('k', failing)
+    assert cache.get_or_load('k', lambda: None) is None
+    assert cache.get_or_load('k', lambda: 42) == 42
+    assert cache.stats()['loads'] == 3
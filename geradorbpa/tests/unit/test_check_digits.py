@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+from app.utils.bpa.check_digits import (
+    cns_valid, cnes_valid, cnpj_valid, digit_matrix, is_valid_cns, is_valid_cnes, is_valid_cnpj
+)
+from app.utils.bpa_validator import BPAValidator
+
+
+def _cns_definitivo(pis: str) -> str:
+    """Algoritmo de geração do CNS definitivo a partir do PIS"""
+    soma = sum(int(pis[i]) * (15 - i) for i in range(11))
+    dv = 11 - soma % 11
+    if dv == 11:
+        dv = 0
+    if dv == 10:
+        soma += 2
+        dv = 11 - soma % 11
+        return f"{pis}001{dv}"
+    return f"{pis}000{dv}"
+
+
+def _cns_provisorio(prefixo: str) -> str:
+    """Completa um CNS provisório com o último dígito que torna a soma múltipla de 11"""
+    for ultimo in range(10):
+        cns = f"{prefixo}{ultimo}"
+        if sum(int(d) * (15 - i) for i, d in enumerate(cns)) % 11 == 0:
+            return cns
+    return None
+
+
+def test_digit_matrix():
+    """Testa a conversão de códigos em matriz de dígitos"""
+    digits, valid = digit_matrix(pd.Series(['0123', ' 4567 ', '12a4', None, 1234.0, '12345']), 4)
+    assert list(valid) == [True, True, False, False, True, False]
+    assert digits[1].tolist() == [4, 5, 6, 7]
+    assert digits[2].tolist() == [0, 0, 0, 0]
+
+
+def test_cns_valid():
+    """Testa CNS definitivos (inclusive com resto 10) e provisórios"""
+    rng = np.random.default_rng(42)
+    pis = ["".join(map(str, rng.integers(0, 10, 10))) for _ in range(200)]
+    definitivos = [_cns_definitivo(f"{1 + i % 2}{p}") for i, p in enumerate(pis)]
+    provisorios = [c for c in (_cns_provisorio(f"{7 + i % 3}{p}{p[:3]}") for i, p in enumerate(pis)) if c]
+    assert any(c[11:14] == '001' for c in definitivos)
+
+    assert cns_valid(definitivos).all()
+    assert cns_valid(provisorios).all()
+
+    # Um dígito alterado invalida o CNS
+    alterados = [c[:5] + str((int(c[5]) + 1) % 10) + c[6:] for c in definitivos + provisorios]
+    assert not cns_valid(alterados).any()
+    # Prefixos inválidos, tamanho errado e vazios
+    assert not cns_valid(['312345678901234', '12345', None, '']).any()
+
+
+def test_cnes_valid():
+    """Testa o dígito verificador do CNES"""
+    assert list(cnes_valid(['2077485', '2077486', '123', None])) == [True, False, False, False]
+
+
+def test_cnpj_valid():
+    """Testa os dígitos verificadores do CNPJ"""
+    assert list(cnpj_valid(['11222333000181', '11222333000182', '00000000000000', '1122233300018'])) == [
+        True, False, False, False
+    ]
+
+
+def test_bpa_validator_uses_kernels():
+    """Testa a validação por linha com os mesmos algoritmos"""
+    validator = BPAValidator()
+    cns = _cns_definitivo("1234567890" + "1")
+    assert validator.validate_cns(cns)
+    assert not validator.validate_cns(cns[:-1] + str((int(cns[-1]) + 1) % 10))
+    assert validator.validate_cnes('2077485')
+    assert not validator.validate_cnes('2077486')
+    assert "CNES inválido - dígito verificador incorreto" in validator.get_errors()
+
+
+def test_value_checks_match_kernels():
+    """Testa que a validação de um valor concorda com os kernels por coluna"""
+    rng = np.random.default_rng(3)
+    cns = [_cns_definitivo(f"{1 + i % 2}{''.join(map(str, rng.integers(0, 10, 10)))}") for i in range(50)]
+    cns += ["".join(map(str, rng.integers(0, 10, 15))) for _ in range(200)]
+    cns += ['', ' ', '12345678901234５', '¹23456789012345', None]
+    cnes = ["".join(map(str, rng.integers(0, 10, 7))) for _ in range(300)] + ['2077485', '207748', None]
+    cnpj = ['11222333000181', '11111111111111'] + ["".join(map(str, rng.integers(0, 10, 14))) for _ in range(300)]
+
+    assert [is_valid_cns(v) for v in cns] == list(cns_valid(cns))
+    assert [is_valid_cnes(v) for v in cnes] == list(cnes_valid(cnes))
+    assert [is_valid_cnpj(v) for v in cnpj] == list(cnpj_valid(cnpj))
+    assert any(is_valid_cnes(v) for v in cnes[:300]) and is_valid_cnpj('11222333000181')
+
+
+def test_individualizado_check_digits(individualizado_validator, sample_individualizado_data):
+    """Testa os dígitos verificadores na validação dos lotes: aviso por padrão, descarte se configurado"""
+    frame = pd.concat([sample_individualizado_data] * 3, ignore_index=True)
+    frame.loc[1, 'cnes'] = '2077485'
+    frame.loc[1, 'cns_paciente'] = _cns_definitivo("1234567890" + "1")
+    frame.loc[1, 'cns_profissional'] = _cns_definitivo("2345678901" + "2")
+    frame.loc[2, 'cnes'] = None  # Inválido pelo campo obrigatório, não pelo dígito
+
+    assert list(individualizado_validator.check_digit_mask(frame)) == [False, True, False]
+    assert list(individualizado_validator.valid_mask(frame)) == [True, True, False]
+
+    individualizado_validator.reject_invalid_check_digits = True
+    expected = [individualizado_validator.validate(row) for _, row in frame.iterrows()]
+    assert expected == [False, True, False]
+    assert list(individualizado_validator.valid_mask(frame)) == expected
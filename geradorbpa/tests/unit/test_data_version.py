@@ -0,0 +1,14 @@
+from app.utils.data_version import install_statements
+
+
+def test_install_statements():
+    """Testa os comandos do controle de versão: tabela, função, um trigger por evento e carga inicial"""
+    statements = install_statements("bpa")
+    sql = "\n".join(statements)
+
+    assert 'CREATE TABLE IF NOT EXISTS "bpa".competencia_versao' in statements[0]
+    assert 'CREATE OR REPLACE FUNCTION "bpa".bpa_incrementa_versao()' in statements[1]
+    for event in ("insert", "update", "delete", "truncate"):
+        assert f'DROP TRIGGER IF EXISTS bpa_versao_{event} ON "bpa".procedimentos' in sql
+        assert f"CREATE TRIGGER bpa_versao_{event} AFTER {event.upper()} " in sql
+    assert "FOR EACH STATEMENT" in sql and "ON CONFLICT (competencia) DO NOTHING" in statements[-1]
@@ -0,0 +1,143 @@
+import threading
+import time
+import pytest
+from app.utils.database import ConnectionPool, Database, PoolTimeoutError
+from tests.conftest import FakeConnection
+
+
+class FakeThreadedPool:
+    """Imita o ThreadedConnectionPool: falha ao exceder maxconn e reutiliza as devolvidas"""
+
+    def __init__(self, minconn, maxconn, **kwargs):
+        self.maxconn = maxconn
+        self.free = []
+        self.used = set()
+        self.opened = 0
+        self.lock = threading.Lock()
+
+    def getconn(self):
+        with self.lock:
+            if len(self.used) >= self.maxconn:
+                raise Exception("connection pool exhausted")
+            if self.free:
+                conn = self.free.pop()
+            else:
+                self.opened += 1
+                conn = FakeConnection(rows=[(1,)], closed=0)
+            self.used.add(conn)
+            return conn
+
+    def putconn(self, conn, close=False):
+        with self.lock:
+            self.used.discard(conn)
+            if close:
+                conn.closed = 1
+            else:
+                self.free.append(conn)
+
+    def closeall(self):
+        pass
+
+
+def _pool(maxconn=2, timeout=1.0, ping_interval=60.0):
+    return ConnectionPool(1, maxconn, timeout, ping_interval, factory=FakeThreadedPool)
+
+
+def test_checkout_waits_for_free_connection():
+    """Testa que, com o pool esgotado, o checkout aguarda a devolução em vez de falhar"""
+    db_pool = _pool(maxconn=1)
+    conn = db_pool.getconn()
+    threading.Timer(0.05, db_pool.putconn, args=(conn,)).start()
+
+    again = db_pool.getconn()
+    assert again is conn
+    db_pool.putconn(again)
+
+    stats = db_pool.stats()
+    assert stats['checkouts'] == 2 and stats['in_use'] == 0
+    assert stats['wait_max_ms'] >= 40
+
+
+def test_checkout_timeout():
+    """Testa o erro após o tempo de espera, sem alterar as conexões em uso"""
+    db_pool = _pool(maxconn=1, timeout=0.05)
+    conn = db_pool.getconn()
+    with pytest.raises(PoolTimeoutError):
+        db_pool.getconn()
+    assert db_pool.stats()['timeouts'] == 1
+
+    db_pool.putconn(conn)
+    assert db_pool.getconn(timeout=0) is conn
+
+
+def test_health_check_discards_broken_connections():
+    """Testa que conexões ociosas são testadas no checkout e as inválidas são substituídas"""
+    db_pool = _pool(ping_interval=0)
+    conn = db_pool.getconn()
+    assert conn.queries == []  # recém-aberta
+    db_pool.putconn(conn)
+
+    conn.error = Exception("server closed the connection unexpectedly")
+    other = db_pool.getconn()
+    assert other is not conn and conn.closed
+    assert db_pool.stats()['discarded'] == 1
+    db_pool.putconn(other)
+
+
+def test_concurrent_jobs_share_bounded_pool():
+    """Testa várias threads disputando poucas conexões sem erros de pool esgotado"""
+    db_pool = _pool(maxconn=3, timeout=5)
+    db = Database(db_pool)
+    errors = []
+
+    def job():
+        try:
+            with db.connection():
+                time.sleep(0.01)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=job) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert db_pool.stats()['checkouts'] == 20
+    assert db_pool.stats()['in_use'] == 0
+    assert db_pool._pool.opened <= 3
+
+
+def test_session_holds_one_connection_per_job():
+    """Testa que as consultas de uma sessão usam a mesma conexão, devolvida ao final"""
+    db_pool = _pool()
+    db = Database(db_pool)
+
+    with db.session():
+        first = db.get_connection()
+        db.release_connection(first)
+        second = db.get_connection()
+        db.release_connection(second)
+        with db.session():
+            assert db.get_connection() is first
+        assert second is first
+        assert db_pool.stats()['in_use'] == 1
+
+    assert db_pool.stats()['in_use'] == 0
+    assert db_pool.stats()['checkouts'] == 1
+
+    # Sessão sem consultas não usa o pool
+    with db.session():
+        pass
+    assert db_pool.stats()['checkouts'] == 1
+
+
+def test_get_connection_returns_none_on_failure():
+    """Testa que falhas no checkout são registradas e resultam em None"""
+    db = Database(_pool(maxconn=1, timeout=0.01))
+    conn = db.get_connection()
+    assert db.get_connection() is None
+    db.release_connection(conn)
+    with db.connection() as again:
+        assert again is conn
@@ -0,0 +1,112 @@
+import pytest
+import pandas as pd
+from psycopg2 import errors
+from app.utils.fetch_data import DataFetcher
+from tests.conftest import FakeConnection, FakeDatabase
+
+
+def _respond(conn, query, params):
+    if "information_schema.columns" in query:
+        return [(col,) for col in conn.columns]
+    return conn.rows
+
+
+@pytest.fixture
+def fetcher():
+    conn = FakeConnection(
+        responder=_respond,
+        columns=["id", "cnes", "competencia", "procedimento", "quantidade"],
+        rows=[(f"{i:07d}", "202401", "0301010056", i) for i in range(5)]
+    )
+    data_fetcher = DataFetcher(schema="public")
+    data_fetcher.db = FakeDatabase(conn)
+    return data_fetcher
+
+
+def test_iter_competencia_batches(fetcher):
+    """Testa a leitura em lotes com cursor nomeado e projeção explícita"""
+    batches = list(fetcher.iter_competencia_batches(
+        "202401", columns=["cnes", "competencia", "procedimento", "quantidade"], batch_size=2
+    ))
+    conn = fetcher.db.conn
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert batches[0][0] == {"cnes": "0000000", "competencia": "202401", "procedimento": "0301010056", "quantidade": 0}
+
+    name, query, params, itersize = conn.executions[-1]
+    assert name and name.startswith("bpa_competencia_")
+    assert itersize == 2
+    assert params == ("202401",)
+    assert 'SELECT "cnes", "competencia", "procedimento", "quantidade" FROM' in query
+    assert "LIMIT" not in query
+    assert conn.fetch_sizes == [2, 2, 2, 2]
+    assert conn.rollbacks == 1 and fetcher.db.released == 1
+
+
+def test_iter_competencia_batches_ignores_missing_columns(fetcher):
+    """Testa que colunas ausentes na tabela são ignoradas e os lotes saem como DataFrame"""
+    fetcher.db.conn.rows = [row[:2] for row in fetcher.db.conn.rows]
+    frames = list(fetcher.iter_competencia_batches("202401", columns=["cnes", "competencia", "inexistente"], as_frame=True))
+
+    assert len(frames) == 1
+    assert isinstance(frames[0], pd.DataFrame)
+    assert list(frames[0].columns) == ["cnes", "competencia"]
+    assert len(frames[0]) == 5
+
+
+def test_iter_competencia_batches_releases_on_early_stop(fetcher):
+    """Testa que a conexão é devolvida quando a leitura é interrompida"""
+    batches = fetcher.iter_competencia_batches("202401", columns=["cnes"], batch_size=1)
+    next(batches)
+    batches.close()
+
+    assert fetcher.db.conn.rollbacks == 1 and fetcher.db.released == 1
+
+
+def test_fetch_data_by_competencia_without_truncation(fetcher):
+    """Testa que a competência é lida por completo, sem o antigo limite de 100 registros"""
+    fetcher.db.conn.rows = [(f"{i:07d}", "202401", "0301010056", 1) for i in range(250)]
+
+    records = fetcher.fetch_data_by_competencia("202401", columns=["cnes", "competencia", "procedimento", "quantidade"])
+    assert len(records) == 250
+    assert len(fetcher.fetch_data_by_competencia("202401", limit=10, columns=["cnes"])) == 10
+
+
+def test_iter_competencia_batches_invalid_competencia(fetcher):
+    """Testa a recusa de competência inválida antes de abrir conexão"""
+    with pytest.raises(ValueError):
+        next(fetcher.iter_competencia_batches("2024-01"))
+    assert fetcher.db.released == 0
+
+
+def test_get_competencia_version(fetcher):
+    """Testa a versão dos dados da competência, lida da tabela competencia_versao"""
+    fetcher.db.conn.rows = [(7,)]
+    assert fetcher.get_competencia_version("202401") == "v7"
+
+    _, query, params, _ = fetcher.db.conn.executions[-1]
+    assert '"public".competencia_versao' in query and params == ("202401",)
+    assert fetcher.db.released == 1
+    with pytest.raises(ValueError):
+        fetcher.get_competencia_version("2024-1")
+
+
+def test_get_competencia_version_without_rows(fetcher):
+    """Testa que competências nunca gravadas têm a versão inicial"""
+    fetcher.db.conn.rows = []
+    assert fetcher.get_competencia_version("202401") == "v0"
+
+
+def test_get_competencia_version_without_tracking(fetcher, caplog):
+    """Testa que sem o controle de versão instalado a versão fica indisponível e é registrado um aviso"""
+    fetcher.db.conn.error = errors.UndefinedTable("relation does not exist")
+    with caplog.at_level("WARNING", logger="DataFetcher"):
+        assert fetcher.get_competencia_version("202401") is None
+
+    assert "scripts/data_version.py" in caplog.text
+    assert fetcher.db.conn.rollbacks == 1
+    assert fetcher.db.released == 1
+
+    fetcher.db.conn.error = RuntimeError("conexão perdida")
+    assert fetcher.get_competencia_version("202401") is None
+    assert fetcher.db.conn.rollbacks == 2
@@ -0,0 +1,53 @@
+import datetime
+import warnings
+import numpy as np
+import pandas as pd
+from app.utils.bpa_formatter import BPAFormatter
+
+
+def _mixed_frame(n):
+    """Colunas com strings, números, ausentes, acentos e datas em vários formatos"""
+    rng = np.random.default_rng(7)
+
+    def choice(values):
+        return rng.choice(np.array(values, dtype=object), n)
+
+    return pd.DataFrame({
+        'cnes': choice(['1234567', '12345', None, '-5', 1.0, 7]),
+        'cns_paciente': choice(['123456789012345', '9', None]),
+        'nome_paciente': choice(['MARIA JOSÉ', 'A' * 40, None]),
+        'data_atendimento': choice([
+            '20240115', '2024-01-15', '2024115', '15/01/2024', None, float('nan'), 'abc',
+            '20241340', datetime.date(2024, 1, 2), pd.Timestamp('2024-03-04 10:00'), 20240115,
+        ]),
+        'data_nascimento': pd.to_datetime(choice(['2020-01-01', '1984-02-10', None])),
+        'idade': rng.integers(0, 120, n),
+        'quantidade': rng.choice([1.0, 2.5, np.nan], n),
+        'sem_formatador': choice([1, None]),
+    })
+
+
+def _same(value):
+    return None if isinstance(value, float) and np.isnan(value) else value
+
+
+def test_format_frame_matches_format_data():
+    """Testa que a formatação por coluna produz o mesmo resultado da formatação por linha"""
+    frame = _mixed_frame(500)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        expected = [BPAFormatter.format_data(row) for row in frame.to_dict('records')]
+        result = BPAFormatter.format_frame(frame).to_dict('records')
+
+    assert len(result) == len(expected)
+    for row, expected_row in zip(result, expected):
+        assert {k: _same(v) for k, v in row.items()} == {k: _same(v) for k, v in expected_row.items()}
+
+
+def test_format_frame_dates():
+    """Testa a conversão das datas para AAAAMMDD, mantendo valores não reconhecidos"""
+    frame = pd.DataFrame({'data_atendimento': ['20240115', '2024-02-03', 'abc', None]}, dtype=object)
+    result = BPAFormatter.format_frame(frame)
+
+    assert list(result['data_atendimento']) == ['20240115', '20240203', 'abc', 'None']
+    assert BPAFormatter.format_frame(frame.iloc[:0]).empty
@@ -19,11 +19,12 @@ def test_consolidado_generator_process_data(consolidado_generator, sample_consol
     assert first_line[9:15] == '202401'  # Competência
     assert first_line[15:21] == '123456'  # CBO
     assert first_line[21:24] == '001'  # Folha
-    assert first_line[24:27] == '001'  # Sequencial
-    assert first_line[27:37] == '1234567890'  # Procedimento
-    assert first_line[37:40] == '030'  # Idade
-    assert first_line[40:43] == '001'  # Quantidade
-    assert first_line[43:46] == 'EXT'  # Origem
+    assert first_line[24:26] == '01'  # Sequencial
+    assert first_line[26:36] == '1234567890'  # Procedimento
+    assert first_line[36:39] == '030'  # Idade
+    assert first_line[39:45] == '000001'  # Quantidade
+    assert first_line[45:48] == 'EXT'  # Origem
+    assert len(result) == 48 + 2  # Registro de 48 caracteres + CRLF
 
 def test_individualizado_generator_process_data(individualizado_generator, sample_individualizado_data):
     """Testa o processamento de dados do BPA Individualizado"""
@@ -45,15 +46,18 @@ def test_individualizado_generator_process_data(individualizado_generator, sampl
     assert first_line[30:36] == '123456'  # CBO
     assert first_line[36:44] == '20240101'  # Data Atendimento
     assert first_line[44:47] == '001'  # Folha
-    assert first_line[47:50] == '001'  # Sequencial
-    assert first_line[50:60] == '1234567890'  # Procedimento
-    assert first_line[60:75] == '987654321098765'  # CNS Paciente
-    assert first_line[75:76] == 'M'  # Sexo
-    assert first_line[76:83] == '1234567'  # Código Município
-    assert first_line[83:87] == 'A001'  # CID
-    assert first_line[87:90] == '030'  # Idade
-    assert first_line[90:93] == '001'  # Quantidade
-    assert first_line[93:94] == '1'  # Caráter Atendimento
+    assert first_line[47:49] == '01'  # Sequencial
+    assert first_line[49:59] == '1234567890'  # Procedimento
+    assert first_line[59:74] == '987654321098765'  # CNS Paciente
+    assert first_line[74:75] == 'M'  # Sexo
+    assert first_line[75:81] == '123456'  # Código Município (IBGE, 6 dígitos)
+    assert first_line[81:85] == 'A001'  # CID
+    assert first_line[85:88] == '030'  # Idade
+    assert first_line[88:94] == '000001'  # Quantidade
+    assert first_line[94:96] == '01'  # Caráter Atendimento
+    assert first_line[109:112] == 'EXT'  # Origem
+    assert first_line[112:142] == 'PACIENTE TESTE'.ljust(30)  # Nome do Paciente
+    assert len(result) == 338 + 2  # Registro de 338 caracteres + CRLF
 
 def test_consolidado_generator_empty_data(consolidado_generator):
     """Testa o processamento de dados vazios do BPA Consolidado"""
@@ -0,0 +1,94 @@
+import pytest
+from app.utils.index_advisor import IndexAdvisor, parse_index_columns, covers, collect_lookups
+from tests.conftest import FakeConnection, FakeDatabase
+
+
+def _respond(conn, query, params):
+    """Imita o catálogo: índices e tabelas do schema e criação/remoção de índices"""
+    if "FROM pg_indexes" in query:
+        return list(conn.indexes)
+    if "FROM pg_tables" in query:
+        return [(table,) for table in conn.tables]
+    if "FROM pg_index x" in query:
+        return [(True,)] if params[1] in conn.invalid else []
+    if query.startswith("DROP INDEX"):
+        conn.invalid.discard(query.split('"')[3])
+    elif query.startswith("CREATE INDEX"):
+        assert conn.autocommit, "CREATE INDEX CONCURRENTLY fora do autocommit"
+        table = query.split('ON "public".')[1].split(" ")[0].strip('"')
+        name = query.split('"')[1]
+        conn.indexes.append((table, name, f"CREATE INDEX {name} ON public.{table} USING btree {query[query.index('('):].rstrip(';')}"))
+    return []
+
+
+MAPPING = {
+    "prd-ident": {"table": "padrao", "column": "", "predefinido": "03"},
+    "prd-cnspac": {"table": "paciente", "column": "num_cns", "check": True,
+                   "check_table": "paciente", "check_column": "nom_paciente"},
+    "prd-sexo": {"table": "paciente", "column": "tip_sexo", "check": True,
+                 "check_table": "paciente", "check_column": "nom_paciente"},
+    "prd-cid": {"table": "cid", "column": "cod_cid", "check": True,
+                "check_table": "cid", "check_column": "cod_cid"},
+}
+
+
+@pytest.fixture
+def advisor():
+    conn = FakeConnection(
+        responder=_respond,
+        tables=["procedimentos", "paciente"],
+        indexes=[("paciente", "paciente_pkey", "CREATE UNIQUE INDEX paciente_pkey ON public.paciente USING btree (id)")],
+        invalid=set()
+    )
+    return IndexAdvisor(schema="public", db=FakeDatabase(conn))
+
+
+def test_parse_index_columns():
+    """Testa a extração das colunas da definição do índice"""
+    assert parse_index_columns('CREATE INDEX i ON public.t USING btree (a, "B" DESC, lower(c))') == ["a", "B", "lower(c)"]
+    assert parse_index_columns("CREATE INDEX i ON public.t USING btree (a) INCLUDE (b)") == ["a"]
+    assert parse_index_columns("CREATE INDEX i ON public.t USING btree (a) WHERE (a > 0)") == []
+
+
+def test_covers_requires_leading_columns():
+    """Testa que o índice só atende à busca pelas suas primeiras colunas"""
+    assert covers(["competencia", "cnes"], ["competencia"])
+    assert not covers(["cnes", "competencia"], ["competencia"])
+
+
+def test_collect_lookups_groups_check_columns():
+    """Testa o agrupamento das verificações do mapeamento por tabela e coluna"""
+    lookups = {(item["table"], tuple(item["columns"])): item for item in collect_lookups(MAPPING)}
+    assert set(lookups) == {("procedimentos", ("competencia",)), ("paciente", ("nom_paciente",)), ("cid", ("cod_cid",))}
+    assert lookups[("paciente", ("nom_paciente",))]["sources"] == ["prd-cnspac", "prd-sexo"]
+
+
+def test_advise_reports_missing_indexes(advisor):
+    """Testa o relatório de buscas sem índice"""
+    report = advisor.advise(MAPPING)
+    assert {(item["table"], tuple(item["columns"])) for item in report["missing"]} == {
+        ("procedimentos", ("competencia",)), ("paciente", ("nom_paciente",))
+    }
+    cid = next(item for item in report["lookups"] if item["table"] == "cid")
+    assert not cid["table_exists"] and not cid["index_scan"]
+
+
+def test_create_missing_uses_concurrently_in_autocommit(advisor):
+    """Testa a criação dos índices ausentes"""
+    report = advisor.create_missing(MAPPING)
+    assert report["missing"] == []
+    assert sorted(report["created"]) == ["ix_paciente_nom_paciente", "ix_procedimentos_competencia"]
+    assert all(item["index_scan"] for item in report["lookups"] if item["table_exists"])
+    assert any("CREATE INDEX CONCURRENTLY" in query for query in advisor.db.conn.queries)
+    assert advisor.db.conn.autocommit is False
+
+
+def test_create_index_drops_invalid_index_first(advisor):
+    """Testa que um índice inválido de mesmo nome é removido antes da criação"""
+    advisor.db.conn.invalid.add("ix_paciente_nom_paciente")
+    advisor.create_index("paciente", ["nom_paciente"])
+
+    queries = [query for query in advisor.db.conn.queries if query.startswith(("DROP", "CREATE"))]
+    assert queries[0].startswith('DROP INDEX CONCURRENTLY IF EXISTS "public"."ix_paciente_nom_paciente"')
+    assert queries[1].startswith("CREATE INDEX CONCURRENTLY")
+    assert not advisor.db.conn.invalid
@@ -0,0 +1,91 @@
+import pytest
+from app.utils.bpa.layout import BPA_I, HEADER
+from app.utils.bpa.reader import BPAReader, control_field
+from app.utils.bpa.renderer import render_line
+
+
+def _records(n):
+    return [{
+        'cnes': '1234567', 'competencia': '202401', 'cns_profissional': '123456789012345',
+        'cbo': '225125', 'data_atendimento': '20240115', 'sequencial': i % 20 + 1,
+        'procedimento': '0301010056', 'cns_paciente': '987654321098765', 'sexo': 'F',
+        'codigo_municipio': '3550308', 'cid': 'J069', 'idade': 40, 'quantidade': i % 3 + 1,
+        'carater_atendimento': '1', 'nome_paciente': 'MARIA JOSÉ' if i % 4 == 0 else 'ANA SOUZA',
+        'data_nascimento': '19840210', 'cnpj': None,
+    } for i in range(n)]
+
+
+def _header(lines, sheets, control):
+    return render_line(HEADER, {
+        'competencia': '202401', 'total_linhas': lines, 'total_folhas': sheets, 'controle': control,
+        'orgao': 'SECRETARIA MUNICIPAL DE SAUDE', 'sigla': 'SMS', 'cgc_cpf': '12345678000195',
+        'destino': 'SECRETARIA ESTADUAL DE SAUDE', 'indicador_destino': 'E', 'versao': '1.0.0',
+    })
+
+
+@pytest.fixture
+def bpa_file(individualizado_generator):
+    individualizado_generator.max_lines_per_page = 20
+    records = _records(45)
+    body = b"".join(individualizado_generator.iter_chunks([records]))
+    control = control_field(45 * 301010056, sum(r['quantidade'] for r in records))
+    return _header(45, 3, control).encode("utf-8") + body
+
+
+def test_verify_generated_file(bpa_file):
+    """Testa a verificação de um arquivo gerado, com cabeçalho, folhas e acentos"""
+    report = BPAReader().verify(bpa_file)
+
+    assert report['status'] == 'success', report['errors']
+    assert report['records'] == {'03': 45}
+    assert report['sheets'] == 3
+    assert report['warnings'] == []
+
+
+def test_read_columns(bpa_file):
+    """Testa a leitura dos campos conforme o layout"""
+    result = BPAReader().read(bpa_file)
+    records = result['records']['03']
+
+    assert result['errors'] == []
+    assert result['header']['total_linhas'] == '000045'
+    assert list(records['linha'][:2]) == [2, 3]
+    assert records['nome_paciente'][0] == 'MARIA JOSÉ'.ljust(30)
+    assert records['codigo_municipio'][0] == '355030'
+    assert list(records['folha'].unique()) == ['001', '002', '003']
+    assert list(records.columns[1:]) == [spec.name for spec in BPA_I]
+
+
+def test_verify_detects_wrong_header_totals(bpa_file):
+    """Testa a recusa de cabeçalho com campo de controle e total de linhas incorretos"""
+    lines = bpa_file.split(b"\r\n")
+    header = _header(44, 3, 1111).encode("utf-8").rstrip(b"\r\n")
+    report = BPAReader().verify(b"\r\n".join([header] + lines[1:]))
+
+    assert report['status'] == 'error'
+    assert any('total_linhas' in error for error in report['errors'])
+    assert any('controle' in error for error in report['errors'])
+
+
+def test_verify_detects_invalid_lines(bpa_file):
+    """Testa a recusa de linhas com tamanho errado, campo não numérico e tipo desconhecido"""
+    lines = bpa_file.split(b"\r\n")
+    lines[2] = lines[2][:-1]
+    lines[3] = lines[3][:2] + b"12345X7" + lines[3][9:]
+    lines.insert(4, b"99" + b" " * 10)
+    report = BPAReader().verify(b"\r\n".join(lines))
+
+    assert report['status'] == 'error'
+    assert any(error.startswith('Linha 3: 337 caracteres') for error in report['errors'])
+    assert any(error.startswith('Linha 4: campo cnes') for error in report['errors'])
+    assert any(error.startswith('Linha 5: tipo de registro desconhecido') for error in report['errors'])
+
+
+def test_verify_without_header(individualizado_generator):
+    """Testa que arquivos sem cabeçalho são lidos, com aviso"""
+    body = b"".join(individualizado_generator.iter_chunks([_records(3)]))
+    report = BPAReader().verify(body)
+
+    assert report['status'] == 'success'
+    assert report['header'] is None
+    assert report['warnings']
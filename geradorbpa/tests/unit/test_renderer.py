@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.utils.bpa.layout import RecordLayout, field, ALPHA
+from app.utils.bpa.renderer import BPARenderer, column_text
+
+
+def _individualizado_frame(n):
+    """Registros variados: opcionais ausentes, floats, acentos e linhas inválidas"""
+    rows = []
+    for i in range(n):
+        rows.append({
+            'cnes': '1234567',
+            'competencia': '202401',
+            'cns_profissional': '123456789012345',
+            'cbo': '123456' if i % 17 else '12345',  # CBO inválido a cada 17 linhas
+            'data_atendimento': '20240101',
+            'sequencial': str(i % 99 + 1),
+            'procedimento': 301010056 + i,
+            'cns_paciente': '987654321098765',
+            'sexo': 'mf'[i % 2],
+            'codigo_municipio': '3550308',
+            'cid': 'A001',
+            'idade': float(i % 120),
+            'quantidade': i % 5 + 1,
+            'carater_atendimento': '1',
+            'nome_paciente': 'JOÃO DA SILVA' if i % 7 == 0 else f'PACIENTE {i}' * 8,
+            'data_nascimento': '19900101',
+            'equipe_seq': None if i % 3 else 12.0,
+            'cnpj': 123456789012345678 if i % 11 == 0 else None,
+            'email': None,
+        })
+    return pd.DataFrame(rows)
+
+
+def test_column_text_matches_str():
+    """Testa a conversão de colunas para texto"""
+    assert list(column_text(pd.Series([1.0, 2.5, None]))) == ['1', '2.5', '']
+    assert list(column_text(pd.Series(['a', 3, 4.0, None], dtype=object))) == ['a', '3', '4', '']
+
+
+def test_render_numeric_keeps_rightmost_digits():
+    """Testa o preenchimento com zeros e o truncamento dos campos"""
+    renderer = BPARenderer(RecordLayout('Teste', [field('a', 3), field('b', 4, ALPHA), field('c', 2, ALPHA, value='XY')]))
+    frame = pd.DataFrame({'a': ['7', '12345', None], 'b': ['ab', 'abcdef', None]})
+    batch = renderer.render(frame)
+    assert batch.matrix.tobytes() == b"007ab  XY\r\n345abcdXY\r\n000    XY\r\n"
+    assert batch.fallback == {}
+
+
+def test_individualizado_iter_chunks_matches_iter_lines(individualizado_generator):
+    """Testa que a renderização vetorizada produz os mesmos bytes da geração linha a linha"""
+    generator = individualizado_generator
+    generator.max_lines_per_page = 20
+    frame = _individualizado_frame(230)
+
+    expected = "".join(generator.iter_lines(row for _, row in frame.iterrows())).encode("utf-8")
+    totals = (generator.line_count, generator.sheet_count, generator.control)
+    batches = [frame.iloc[i:i + 64] for i in range(0, len(frame), 64)]
+    chunks = list(generator.iter_chunks(batches, chunk_size=1000))
+
+    assert b"".join(chunks) == expected
+    assert all(chunk.endswith(b"\r\n") for chunk in chunks)
+    # Os totais do cabeçalho são os mesmos nos dois caminhos
+    assert (generator.line_count, generator.sheet_count, generator.control) == totals
+
+
+def test_consolidado_iter_chunks_matches_iter_lines(consolidado_generator):
+    """Testa a equivalência para o BPA Consolidado, com lotes em listas de dicionários"""
+    consolidado_generator.max_lines_per_page = 7
+    records = [
+        {'cnes': '1234567', 'competencia': '202401', 'cbo': '123456', 'sequencial': i,
+         'procedimento': '0301010056', 'idade': i % 200, 'quantidade': i % 4}
+        for i in range(50)
+    ]
+    expected = "".join(consolidado_generator.iter_lines(records)).encode("utf-8")
+    chunks = consolidado_generator.iter_chunks([records[:13], records[13:]])
+    assert b"".join(chunks) == expected
+
+
+@pytest.mark.parametrize("validator_fixture", ["consolidado_validator", "individualizado_validator"])
+def test_valid_mask_matches_validate(request, validator_fixture):
+    """Testa que a validação vetorizada concorda com a validação por linha"""
+    validator = request.getfixturevalue(validator_fixture)
+    frame = _individualizado_frame(60)
+    frame['idade'] = pd.Series([' 12 ', '1.5', 151, -1, 30.7, None] * 10, dtype=object)
+    frame['carater_atendimento'] = pd.Series(['1', 2, '5', None, 1.0, '4'] * 10, dtype=object)
+    frame.loc[5, 'cnes'] = '123456A'
+
+    expected = np.array([validator.validate(row) for _, row in frame.iterrows()])
+    assert (validator.valid_mask(frame) == expected).all()
@@ -0,0 +1,70 @@
+import pandas as pd
+from app.utils.bpa.reader import BPAReader
+from app.utils.bpa.writer import BPAFileWriter
+
+HEADER_DATA = {
+    'year_month': '202401', 'org_name': 'SECRETARIA MUNICIPAL DE SAÚDE', 'org_acronym': 'SMS',
+    'cgc_cpf': '12345678000195', 'dest_name': 'SECRETARIA ESTADUAL DE SAUDE', 'dest_type': 'E',
+}
+
+
+def _records(n):
+    return pd.DataFrame([{
+        'cnes': '1234567', 'competencia': '202401', 'cbo': '225125', 'sequencial': i % 20 + 1,
+        'procedimento': 301010056 + i, 'idade': 40, 'quantidade': i % 3 + 1,
+    } for i in range(n)])
+
+
+def test_header_is_patched_with_totals(consolidado_generator):
+    """Testa o cabeçalho preenchido ao final com linhas, folhas e campo de controle"""
+    consolidado_generator.max_lines_per_page = 20
+    records = _records(45)
+    # Arquivo maior que o limite em memória: o cabeçalho é regravado no disco
+    writer = BPAFileWriter(HEADER_DATA, chunk_size=1000, spool_size=512)
+    file = writer.write(consolidado_generator, [records[:30], records[30:]])
+    content = b"".join(writer.iter_file(file))
+
+    assert file.closed
+    expected_control = (records['procedimento'].sum() + records['quantidade'].sum()) % 1111 + 1111
+    assert writer.summary == {'lines': 45, 'sheets': 3, 'control': expected_control}
+
+    report = BPAReader().verify(content)
+    assert report['status'] == 'success', report['errors']
+    assert report['header']['total_folhas'] == '000003'
+    assert report['header']['controle'] == str(expected_control)
+    assert report['header']['orgao'].startswith('SECRETARIA MUNICIPAL DE SAÚDE')
+
+
+def test_invalid_rows_are_left_out_of_totals(consolidado_generator):
+    """Testa que registros recusados na validação não entram nos totais"""
+    records = _records(5)
+    records.loc[2, 'cbo'] = '123'
+    writer = BPAFileWriter(HEADER_DATA)
+    content = b"".join(writer.iter_file(writer.write(consolidado_generator, [records])))
+
+    assert writer.summary['lines'] == 4
+    assert BPAReader().verify(content)['status'] == 'success'
+
+
+def test_header_from_organization_config():
+    """Testa o cabeçalho com os dados de app/data/organization.json"""
+    writer = BPAFileWriter.from_organization('202401')
+
+    assert writer.header_data['org_name'] == 'HOSPITAL MUNICIPAL DE EXEMPLO'
+    assert writer.header_data['cgc_cpf'] == '12345678901234'
+    assert writer.header_data['dest_type'] == 'M'
+
+
+def test_fingerprint_tracks_file_inputs(consolidado_generator, individualizado_generator):
+    """Testa que a identificação do arquivo muda com o cabeçalho, o layout e as opções do gerador"""
+    writer = BPAFileWriter(HEADER_DATA)
+    fingerprint = writer.fingerprint(consolidado_generator)
+    assert fingerprint == BPAFileWriter(dict(HEADER_DATA)).fingerprint(consolidado_generator)
+
+    assert BPAFileWriter(dict(HEADER_DATA, org_name='OUTRA')).fingerprint(consolidado_generator) != fingerprint
+    assert writer.fingerprint(individualizado_generator) != fingerprint
+    consolidado_generator.validator.reject_invalid_check_digits = True
+    assert writer.fingerprint(consolidado_generator) != fingerprint
+    consolidado_generator.validator.reject_invalid_check_digits = False
+    consolidado_generator.max_lines_per_page = 10
+    assert writer.fingerprint(consolidado_generator) != fingerprint